@@ -1,33 +1,62 @@
-from flask import Flask
-from app.dash_apps.layout import composicao_pib
+import os
+
+from flask import Flask, jsonify, redirect
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
-from app.dash_apps.layout.dashboards import general_information_dashboard as general_info
+from app.api import api
+from app.dash_apps.data import sidra
+from app.dash_apps.data.cache import data_cache
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dispatcher import LazyMounts
 
+# Apps Dash montados: prefixo -> ('módulo:create_app', título). Cada módulo só é
+# importado quando o app é criado, na primeira requisição ao prefixo (ver app/dispatcher.py).
+# O dashboard geral é um único app para todos os municípios: /municipio/<codigo_ibge>/.
+# Cada app registra os próprios callbacks ao ser criado, então a ordem de criação não importa.
 DASH_APPS = {
-  '/floriano-statview': (general_info.create_app, "Floriano Statview"),
-  '/pib-floriano': (composicao_pib.create_app, "Composição do PIB de Floriano"),
+  '/municipio': ('app.dash_apps.layout.dashboards.general_information_dashboard:create_app', "Floriano Statview"),
+  '/pib-floriano': ('app.dash_apps.layout.composicao_pib:create_app', "Composição do PIB de Floriano"),
 }
 
+# Prefixos dos apps criados já na inicialização (separados por vírgula). Com
+# `preload_app`, são criados no processo mestre e compartilhados pelos workers.
+EAGER_DASH_APPS = [
+  prefix for prefix in os.environ.get('STATVIEW_EAGER_APPS', '/municipio').split(',') if prefix
+]
+
 def create_app():
   app = Flask(__name__)
+  app.register_blueprint(api)
   
-  dash_mw_input = {}
+  dash_mw_input = LazyMounts({url: DASH_APPS[url][0] for url in DASH_APPS}, eager=EAGER_DASH_APPS)
   
   list_items = ""
 
   for url in DASH_APPS:
-     
-      dash_mw_input[url] = DASH_APPS[url][0](url + "/")
 
       list_items += "<li><a href=\"" + url + "/\">" + DASH_APPS[url][1] + "</a></li>\n"
 
   
+  @app.route("/floriano-statview/")
+  def floriano_statview():
+    return redirect(f"/municipio/{FLORIANO_CODE}/")
+
+  @app.route("/sidra/stats")
+  def sidra_stats():
+    # Fila, tempos de espera e disjuntores das consultas ao SIDRA (por worker)
+    return jsonify(sidra.stats())
+
+  @app.route("/cache/stats")
+  def cache_stats():
+    # Memória ocupada, acertos e descartes do cache da camada de dados (por worker)
+    return jsonify(data_cache.stats())
+
   @app.route("/")
   def home():
     return f"""
   <u>
   {list_items}
+  <li><a href="/api/">API de dados (CSV, Parquet e Arrow)</a></li>
   </u>
   """
   app = DispatcherMiddleware(app, dash_mw_input)
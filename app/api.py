@@ -0,0 +1,248 @@
+"""
+API de exportação dos conjuntos de dados (blueprint `/api/`).
+
+Expõe, em formato legível por máquina, os mesmos dados exibidos nos dashboards, sem
+montar nenhuma figura. As funções de dados são chamadas diretamente, então os filtros
+de ano e localidade aproveitam o cache em memória e as visões materializadas.
+
+Cada resposta traz um ETag derivado da versão (hash do conteúdo) do conjunto, então
+clientes que repetem a requisição com `If-None-Match` recebem 304 enquanto os dados
+não mudam, sem serialização nem transferência.
+
+Uso:
+    GET /api/                                   lista os conjuntos e seus parâmetros
+    GET /api/<conjunto>?<parâmetros>&format=csv  (ou parquet, arrow)
+
+Example:
+    >>> curl 'http://localhost:8050/api/population_by_race?local_code=2211001&year=2022&format=parquet'
+"""
+import inspect
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from flask import Blueprint, Response, jsonify, request
+
+from app.dash_apps.data import economy as econ
+from app.dash_apps.data import education as educ
+from app.dash_apps.data import population as pop
+from app.dash_apps.data import statewide
+from app.dash_apps.data.sidra import SidraUnavailable, allow_stale, deadline, priority, track_staleness
+from app.dash_apps.data.statewide import PIAUI_CODE
+from app.dash_apps.data.versions import content_hash
+
+# Linhas por bloco enviado na resposta (e por row group, no Parquet)
+CHUNK_ROWS = int(os.environ.get('STATVIEW_API_CHUNK_ROWS', 10_000))
+
+# Prazo (s) das consultas ao SIDRA de cada requisição. Ao estourar (ou se o SIDRA
+# falhar), a API responde com o último resultado válido do worker (cabeçalho
+# `X-Statview-Stale`) ou, sem ele, com o status 503.
+API_DEADLINE = float(os.environ.get('STATVIEW_API_DEADLINE', 30))
+
+# Formatos de saída: tipo de conteúdo e extensão do arquivo
+FORMATS = {
+  'csv': ('text/csv; charset=utf-8', 'csv'),
+  'parquet': ('application/vnd.apache.parquet', 'parquet'),
+  'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+def get_pib_composition(state_code=PIAUI_CODE, local_code=None, year=None) -> pd.DataFrame:
+  """
+  PIB e valor adicionado por setor dos municípios de um estado (tabela 5938), em formato longo.
+
+  Args:
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+      local_code (str, optional): Código IBGE de um município, para filtrar as linhas.
+      year (str or int, optional): Ano, para filtrar as linhas.
+
+  Returns:
+      pd.DataFrame: Colunas 'codigo', 'municipio', 'ano', 'variavel' e 'valor' (ver
+          `statewide.load_state_pib_composition`).
+  """
+  composition = statewide.load_state_pib_composition(state_code)
+
+  if local_code is not None:
+    composition = composition[composition['codigo'] == str(local_code)]
+  if year is not None:
+    composition = composition[composition['ano'] == int(year)]
+
+  return composition
+
+# Conjuntos expostos pela API. Os parâmetros aceitos são os argumentos das funções.
+DATASETS = {
+  'population_total': pop.get_population_total,
+  'population_age_group': pop.get_population_age_group,
+  'population_by_race': pop.get_population_by_race,
+  'population_by_local': pop.get_population_by_local,
+  'top_population_cities': pop.get_top_population_cities,
+  'total_pib': econ.get_total_pib,
+  'pib_per_capita': econ.get_pib_per_capita,
+  'crop_production': econ.get_crop_production,
+  'literacy_rate': educ.get_literacy_rate,
+  'pib_composition': get_pib_composition,
+}
+
+class InvalidParameters(ValueError):
+  """Parâmetros da URL que não correspondem aos argumentos da função de dados."""
+
+def _parameters(func) -> dict:
+  return {
+    name: parameter.default
+    for name, parameter in inspect.signature(func).parameters.items()
+  }
+
+def _arguments(func, query: dict) -> dict:
+  """
+  Converte os parâmetros da URL nos argumentos da função de dados.
+
+  Valores de argumentos com padrão inteiro (ex: `top_crops`) são convertidos para int;
+  os demais são repassados como texto, como nos callbacks dos dashboards.
+
+  Raises:
+      InvalidParameters: Se um parâmetro não existir na função ou não puder ser convertido.
+  """
+  parameters = _parameters(func)
+  arguments = {}
+
+  for name, value in query.items():
+    if name not in parameters:
+      raise InvalidParameters(f"Parâmetro desconhecido: {name}. Use um de {list(parameters)}.")
+
+    default = parameters[name]
+    if isinstance(default, int) and not isinstance(default, bool):
+      try:
+        value = int(value)
+      except ValueError:
+        raise InvalidParameters(f"O parâmetro {name} deve ser um número inteiro: {value!r}.") from None
+    arguments[name] = value
+
+  return arguments
+
+def to_frame(value) -> pd.DataFrame:
+  """Converte o resultado de uma função de dados (Series ou DataFrame) em uma tabela plana."""
+  if isinstance(value, pd.Series):
+    return value.to_frame().T.infer_objects().reset_index(drop=True)
+
+  return value.reset_index(drop=all(name is None for name in value.index.names))
+
+class _Chunks:
+  """Destino de escrita do pyarrow que acumula os bytes até serem enviados na resposta."""
+  closed = False
+
+  def __init__(self):
+    self._parts = []
+
+  def write(self, data) -> int:
+    self._parts.append(bytes(data))
+    return len(data)
+
+  def flush(self):
+    pass
+
+  def close(self):
+    pass
+
+  def drain(self) -> bytes:
+    data = b''.join(self._parts)
+    self._parts.clear()
+    return data
+
+def _csv_chunks(frame: pd.DataFrame):
+  for start in range(0, len(frame) or 1, CHUNK_ROWS):
+    yield frame.iloc[start:start + CHUNK_ROWS].to_csv(index=False, header=start == 0).encode('utf-8')
+
+def _arrow_chunks(frame: pd.DataFrame, open_writer):
+  # Cada bloco de linhas é escrito e enviado antes do próximo (um row group, no Parquet)
+  table = pa.Table.from_pandas(frame, preserve_index=False)
+  sink = _Chunks()
+
+  with open_writer(pa.PythonFile(sink, mode='w'), table.schema) as writer:
+    for batch in table.to_batches(max_chunksize=CHUNK_ROWS):
+      writer.write_batch(batch)
+      yield sink.drain()
+
+  yield sink.drain()
+
+def stream(frame: pd.DataFrame, output_format: str):
+  """
+  Serializa uma tabela em blocos de `CHUNK_ROWS` linhas.
+
+  Args:
+      frame (pd.DataFrame): Tabela a serializar.
+      output_format (str): 'csv', 'parquet' ou 'arrow' (formato de streaming do Arrow IPC).
+
+  Returns:
+      Gerador de blocos de bytes.
+  """
+  if output_format == 'csv':
+    return _csv_chunks(frame)
+  if output_format == 'parquet':
+    return _arrow_chunks(frame, pq.ParquetWriter)
+  return _arrow_chunks(frame, pa.ipc.new_stream)
+
+def dataset_version(func, arguments: dict, frame: pd.DataFrame) -> str:
+  """
+  Versão de um conjunto: a registrada no cache da camada de dados (ver `cached`) ou,
+  para conjuntos derivados sem cache próprio (ex: PIB per capita) e resultados fora
+  do cache, o hash da tabela.
+  """
+  version = func.version(**arguments) if hasattr(func, 'version') else None
+  return version or content_hash(frame)
+
+def _error(message: str, status: int):
+  return jsonify(error=message), status
+
+@api.route('/')
+def index():
+  # Conjuntos disponíveis, com os parâmetros aceitos e os valores padrão
+  return jsonify(
+    formats=list(FORMATS),
+    datasets={
+      name: {
+        'description': inspect.getdoc(func).splitlines()[0],
+        'parameters': {key: str(value) for key, value in _parameters(func).items()},
+      }
+      for name, func in DATASETS.items()
+    })
+
+@api.route('/<dataset>')
+def export(dataset):
+  func = DATASETS.get(dataset)
+  if func is None:
+    return _error(f"Conjunto desconhecido: {dataset}. Use um de {list(DATASETS)}.", 404)
+
+  query = request.args.to_dict()
+  output_format = query.pop('format', 'csv')
+  if output_format not in FORMATS:
+    return _error(f"Formato desconhecido: {output_format}. Use um de {list(FORMATS)}.", 400)
+
+  try:
+    arguments = _arguments(func, query)
+  except InvalidParameters as error:
+    return _error(f"Parâmetros inválidos para {dataset}: {error}", 400)
+
+  # Erros da camada de dados que não sejam do SIDRA são falhas do servidor (500)
+  try:
+    # Exportações não competem com os dashboards pelas vagas de consulta ao SIDRA
+    with priority('bulk'), allow_stale(), deadline(API_DEADLINE), track_staleness() as tracker:
+      frame = to_frame(func(**arguments))
+  except (SidraUnavailable, requests.RequestException) as error:
+    return _error(str(error), 503)
+
+  content_type, extension = FORMATS[output_format]
+  headers = {'Content-Disposition': f'attachment; filename="{dataset}.{extension}"'}
+
+  if tracker.stale:
+    # Dados desatualizados não recebem ETag, para não serem reaproveitados pelo cliente
+    headers['X-Statview-Stale'] = 'true'
+  else:
+    etag = f'{dataset_version(func, arguments, frame)}-{output_format}'
+    headers['ETag'] = f'"{etag}"'
+    if request.if_none_match.contains(etag):
+      return Response(status=304, headers={'ETag': headers['ETag']})
+
+  return Response(stream(frame, output_format), content_type=content_type, headers=headers)
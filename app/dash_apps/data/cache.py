@@ -0,0 +1,182 @@
+import functools
+import inspect
+import os
+from collections import OrderedDict
+
+from app.dash_apps.data.memo import recall
+from app.dash_apps.data.memory import ByteBudgetCache
+from app.dash_apps.data.sidra import mark_stale, track_staleness
+from app.dash_apps.data.versions import content_hash
+
+# Memória máxima (bytes) ocupada pelos resultados em cache, por worker
+MAX_BYTES = int(os.environ.get('STATVIEW_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+
+# Política de descarte ao atingir o limite de memória: 'lru' ou 'lfu'
+EVICTION_POLICY = os.environ.get('STATVIEW_CACHE_POLICY', 'lru')
+
+# Quantidade máxima de municípios (shards) mantidos em memória por worker.
+# Ao ultrapassar o limite, o município acessado há mais tempo é descartado por inteiro.
+MAX_SHARDS = int(os.environ.get('STATVIEW_CACHE_MAX_MUNICIPALITIES', 256))
+
+# Quantidade máxima de entradas por município (ex: um resultado por ano consultado)
+MAX_ENTRIES_PER_SHARD = int(os.environ.get('STATVIEW_CACHE_MAX_ENTRIES', 64))
+
+# Shard usado por funções que não dependem de uma localidade (ex: ranking estadual)
+GLOBAL_SHARD = 'global'
+
+class ShardedCache(ByteBudgetCache):
+  """
+  Cache em memória particionado por município, com orçamento em bytes.
+
+  Cada shard guarda os resultados de um município e é descartado por inteiro quando
+  o limite de shards é atingido (LRU). Dentro de cada shard, as entradas também
+  seguem LRU. Além disso, a memória ocupada por todas as entradas é limitada a
+  `max_bytes`, com descarte pela política configurada (ver data/memory.py), de modo
+  que poucos resultados grandes (ex: históricos de culturas) não esgotam a memória
+  do worker.
+
+  É seguro para uso concorrente (workers gthread).
+  """
+  def __init__(self, max_bytes: int = MAX_BYTES, policy: str = EVICTION_POLICY,
+               max_shards: int = MAX_SHARDS, max_entries: int = MAX_ENTRIES_PER_SHARD):
+    super().__init__(max_bytes, policy)
+    self.max_shards = max_shards
+    self.max_entries = max_entries
+    self._shards = OrderedDict()
+
+  def get(self, shard: str, key, default=None):
+    with self._lock:
+      value = super().get((shard, key), default)
+      if (shard, key) in self._entries:
+        self._shards.move_to_end(shard)
+        self._shards[shard].move_to_end(key)
+      return value
+
+  def set(self, shard: str, key, value, version: str = None):
+    with self._lock:
+      super().set((shard, key), value, version)
+      if (shard, key) not in self._entries:
+        return
+
+      entries = self._shards.setdefault(shard, OrderedDict())
+      entries[key] = None
+      entries.move_to_end(key)
+      self._shards.move_to_end(shard)
+
+      if len(entries) > self.max_entries:
+        self._remove((shard, next(iter(entries))), reason='entries')
+      while len(self._shards) > self.max_shards:
+        oldest = next(iter(self._shards))
+        for oldest_key in list(self._shards[oldest]):
+          self._remove((oldest, oldest_key), reason='shards')
+
+  def version(self, shard: str, key) -> str:
+    return super().version((shard, key))
+
+  def _remove(self, key, reason: str = None):
+    shard, shard_key = key
+    entries = self._shards.get(shard)
+    if entries is not None:
+      entries.pop(shard_key, None)
+      if not entries:
+        del self._shards[shard]
+    return super()._remove(key, reason)
+
+  def stats(self) -> dict:
+    with self._lock:
+      return dict(super().stats(), shards=len(self._shards))
+
+# Cache compartilhado pelas funções da camada de dados
+data_cache = ShardedCache()
+
+_MISSING = object()
+
+def cached(shard_param: str = None):
+  """
+  Decorador que guarda o resultado das funções de dados em `data_cache`.
+
+  A chave é formada pelo nome da função e pelos argumentos normalizados com `str`;
+  o shard é o valor do argumento `shard_param` (o código IBGE da localidade).
+  Cada resultado é guardado com a sua versão (hash do conteúdo, ver data/versions.py),
+  disponível em `func.version(*args, **kwargs)` para os caches que dependem dele.
+  Para funções materializadas (ver data/materialized.py), a versão é a da partição:
+  quando a materialização regrava a partição com outra versão, a entrada em memória
+  é descartada e a partição nova é lida.
+  `func.contains(*args, **kwargs)` e `func.prime(value, *args, **kwargs)` permitem
+  que consultas em lote (ex: `education.get_literacy_rates`) preencham o cache.
+
+  Resultados montados com dados desatualizados do SIDRA (ver data/sidra.py) não são
+  guardados e têm a nota de rodapé marcada como desatualizada.
+
+  Args:
+      shard_param (str, optional): Nome do argumento que identifica a localidade.
+          Se omitido, os resultados ficam no shard global.
+
+  Example:
+      >>> get_population_by_race.version(local_code='2211001', year='2022')
+      '3f9a0c1d2b4e5f60'
+  """
+  def decorator(func):
+    signature = inspect.signature(func)
+
+    def cache_key(args, kwargs) -> tuple:
+      bound = signature.bind(*args, **kwargs)
+      bound.apply_defaults()
+      params = tuple((key, str(value)) for key, value in bound.arguments.items())
+
+      shard = bound.arguments[shard_param] if shard_param else GLOBAL_SHARD
+      return str(shard), (func.__qualname__, params)
+
+    def partition_version(args, kwargs) -> str:
+      if not hasattr(func, 'partition_version'):
+        return None
+      return func.partition_version(*args, **kwargs)
+
+    def load(shard, key, args, kwargs):
+      partition = partition_version(args, kwargs)
+      value = data_cache.get(shard, key, _MISSING)
+      if value is not _MISSING and partition is not None and data_cache.version(shard, key) != partition:
+        # A partição foi regravada (ou criada) depois que o resultado entrou no cache
+        value = _MISSING
+
+      if value is _MISSING:
+        with track_staleness() as tracker:
+          value = func(*args, **kwargs)
+
+        if tracker.stale:
+          return mark_stale(value)
+        data_cache.set(shard, key, value, partition or content_hash(value))
+
+      return value
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+      shard, key = cache_key(args, kwargs)
+      # Chamadas repetidas na mesma requisição nem chegam ao cache (ver data/memo.py)
+      return recall(func.__qualname__, (shard, key), lambda: load(shard, key, args, kwargs))
+
+    def version(*args, **kwargs) -> str:
+      """
+      Versão (hash do conteúdo) do resultado em cache para os argumentos, sem consultar
+      o SIDRA: None se o resultado não estiver no cache (ex: maior que o orçamento de
+      memória ou desatualizado).
+      """
+      shard, key = cache_key(args, kwargs)
+      return data_cache.version(shard, key)
+
+    def contains(*args, **kwargs) -> bool:
+      """Indica se o resultado para os argumentos está no cache."""
+      shard, key = cache_key(args, kwargs)
+      return data_cache.version(shard, key) is not None
+
+    def prime(value, *args, **kwargs):
+      """Guarda no cache um resultado obtido por outro caminho (ex: uma consulta em lote)."""
+      shard, key = cache_key(args, kwargs)
+      data_cache.set(shard, key, value, content_hash(value))
+
+    wrapper.version = version
+    wrapper.contains = contains
+    wrapper.prime = prime
+    return wrapper
+
+  return decorator
@@ -1,18 +1,23 @@
-import sidrapy as sd
+from app.dash_apps.data import sidra
 import pandas as pd
 import numpy as np
-import app.dash_apps.data.population as pop
 
-from app.dash_apps.data.utils import verify_closest_year
-
-# Usado como cache improvisado para os dados de culturas (crops)
-# Recomenda-se substituir por uma implementação de cache real
-# Essa abordagem pode ser aplicada a outros conjuntos de dados para melhorar o desempenho após o primeiro uso
-crops_dfs = {}
-
-def get_total_pib(year='last')-> pd.Series:
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dash_apps.data.materialized import Incremental, materialized
+from app.dash_apps.data.cache import cached
+from app.dash_apps.data.memo import memoized
+from app.dash_apps.data.periods import period_list, resolved_year
+from app.dash_apps.data.indicators import get_indicator_row
+from app.dash_apps.data import statewide
+from app.dash_apps.data.store import store
+from app.dash_apps.data.versions import content_hash
+
+@resolved_year('5938')
+@cached('local_code')
+@materialized('total_pib')
+def get_total_pib(year='last', local_code=FLORIANO_CODE)-> pd.Series:
   """
-  Retorna o valor total do PIB (Produto Interno Bruto) do município de Floriano (PI)
+  Retorna o valor total do PIB (Produto Interno Bruto) de um município (por padrão, Floriano - PI)
   para um ano específico ou para o dado mais recente disponível.
 
   O valor retornado é convertido de milhares de reais para reais e inclui uma nota
@@ -21,6 +26,7 @@ def get_total_pib(year='last')-> pd.Series:
   Args:
       year (str or int, optional): Ano desejado no formato 'YYYY' ou 'last' (padrão),
           que retorna o dado mais recente disponível.
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
 
   Returns:
       pd.Series: Série contendo:
@@ -39,17 +45,14 @@ def get_total_pib(year='last')-> pd.Series:
       ValueError: Se não houver dados disponíveis para o ano especificado.
       KeyError: Se as colunas esperadas não forem encontradas na resposta da API.
   """
-  total_pib_years = ['last'] + [str(year) for year in range(2010, 2022)]
-  year = verify_closest_year(year, total_pib_years)
   pib_composition='5938'
   city='6'
-  floriano_code='2203909'
   total='37'
-  total_pib = sd.get_table(
+  total_pib = sidra.get_table(
           table_code=pib_composition,
           period=year,
           territorial_level=city,
-          ibge_territorial_code=floriano_code,
+          ibge_territorial_code=local_code,
           variable=total
       )
 
@@ -63,15 +66,17 @@ def get_total_pib(year='last')-> pd.Series:
   
   return total_pib
 
-def get_pib_per_capita(year='last'):
+@resolved_year('5938')
+@memoized
+def get_pib_per_capita(year='last', local_code=FLORIANO_CODE):
   """
-  Calcula o PIB per capita de Floriano com base no PIB total e na população estimada do ano correspondente.
+  Retorna o PIB per capita de um município (por padrão, Floriano) com base no PIB total e na população do ano correspondente.
 
-  O cálculo segue a lógica:
-    - Obtém o PIB total mais recente disponível para o ano solicitado.
-    - Busca a população estimada para o mesmo ano.
-    - Se a população estimada não estiver disponível, obtém a população oficial.
-    - Divide o PIB total pelo número de habitantes para calcular o PIB per capita.
+  O valor é lido dos indicadores derivados (`app.dash_apps.data.indicators`), calculados
+  de uma vez para todos os anos a partir das séries de PIB e população:
+    - A população do ano é a do Censo, quando houver, ou a estimativa anual.
+    - Se não houver população publicada para o ano do PIB, usa-se a do ano mais próximo.
+    - O PIB total é dividido pelo número de habitantes.
 
   Nota:
     Embora o valor não seja disponibilizado diretamente por APIs oficiais, o cálculo se aproxima bastante dos valores publicados.
@@ -82,44 +87,136 @@ def get_pib_per_capita(year='last'):
   Args:
       year (str or int, optional): Ano desejado no formato 'YYYY' ou 'last' (padrão),
           que retorna o dado mais recente disponível.
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
 
   Returns:
       pd.Series: Série pandas contendo:
-          - 'pib_per_capita' (float): PIB per capita calculado para Floriano.
+          - 'pib_per_capita' (float): PIB per capita calculado para o município.
           - 'ano' (int): Ano de referência dos dados utilizados.
           - 'footnote' (str): Nota indicando o ano dos dados usados no cálculo.
 
   Raises:
       ValueError: Se não for possível obter dados de PIB ou população para o ano especificado.
   """
-  total_population_years = ['last'] + [str(year) for year in range(2010, 2025)]
-  total_population_years.remove('2023')
-  
-  pib = get_total_pib(year)
-
-  if pib['ano'] not in total_population_years:
-    year = verify_closest_year(pib['ano'], total_population_years)
-    pib = get_total_pib(year)
-  
-  total_pop = pop.get_population_total(year=pib['ano'])
-
-  pib_per_capita = pib['total']/total_pop['total_populacao']
+  indicators = get_indicator_row(year, local_code)
   
   return pd.Series(
     {
-      'pib_per_capita':pib_per_capita, 
-      'ano': pib['ano'], 
-      'footnote': f'Calculado usando dados do ano de {pib['ano']}'
+      'pib_per_capita': indicators['pib_per_capita'], 
+      'ano': indicators['ano'], 
+      'footnote': f'Calculado usando dados do ano de {indicators['ano']}'
     })
 
-def get_crop_production(level="6",local_code="2203909", start_year=2010, end_year=2025, top_crops=3)-> pd.DataFrame:
+def fetch_crop_production(periods='all', level="6", local_code=FLORIANO_CODE) -> pd.DataFrame:
+  """
+  Baixa e limpa a produção das lavouras temporárias e permanentes (tabela SIDRA 5457)
+  de alguns períodos, para um nível territorial e código IBGE.
+
+  Usada por `load_crop_production` (todos os períodos) e pela sincronização incremental
+  da visão materializada (só os períodos novos, ver `materialized.sync_partition`).
+
+  Args:
+      periods (str or list, optional): Períodos a baixar, ou 'all' (padrão).
+      level (str, optional): Nível territorial da consulta (padrão: '6' para município).
+      local_code (str, optional): Código IBGE do local de interesse (padrão: '2203909').
+
+  Returns:
+      pd.DataFrame: DataFrame com as colunas 'medida', 'quantidade', 'ano' e 'produto',
+          ordenado pela quantidade produzida (decrescente), a partir de 2002.
+  """
+  temporary_permanent_crops_production_tb='5457'
+  crops = sidra.get_table(
+    table_code=temporary_permanent_crops_production_tb,
+    classifications={'782':"allxt"},
+    period=period_list(periods),
+    territorial_level=level,
+    ibge_territorial_code=local_code,
+    variable='214')
+  
+  crops.columns = crops.iloc[0]
+  crops = crops.iloc[1:].reset_index(drop=True)
+  
+  crops = crops.loc[:, ["Unidade de Medida","Valor","Ano","Produto das lavouras temporárias e permanentes"]]
+  
+  crops.columns = ["medida", "quantidade", "ano", "produto"]
+  
+  crops = crops[
+    (crops["quantidade"] != '...') &
+    (crops["medida"] == 'Toneladas') &
+    (crops["quantidade"] != 'X')
+  ].copy()
+  
+  crops["quantidade"] = crops["quantidade"].replace(['-', '..'], value='0')
+  crops["quantidade"] = crops["quantidade"].str.strip()
+  crops["quantidade"] = pd.to_numeric(crops["quantidade"], errors="coerce").fillna(0).astype(np.int32)
+  crops["ano"] = pd.to_numeric(crops["ano"], errors="coerce").fillna(0).astype(np.int32)
+  
+  crops = crops[crops["ano"] >= 2002]
+  
+  crops = crops.query("quantidade != 0")
+  
+  crops.sort_values(by='quantidade', ascending=False, inplace=True)
+
+  return crops
+
+@cached('local_code')
+@materialized('crop_production', incremental=Incremental('5457', fetch_crop_production, sort_by='quantidade', ascending=False))
+def load_crop_production(level="6", local_code=FLORIANO_CODE) -> pd.DataFrame:
+  """
+  Baixa e limpa o histórico completo de produção das lavouras temporárias e permanentes
+  (tabela SIDRA 5457) para um nível territorial e código IBGE.
+
+  Args:
+      level (str, optional): Nível territorial da consulta (padrão: '6' para município).
+      local_code (str, optional): Código IBGE do local de interesse (padrão: '2203909').
+
+  Returns:
+      pd.DataFrame: Ver `fetch_crop_production`.
+  """
+  return fetch_crop_production('all', level, local_code)
+
+def _store_crop_history(level, local_code):
+  """
+  Garante que o armazenamento local (ver data/store.py) tenha o histórico de produção
+  da localidade, baixando-o só se ele não estiver gravado ou o prazo tiver vencido.
+  """
+  if store.fresh('crop_production', local_code):
+    return
+
+  with sidra.track_staleness() as tracker:
+    crops = load_crop_production(level, local_code)
+
+  if tracker.stale and store.version('crop_production', local_code) is not None:
+    # Os dados já gravados continuam valendo; a próxima consulta tenta baixá-los de novo
+    return
+  store.ensure('crop_production', local_code, crops,
+               load_crop_production.version(level, local_code) or content_hash(crops), expired=tracker.stale)
+
+def load_crop_history(level="6", local_code=FLORIANO_CODE):
+  """
+  Carrega os dados de produção agrícola de que `get_crop_production` precisa.
+
+  Municípios do Piauí são atendidos pelo armazenamento estadual
+  (`app.dash_apps.data.statewide.get_state_crops`) quando ele já foi carregado (ver
+  `statewide.covers_crops`); as demais localidades baixam o próprio histórico
+  (`load_crop_production`) quando ele ainda não está no armazenamento local.
+  """
+  if statewide.covers_crops(level, local_code):
+    statewide.get_state_crops()
+  else:
+    _store_crop_history(level, local_code)
+
+def get_crop_production(level="6",local_code=FLORIANO_CODE, start_year=2010, end_year=2025, top_crops=3)-> pd.DataFrame:
   """
   Carrega e processa os dados de produção das lavouras temporárias e permanentes
   para um determinado nível territorial e código IBGE, retornando os principais cultivos
   por ano dentro do intervalo especificado.
 
-  A função utiliza um cache interno para otimizar consultas repetidas no mesmo nível
-  e localidade, evitando múltiplas chamadas à API para os mesmos dados.
+  Para municípios do Piauí, quando o armazenamento estadual (município × produto × ano)
+  já foi carregado, a seleção dos maiores cultivos é vetorizada. Para as demais localidades, a seleção é
+  uma consulta indexada ao armazenamento local (SQLite); o histórico completo só é
+  baixado (`load_crop_production`) se a localidade ainda não estiver gravada ou se o
+  prazo `STATVIEW_STORE_TTL` tiver vencido.
 
   Args:
       level (str, optional): Nível territorial da consulta (ex: '6' para município).
@@ -142,51 +239,13 @@ def get_crop_production(level="6",local_code="2203909", start_year=2010, end_yea
 
   Observações:
       - A função filtra para valores de produção maiores que zero e unidade em toneladas.
-      - A cache interna `crops_dfs` armazena os dados carregados para evitar múltiplas consultas
-        ao SIDRA para o mesmo nível e localidade.
+      - O armazenamento local (`app.dash_apps.data.store`) guarda o histórico carregado,
+        com descarte das localidades gravadas há mais tempo.
   """
-  key = f"{level}_{local_code}"
-  
-  crops = crops_dfs.get(key)
-  
-  if crops is None:
-    temporary_permanent_crops_production_tb='5457'
-    crops = sd.get_table(
-      table_code=temporary_permanent_crops_production_tb,
-      classifications={'782':"allxt"},
-      period='all',
-      territorial_level=level,
-      ibge_territorial_code=local_code,
-      variable='214')
-    
-    crops.columns = crops.iloc[0]
-    crops = crops.iloc[1:].reset_index(drop=True)
-    
-    crops = crops.loc[:, ["Unidade de Medida","Valor","Ano","Produto das lavouras temporárias e permanentes"]]
-    
-    crops.columns = ["medida", "quantidade", "ano", "produto"]
-    
-    crops = crops[
-      (crops["quantidade"] != '...') &
-      (crops["medida"] == 'Toneladas') &
-      (crops["quantidade"] != 'X')
-    ]
-    
-    crops.loc[:,"quantidade"] = crops.loc[:,"quantidade"].replace(['-', '..'], value='0')
-    crops.loc[:,"quantidade"] = crops.loc[:,"quantidade"].str.strip()
-    crops.loc[:,"quantidade"] = pd.to_numeric( crops.loc[:,"quantidade"], errors="coerce").fillna(0).astype(np.int32)
-    crops.loc[:,"ano"] = pd.to_numeric( crops.loc[:,"ano"], errors="coerce").fillna(0).astype(np.int32)
-    
-    crops = crops[crops["ano"] >= 2002]
-    
-    crops = crops.query("quantidade != 0")
-    
-    crops.sort_values(by='quantidade', ascending=False, inplace=True)
-
-    crops_dfs[key] = crops
-    
-  crops = crops.query(f"ano >= {start_year} and ano <= {end_year}")
-  
-  crops = crops.groupby("ano", group_keys=False).head(top_crops).sort_values(by='quantidade', ascending=False)
-  
-  return crops
+  if statewide.covers_crops(level, local_code):
+    return statewide.top_crops_for_municipality(local_code, start_year, end_year, top_crops)
+
+  _store_crop_history(level, local_code)
+
+  # Consulta indexada por localidade e ano (ver `app.dash_apps.data.store`)
+  return store.top_per_year('crop_production', local_code, start_year, end_year, top_crops)
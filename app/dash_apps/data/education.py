@@ -1,16 +1,20 @@
-import sidrapy as sd
+from app.dash_apps.data import sidra
 import pandas as pd
 import numpy as np
 import app.dash_apps.data.population as pop
 
-from app.dash_apps.data.utils import verify_closest_year
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dash_apps.data.materialized import materialized
+from app.dash_apps.data.cache import cached
+from app.dash_apps.data.periods import resolved_year
 
-# Usado como cache improvisado para os dados de culturas (crops)
-# Recomenda-se substituir por uma implementação de cache real
-# Essa abordagem pode ser aplicada a outros conjuntos de dados para melhorar o desempenho após o primeiro uso
-crops_dfs = {}
+# Localidades da comparação de alfabetização: Floriano, Piauí e Brasil
+LITERACY_COMPARISON = [('6', FLORIANO_CODE), ('3', '22'), ('1', '1')]
 
-def get_literacy_rate(level=6, code='2203909', year='last') -> pd.DataFrame:
+@resolved_year('9543')
+@cached('code')
+@materialized('literacy_rate')
+def get_literacy_rate(level=6, code=FLORIANO_CODE, year='last') -> pd.DataFrame:
   """
   Carrega e processa os dados da taxa de alfabetização a partir da tabela SIDRA (código 9543).
 
@@ -50,15 +54,24 @@ def get_literacy_rate(level=6, code='2203909', year='last') -> pd.DataFrame:
       ...
   """
   
-  literacy_rate = sd.get_table(
+  literacy_rate = sidra.get_table(
+    territorial_level=level,
+    ibge_territorial_code=code,
+    **literacy_query(year))
+
+  return clean_literacy_rate(literacy_rate)
+
+def literacy_query(year) -> dict:
+  """Argumentos da consulta à tabela 9543 (taxa de alfabetização por grupo de idade), exceto a localidade."""
+  return dict(
     table_code='9543',
     period=year,
-    territorial_level=level,
     classification="287",
     categories="93086,93087,2999,9482,9483,9484,3000",
-    ibge_territorial_code=code,
     variable='2513')
-  
+
+def clean_literacy_rate(literacy_rate: pd.DataFrame) -> pd.DataFrame:
+  """Limpa a resposta da tabela 9543 de uma localidade (ver `get_literacy_rate`)."""
   literacy_rate = literacy_rate.loc[:, ["MN", "V", "D4N", "D1N", "D2N"]]
   
   literacy_rate.columns = literacy_rate.iloc[0]
@@ -71,4 +84,45 @@ def get_literacy_rate(level=6, code='2203909', year='last') -> pd.DataFrame:
   
   literacy_rate['footnote'] = 'Dado disponível somente no ano de 2022'
   
-  return literacy_rate
+  return literacy_rate.infer_objects()
+
+@resolved_year('9543')
+def get_literacy_rates(locations=LITERACY_COMPARISON, year='last') -> list:
+  """
+  Retorna a taxa de alfabetização de várias localidades com uma única consulta ao SIDRA.
+
+  As localidades que ainda não estão no cache de `get_literacy_rate` são consultadas
+  juntas, em uma requisição com vários níveis territoriais (ver `sidra.get_tables`), e
+  cada resultado é guardado no cache da sua localidade. Assim, a comparação custa uma
+  única ida ao SIDRA, e a tabela e a nota de rodapé do município usam o cache.
+
+  Args:
+      locations (list, optional): Pares (nível territorial, código IBGE). Padrão:
+          Floriano, Piauí e Brasil.
+      year (str or int, optional): Ano da consulta (ver `get_literacy_rate`).
+
+  Returns:
+      list: Um DataFrame por localidade, na ordem de `locations`, no formato de
+          `get_literacy_rate`.
+
+  Example:
+      >>> floriano, piaui, brasil = get_literacy_rates()
+  """
+  missing = [(level, code) for level, code in locations if not get_literacy_rate.contains(level, code, year)]
+
+  # Com uma única localidade faltando, a consulta comum também lê as visões materializadas
+  if len(missing) > 1:
+    with sidra.track_staleness() as tracker:
+      frames = [clean_literacy_rate(frame) for frame in sidra.get_tables(missing, **literacy_query(year))]
+
+    if tracker.stale:
+      # Dados desatualizados não entram no cache (ver `cached`)
+      stale = {location: sidra.mark_stale(frame) for location, frame in zip(missing, frames)}
+      return [
+        stale[(level, code)] if (level, code) in stale else get_literacy_rate(level, code, year)
+        for level, code in locations]
+
+    for (level, code), frame in zip(missing, frames):
+      get_literacy_rate.prime(frame, level, code, year)
+
+  return [get_literacy_rate(level, code, year) for level, code in locations]
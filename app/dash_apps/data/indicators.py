@@ -0,0 +1,219 @@
+"""
+Indicadores derivados (PIB per capita, crescimento, CAGR e participação dos setores).
+
+Os indicadores são calculados para todos os anos de uma vez, com operações
+vetorizadas sobre séries anuais alinhadas pelo ano, a partir de duas consultas:
+a série completa da tabela 5938 (PIB e valor adicionado por setor) e a série de
+população. O resultado fica no cache junto com a versão dos dados de entrada;
+enquanto as entradas não mudam, qualquer indicador de qualquer ano é apenas uma
+leitura, sem novas consultas ao SIDRA.
+"""
+import numpy as np
+import pandas as pd
+
+from app.dash_apps.data import sidra
+from app.dash_apps.data.cache import cached, data_cache
+from app.dash_apps.data.materialized import Incremental, materialized
+from app.dash_apps.data.periods import period_list
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dash_apps.data.versions import content_hash
+
+# Variáveis da tabela 5938 (valores em mil reais)
+PIB_VARIABLES = {
+  '37': 'pib',
+  '498': 'valor_adicionado',
+  '513': 'agropecuaria',
+  '517': 'industria',
+  '6575': 'servicos',
+  '525': 'administracao_publica',
+  '543': 'impostos',
+}
+
+# Setores cuja participação no valor adicionado é calculada
+SECTORS = ['agropecuaria', 'industria', 'servicos', 'administracao_publica']
+
+def fetch_pib_series(periods='all', local_code=FLORIANO_CODE) -> pd.DataFrame:
+  """
+  Baixa o PIB e o valor adicionado por setor de um município (tabela SIDRA 5938) em
+  alguns períodos, com uma linha por ano, no formato de `load_pib_series`.
+
+  Args:
+      periods (str or list, optional): Períodos a baixar, ou 'all' (padrão).
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
+  """
+  series = sidra.get_table(
+    table_code='5938',
+    period=period_list(periods),
+    territorial_level='6',
+    ibge_territorial_code=local_code,
+    variable=','.join(PIB_VARIABLES))
+
+  series = series.loc[:, ['V', 'D2N', 'D3C']]
+  series.columns = ['valor', 'ano', 'variavel']
+  series = series.iloc[1:].reset_index(drop=True)
+
+  series['valor'] = pd.to_numeric(series['valor'], errors='coerce') * 1000
+  series['ano'] = pd.to_numeric(series['ano'], errors='coerce').fillna(0).astype(np.int32)
+
+  series = series.pivot_table(index='ano', columns='variavel', values='valor', aggfunc='first')
+  series = series.rename(columns=PIB_VARIABLES).reindex(columns=list(PIB_VARIABLES.values()))
+
+  return series.sort_index()
+
+@cached('local_code')
+@materialized('pib_series', incremental=Incremental('5938', fetch_pib_series))
+def load_pib_series(local_code=FLORIANO_CODE) -> pd.DataFrame:
+  """
+  Retorna a série histórica completa do PIB e do valor adicionado por setor de um
+  município (tabela SIDRA 5938), em reais, com uma linha por ano.
+
+  Args:
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
+
+  Returns:
+      pd.DataFrame: Índice 'ano' (int) e uma coluna (float) para cada variável de
+          `PIB_VARIABLES`.
+  """
+  return fetch_pib_series('all', local_code)
+
+@cached('local_code')
+@materialized('population_series')
+def load_population_series(local_code=FLORIANO_CODE) -> pd.DataFrame:
+  """
+  Retorna a série histórica da população de um município, com uma linha por ano.
+
+  Usa o Censo (tabela 9605) nos anos em que ele existe e as estimativas anuais
+  (tabela 6579) nos demais, como `get_population_total`.
+
+  Args:
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
+
+  Returns:
+      pd.DataFrame: Índice 'ano' (int) e a coluna 'populacao' (float).
+  """
+  def clean(data):
+    data = data.loc[:, ['V', 'D2N']].iloc[1:]
+    data.columns = ['populacao', 'ano']
+    data['populacao'] = pd.to_numeric(data['populacao'], errors='coerce')
+    data['ano'] = pd.to_numeric(data['ano'], errors='coerce').fillna(0).astype(np.int32)
+    return data.dropna().set_index('ano')
+
+  census = clean(sidra.get_table(
+    table_code='9605',
+    territorial_level='6',
+    categories=9521,
+    variable='93',
+    ibge_territorial_code=local_code,
+    period='all'))
+
+  estimates = clean(sidra.get_table(
+    table_code='6579',
+    territorial_level='6',
+    variable='9324',
+    ibge_territorial_code=local_code,
+    period='all'))
+
+  return census.combine_first(estimates).sort_index()
+
+def compute_indicators(pib: pd.DataFrame, population: pd.DataFrame) -> pd.DataFrame:
+  """
+  Calcula os indicadores derivados para todos os anos da série do PIB.
+
+  Anos sem população publicada usam a população do ano mais próximo.
+
+  Args:
+      pib (pd.DataFrame): Saída de `load_pib_series`.
+      population (pd.DataFrame): Saída de `load_population_series`.
+
+  Returns:
+      pd.DataFrame: Índice 'ano' e as colunas:
+          - 'pib', 'populacao' e 'pib_per_capita' (float);
+          - 'crescimento_pib' (float): variação anual do PIB, em % (anualizada se
+            houver anos faltando na série);
+          - 'cagr_pib' (float): crescimento anual composto desde o primeiro ano, em %;
+          - 'participacao_<setor>' (float): participação de cada setor de `SECTORS`
+            no valor adicionado, em %.
+  """
+  years = pib.index.to_numpy()
+  pib_values = pib['pib'].to_numpy(dtype=np.float64)
+  population_values = population['populacao'].reindex(years, method='nearest').to_numpy(dtype=np.float64)
+
+  growth = np.full(len(years), np.nan)
+  cagr = np.full(len(years), np.nan)
+  if len(years) > 1:
+    gaps = np.diff(years)
+    growth[1:] = (pib_values[1:] / pib_values[:-1]) ** (1 / gaps) - 1
+
+    elapsed = years[1:] - years[0]
+    cagr[1:] = (pib_values[1:] / pib_values[0]) ** (1 / elapsed) - 1
+
+  shares = pib[SECTORS].to_numpy(dtype=np.float64) / pib['valor_adicionado'].to_numpy(dtype=np.float64)[:, None]
+
+  indicators = pd.DataFrame(
+    {
+      'pib': pib_values,
+      'populacao': population_values,
+      'pib_per_capita': pib_values / population_values,
+      'crescimento_pib': growth * 100,
+      'cagr_pib': cagr * 100,
+    },
+    index=pib.index)
+
+  for position, sector in enumerate(SECTORS):
+    indicators[f'participacao_{sector}'] = shares[:, position] * 100
+
+  return indicators
+
+def get_indicators(local_code=FLORIANO_CODE) -> pd.DataFrame:
+  """
+  Retorna os indicadores derivados de um município para todos os anos.
+
+  O resultado é guardado no cache do município junto com a versão das entradas:
+  é recalculado apenas quando as séries de PIB ou população mudam (ex: depois de
+  uma nova materialização).
+
+  Args:
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
+
+  Returns:
+      pd.DataFrame: Ver `compute_indicators`.
+
+  Example:
+      >>> list(get_indicators().columns)
+      ['pib', 'populacao', 'pib_per_capita', 'crescimento_pib', 'cagr_pib', 'participacao_agropecuaria', 'participacao_industria', 'participacao_servicos', 'participacao_administracao_publica']
+  """
+  pib = load_pib_series(local_code=local_code)
+  population = load_population_series(local_code=local_code)
+
+  # As versões das séries já foram calculadas quando elas entraram no cache. Séries
+  # fora do cache (ex: desatualizadas) não têm versão, e o resultado não é guardado.
+  versions = (load_pib_series.version(local_code=local_code),
+              load_population_series.version(local_code=local_code))
+  if None in versions:
+    return compute_indicators(pib, population)
+
+  key = ('get_indicators',) + versions
+  indicators = data_cache.get(str(local_code), key)
+  if indicators is None:
+    indicators = compute_indicators(pib, population)
+    data_cache.set(str(local_code), key, indicators, content_hash(indicators))
+
+  return indicators
+
+def get_indicator_row(year, local_code=FLORIANO_CODE) -> pd.Series:
+  """
+  Retorna os indicadores de um ano (ou do ano mais próximo presente na série).
+
+  Args:
+      year (str or int): Ano desejado.
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
+
+  Returns:
+      pd.Series: Linha de `get_indicators`, com o campo 'ano' (int).
+  """
+  indicators = get_indicators(local_code)
+  position = indicators.index.get_indexer([int(year)], method='nearest')[0]
+
+  row = indicators.iloc[position].astype(object)
+  row['ano'] = int(indicators.index[position])
+  return row
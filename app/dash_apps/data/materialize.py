@@ -0,0 +1,148 @@
+"""
+Job de materialização das visões por ano e localidade em Parquet.
+
+Calcula o DataFrame já limpo de cada painel para todos os anos e localidades que a
+interface pode solicitar e grava cada resultado em uma partição Parquet. As funções
+de dados leem essas partições (com memory-map) antes de consultar o SIDRA, de modo
+que a latência dos callbacks não depende da API e workers recém-iniciados já servem
+a partir do disco.
+
+As visões de histórico completo (tabelas 5938 e 5457) são sincronizadas de forma
+incremental: só os períodos publicados desde a última execução, mais uma pequena
+janela de revisão, são baixados e mesclados à partição existente (ver
+`materialized.sync_partition`). Com `--full`, todas as visões são baixadas por inteiro.
+
+Pensado para ser executado periodicamente (ex: todas as noites via cron):
+    STATVIEW_MATERIALIZED_DIR=materialized python -m app.dash_apps.data.materialize [--full]
+"""
+import argparse
+import sys
+
+from app.dash_apps.data import economy as econ
+from app.dash_apps.data import education as educ
+from app.dash_apps.data import indicators
+from app.dash_apps.data import population as pop
+from app.dash_apps.data import statewide
+from app.dash_apps.data.materialized import MATERIALIZED_DIR, refresh_partition, sync_partition
+from app.dash_apps.data.sidra import priority
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dash_apps.layout import composicao_pib
+from app.dash_apps.layout.config.options import city_code_options, state_code_options, years
+
+FLORIANO = {'level': '6', 'local_code': FLORIANO_CODE}
+
+# Localidades usadas na comparação de alfabetização (Floriano x Piauí x Brasil)
+LITERACY_LOCATIONS = [
+  {'level': '6', 'code': FLORIANO_CODE},
+  {'level': '3', 'code': '22'},
+  {'level': '1', 'code': '1'},
+]
+
+def build_plan() -> list:
+  """
+  Monta a lista de partições a materializar, como pares (função, argumentos).
+
+  Os indicadores derivados (ex: PIB per capita) não são materializados: são
+  calculados a partir das séries de PIB e população, que são.
+
+  Os anos são resolvidos para os períodos existentes nas tabelas (ver data/periods.py),
+  então anos da interface que caem no mesmo período geram uma única partição.
+  """
+  ui_years = ['last'] + [year for year in years if year != 'Mais Recente']
+  locations = list(city_code_options.values()) + list(state_code_options.values())
+
+  plan = []
+
+  for year in ui_years:
+    plan += [
+      (pop.get_population_total, {'year': year}),
+      (pop.get_population_age_group, {'year': year}),
+      (pop.get_top_population_cities, {'year': year}),
+      (pop.get_population_by_race, dict(FLORIANO, year=year)),
+      (pop.get_population_by_local, dict(FLORIANO, year=year)),
+      (econ.get_total_pib, {'year': year}),
+    ]
+    plan += [
+      (pop.get_population_by_race, {'level': location['level'], 'local_code': location['code'], 'year': year})
+      for location in locations
+    ]
+
+  plan += [
+    (indicators.load_pib_series, {'local_code': FLORIANO['local_code']}),
+    (indicators.load_population_series, {'local_code': FLORIANO['local_code']}),
+  ]
+
+  plan += [
+    (pop.get_population_by_local, {'level': location['level'], 'local_code': location['code']})
+    for location in locations
+  ]
+  plan += [(educ.get_literacy_rate, location) for location in LITERACY_LOCATIONS]
+  plan += [
+    (statewide.load_state_crop_production, {}),
+    (pop.get_municipality_name, {'local_code': FLORIANO['local_code']}),
+    (statewide.load_state_pib_composition, {}),
+    (composicao_pib.load_data, {}),
+  ]
+
+  return _resolve_plan(plan)
+
+def _resolve_plan(plan: list) -> list:
+  resolved_plan = []
+  seen = set()
+
+  for func, kwargs in plan:
+    if hasattr(func, 'resolve_arguments'):
+      kwargs = func.resolve_arguments(kwargs)
+
+    key = (func.materialized_name, tuple(sorted((name, str(value)) for name, value in kwargs.items())))
+    if key not in seen:
+      seen.add(key)
+      resolved_plan.append((func, kwargs))
+
+  return resolved_plan
+
+def run(full: bool = False) -> list:
+  """
+  Executa o plano de materialização, gravando as partições em `MATERIALIZED_DIR`.
+
+  Falhas em partições individuais (ex: indisponibilidade do SIDRA) não interrompem
+  o job; a partição anterior, se existir, continua sendo servida. As consultas usam a
+  prioridade 'refresh', cedendo a vez aos callbacks interativos. Partições cujos dados
+  não mudaram não são regravadas (ver `materialized.store_partition`).
+
+  Args:
+      full (bool, optional): Baixa por inteiro também as visões incrementais.
+
+  Returns:
+      list: Lista de (nome da visão, argumentos, erro) das partições que falharam.
+  """
+  failures = []
+
+  with priority('refresh'):
+    for func, kwargs in build_plan():
+      try:
+        if func.incremental is None or full:
+          refresh_partition(func, **kwargs)
+        else:
+          periods = sync_partition(func, **kwargs)
+          print(f"{func.materialized_name} {kwargs}: " + (
+            f"períodos sincronizados {periods}" if periods else "baixada por inteiro"))
+      except Exception as error:
+        failures.append((func.materialized_name, kwargs, error))
+        print(f"Falha ao materializar {func.materialized_name} {kwargs}: {error}")
+
+  return failures
+
+def main():
+  parser = argparse.ArgumentParser(description="Materializa as visões por ano e localidade em Parquet.")
+  parser.add_argument('--full', action='store_true', help="Baixa por inteiro também as visões incrementais.")
+  args = parser.parse_args()
+
+  print(f"Materializando visões em '{MATERIALIZED_DIR}'...")
+  failures = run(full=args.full)
+
+  print(f"Materialização concluída com {len(failures)} falha(s).")
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,262 @@
+import functools
+import inspect
+import os
+from dataclasses import dataclass
+from typing import Callable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.dash_apps.data.periods import get_periods
+from app.dash_apps.data.versions import content_hash
+
+# Diretório das visões materializadas. Pode ser alterado pela variável de ambiente
+# STATVIEW_MATERIALIZED_DIR (ex: um volume compartilhado entre os workers).
+MATERIALIZED_DIR = os.environ.get('STATVIEW_MATERIALIZED_DIR', 'materialized')
+
+# Nome do arquivo gravado em cada partição
+PARTITION_FILE = 'data.parquet'
+
+# Chave dos metadados do Parquet que indica se o valor original era uma pd.Series
+KIND_METADATA_KEY = b'statview_kind'
+
+# Chave dos metadados do Parquet com a versão (hash do conteúdo) dos dados gravados
+VERSION_METADATA_KEY = b'statview_version'
+
+# Chave dos metadados do Parquet com o período mais recente já sincronizado (visões incrementais)
+SYNCED_METADATA_KEY = b'statview_synced_through'
+
+# Períodos mais recentes já gravados que são baixados de novo a cada sincronização
+# incremental, para incorporar as revisões do IBGE (ex: o PIB do ano anterior)
+REVISION_PERIODS = int(os.environ.get('STATVIEW_SYNC_REVISION_PERIODS', 2))
+
+@dataclass(frozen=True)
+class Incremental:
+  """
+  Como atualizar uma visão de histórico completo baixando só os períodos novos.
+
+  Args:
+      table_code (str): Tabela do SIDRA cujos períodos compõem a visão.
+      fetch (Callable): Função `fetch(periods, **argumentos da visão)` que baixa e limpa
+          apenas os períodos informados, no mesmo formato da visão.
+      sort_by (str, optional): Coluna (ou nível do índice) que ordena a visão (padrão: 'ano').
+      ascending (bool, optional): Ordem crescente (padrão) ou decrescente.
+  """
+  table_code: str
+  fetch: Callable
+  sort_by: str = 'ano'
+  ascending: bool = True
+
+def partition_path(name: str, params: dict, root: str = None) -> str:
+  """
+  Monta o caminho da partição (no estilo Hive) para uma função e seus argumentos.
+
+  Todos os valores são normalizados com `str`, de modo que chamadas com `6` e `'6'`
+  ou `2203909` e `'2203909'` apontem para a mesma partição.
+
+  Example:
+      >>> partition_path('population_by_race', {'level': 6, 'local_code': '2203909', 'year': 'last'})
+      'materialized/population_by_race/level=6/local_code=2203909/year=last/data.parquet'
+  """
+  parts = [f"{key}={value}" for key, value in params.items()]
+  return os.path.join(root or MATERIALIZED_DIR, name, *parts, PARTITION_FILE)
+
+def _bind_params(func, args, kwargs) -> dict:
+  bound = inspect.signature(func).bind(*args, **kwargs)
+  bound.apply_defaults()
+  return {key: str(value) for key, value in bound.arguments.items()}
+
+def write_partition(path: str, value, metadata: dict = None):
+  """
+  Grava um DataFrame ou uma Series em Parquet.
+
+  A gravação é feita em um arquivo temporário e depois movida para o destino,
+  para que os workers nunca leiam uma partição incompleta.
+
+  Args:
+      path (str): Caminho da partição.
+      value (pd.DataFrame or pd.Series): Valor a gravar.
+      metadata (dict, optional): Metadados adicionais (bytes -> bytes) do arquivo.
+  """
+  kind = b'series' if isinstance(value, pd.Series) else b'frame'
+  frame = value.to_frame().T if isinstance(value, pd.Series) else value
+  frame = frame.infer_objects()
+
+  table = pa.Table.from_pandas(frame)
+  table = table.replace_schema_metadata({**(table.schema.metadata or {}), **(metadata or {}), KIND_METADATA_KEY: kind})
+
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  temporary_path = path + '.tmp'
+  pq.write_table(table, temporary_path)
+  os.replace(temporary_path, path)
+
+def read_partition(path: str):
+  """Lê uma partição usando memory-map, devolvendo uma Series ou um DataFrame conforme gravado."""
+  table = pq.read_table(path, memory_map=True)
+  frame = table.to_pandas()
+
+  if table.schema.metadata.get(KIND_METADATA_KEY) == b'series':
+    return frame.iloc[0].astype(object)
+
+  return frame
+
+def read_metadata(path: str) -> dict:
+  """Lê os metadados de uma partição sem carregar os dados."""
+  return pq.read_schema(path).metadata or {}
+
+# Caminho da partição -> (mtime em ns, versão), para não reler os metadados a cada consulta
+_partition_versions = {}
+
+def partition_version(path: str) -> str:
+  """
+  Versão (hash do conteúdo) gravada nos metadados da partição, ou None se a partição
+  não existir ou não tiver versão. Os metadados só são relidos quando o arquivo muda.
+  """
+  try:
+    mtime = os.stat(path).st_mtime_ns
+  except FileNotFoundError:
+    return None
+
+  known = _partition_versions.get(path)
+  if known is not None and known[0] == mtime:
+    return known[1]
+
+  version = read_metadata(path).get(VERSION_METADATA_KEY)
+  version = version.decode() if version else None
+  _partition_versions[path] = (mtime, version)
+  return version
+
+def store_partition(path: str, value, metadata: dict = None) -> bool:
+  """
+  Grava uma partição com a versão (hash do conteúdo) dos dados nos metadados.
+
+  Se a partição existente já tem a mesma versão e os mesmos metadados, nada é
+  gravado: uma atualização que traz os mesmos dados não altera o arquivo.
+
+  Returns:
+      bool: True se a partição foi gravada; False se já estava atualizada.
+  """
+  metadata = {**(metadata or {}), VERSION_METADATA_KEY: content_hash(value).encode()}
+
+  if os.path.exists(path):
+    stored = read_metadata(path)
+    if all(stored.get(key) == item for key, item in metadata.items()):
+      return False
+
+  write_partition(path, value, metadata)
+  return True
+
+def materialized(name: str, incremental: Incremental = None):
+  """
+  Decorador que adiciona às funções de dados um caminho de leitura a partir das
+  visões materializadas em Parquet.
+
+  Se existir uma partição para os argumentos da chamada, ela é lida do disco sem
+  nenhuma consulta ao SIDRA; caso contrário, a função original é executada.
+  A função original continua acessível em `func.__wrapped__` e é usada pelo job de
+  materialização (`app.dash_apps.data.materialize`). `func.partition_version(*args, **kwargs)`
+  retorna a versão da partição dos argumentos (ver `partition_version`), usada pelo
+  cache em memória para descartar resultados de uma partição já regravada.
+
+  Args:
+      name (str): Nome da visão, usado como diretório raiz das partições.
+      incremental (Incremental, optional): Para visões de histórico completo, como
+          baixar só os períodos novos (ver `sync_partition`).
+  """
+  def decorator(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+      path = partition_path(name, _bind_params(func, args, kwargs))
+
+      if os.path.exists(path):
+        return read_partition(path)
+
+      return func(*args, **kwargs)
+
+    wrapper.materialized_name = name
+    wrapper.incremental = incremental
+    wrapper.partition_version = lambda *args, **kwargs: partition_version(
+      partition_path(name, _bind_params(func, args, kwargs)))
+    return wrapper
+
+  return decorator
+
+def refresh_partition(func, root: str = None, **kwargs) -> str:
+  """
+  Executa a função original (sem passar pelo disco) e grava o resultado na partição
+  correspondente aos argumentos.
+
+  Args:
+      func: Função decorada com `materialized`.
+      root (str, optional): Diretório raiz; padrão `MATERIALIZED_DIR`.
+      **kwargs: Argumentos da função.
+
+  Returns:
+      bool: True se a partição foi gravada; False se os dados não mudaram (ver
+          `store_partition`).
+  """
+  original = inspect.unwrap(func)
+  path = partition_path(func.materialized_name, _bind_params(original, (), kwargs), root)
+  return store_partition(path, original(**kwargs), _synced_metadata(func))
+
+def _synced_metadata(func) -> dict:
+  if func.incremental is None:
+    return {}
+  return {SYNCED_METADATA_KEY: str(get_periods(func.incremental.table_code)[-1]).encode()}
+
+def sync_periods(available: tuple, synced_through: int) -> list:
+  """
+  Períodos a baixar em uma sincronização incremental: os publicados depois de
+  `synced_through` e os `REVISION_PERIODS` mais recentes até ele.
+
+  Example:
+      >>> sync_periods((2019, 2020, 2021, 2022), synced_through=2021)
+      [2020, 2021, 2022]
+  """
+  stored = [period for period in available if period <= synced_through]
+  revised = stored[-REVISION_PERIODS:] if REVISION_PERIODS else []
+  return revised + [period for period in available if period > synced_through]
+
+def sync_partition(func, root: str = None, **kwargs) -> list:
+  """
+  Atualiza a partição de uma visão incremental baixando só os períodos novos.
+
+  O período mais recente sincronizado fica nos metadados da partição (por tabela e
+  localidade). Os períodos de `sync_periods` são baixados com `incremental.fetch` e
+  substituem as linhas desses períodos na partição; as demais são mantidas. Assim, o
+  volume baixado por atualização não cresce com o tamanho do histórico. Sem partição
+  anterior (ou sem o metadado), a visão é baixada por inteiro com `refresh_partition`.
+
+  Args:
+      func: Função decorada com `materialized(..., incremental=...)`.
+      root (str, optional): Diretório raiz; padrão `MATERIALIZED_DIR`.
+      **kwargs: Argumentos da função.
+
+  Returns:
+      list: Períodos baixados (vazia quando a visão foi baixada por inteiro).
+  """
+  original = inspect.unwrap(func)
+  path = partition_path(func.materialized_name, _bind_params(original, (), kwargs), root)
+
+  synced_through = read_metadata(path).get(SYNCED_METADATA_KEY) if os.path.exists(path) else None
+  if synced_through is None:
+    refresh_partition(func, root, **kwargs)
+    return []
+
+  incremental = func.incremental
+  available = get_periods(incremental.table_code)
+  periods = sync_periods(available, int(synced_through))
+
+  stored = read_partition(path)
+  fresh = incremental.fetch(periods, **kwargs)
+
+  # O período pode estar nas colunas (formato longo) ou no índice (uma linha por ano)
+  stored_periods = stored['ano'] if 'ano' in stored.columns else stored.index.get_level_values('ano')
+  merged = pd.concat([stored[~stored_periods.isin(periods)], fresh])
+  merged = merged.sort_values(incremental.sort_by, ascending=incremental.ascending, kind='stable')
+  if 'ano' in merged.columns:
+    merged = merged.reset_index(drop=True)
+
+  store_partition(path, merged, {SYNCED_METADATA_KEY: str(max(available[-1], int(synced_through))).encode()})
+  return periods
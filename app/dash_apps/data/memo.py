@@ -0,0 +1,123 @@
+"""
+Memoização por requisição da camada de dados.
+
+Dentro de um mesmo callback, as mesmas chamadas à camada de dados se repetem (ex:
+o PIB per capita é lido pela métrica e pela sua nota de rodapé; a comparação com o
+estado, pelo gráfico e pela nota). `request_memo` abre um contexto, um por
+invocação de callback (ver `callbacks.latency_bounded`), em que chamadas idênticas
+às funções de dados são executadas uma única vez.
+
+Ao contrário do cache da camada de dados, o memo não depende de nenhum estado
+global nem tem limite de memória: vale só até o fim da requisição, também para
+funções sem cache próprio (decoradas com `memoized`). Fora de um contexto, as
+funções são chamadas normalmente.
+
+Example:
+    >>> with request_memo() as memo:
+    ...     get_metric_pib_per_capita(), get_metric_pib_per_capita_info()
+    >>> memo.stats()['get_pib_per_capita']
+    {'calls': 1, 'hits': 1}
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import inspect
+
+from app.dash_apps.data.sidra import flag_stale, track_staleness
+
+_memo = contextvars.ContextVar('statview_request_memo', default=None)
+
+class RequestMemo:
+  """Resultados e contadores das chamadas memoizadas de uma requisição."""
+  def __init__(self):
+    self._values = {}
+    # Chamadas executadas e chamadas atendidas pelo memo, por função
+    self.calls = collections.Counter()
+    self.hits = collections.Counter()
+
+  def stats(self) -> dict:
+    """Chamadas executadas ('calls') e repetidas ('hits') de cada função."""
+    return {name: {'calls': self.calls[name], 'hits': self.hits[name]} for name in sorted(self.calls | self.hits)}
+
+@contextlib.contextmanager
+def request_memo():
+  """
+  Abre o memo da requisição. Contextos aninhados reaproveitam o memo mais externo.
+
+  Yields:
+      RequestMemo: O memo ativo, com os contadores de chamadas.
+  """
+  current = _memo.get()
+  if current is not None:
+    yield current
+    return
+
+  memo = RequestMemo()
+  token = _memo.set(memo)
+  try:
+    yield memo
+  finally:
+    _memo.reset(token)
+
+def request_scoped(func):
+  """Decorador que executa um callback dentro de `request_memo`."""
+  @functools.wraps(func)
+  def wrapper(*args, **kwargs):
+    with request_memo():
+      return func(*args, **kwargs)
+  return wrapper
+
+def recall(name: str, key, compute):
+  """
+  Retorna o resultado de `compute()` memoizado na requisição atual sob `key`.
+
+  Exceções não são memoizadas. Resultados montados com dados desatualizados do SIDRA
+  marcam de novo os rastreadores ativos a cada repetição (ver `sidra.track_staleness`),
+  para que cada painel saiba que exibe dados desatualizados.
+
+  Args:
+      name (str): Nome da função, usado nos contadores.
+      key: Chave (hashable) da chamada.
+      compute (callable): Executa a chamada.
+  """
+  memo = _memo.get()
+  if memo is None:
+    return compute()
+
+  if key in memo._values:
+    memo.hits[name] += 1
+    value, stale = memo._values[key]
+    if stale:
+      flag_stale()
+    return value
+
+  with track_staleness() as tracker:
+    value = compute()
+
+  memo.calls[name] += 1
+  memo._values[key] = (value, tracker.stale)
+  return value
+
+def _normalize(value):
+  if isinstance(value, dict):
+    return tuple(sorted((str(name), _normalize(item)) for name, item in value.items()))
+  return str(value)
+
+def memoized(func):
+  """
+  Decorador que memoiza as chamadas de uma função de dados na requisição atual.
+
+  Os argumentos são normalizados com `str`, como em `cached`: `year=2022` e
+  `year='2022'` são a mesma chamada.
+  """
+  signature = inspect.signature(func)
+
+  @functools.wraps(func)
+  def wrapper(*args, **kwargs):
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    key = (func.__qualname__, _normalize(bound.arguments))
+    return recall(func.__qualname__, key, lambda: func(*args, **kwargs))
+
+  return wrapper
@@ -0,0 +1,216 @@
+"""
+Cache em memória com orçamento em bytes.
+
+Base de todos os caches da camada de dados (ver data/cache.py e data/sidra.py):
+em vez de limitar a quantidade de entradas, limita a memória ocupada por elas,
+medida com `memory_usage(deep=True)` para DataFrames e Series. Quando o orçamento
+é ultrapassado, entradas são descartadas pela política configurada:
+
+- 'lru': a usada há mais tempo;
+- 'lfu': a menos usada (em caso de empate, a usada há mais tempo).
+"""
+import dataclasses
+import os
+import sys
+import threading
+import weakref
+from collections import Counter, OrderedDict
+
+import numpy as np
+import pandas as pd
+
+POLICIES = ('lru', 'lfu')
+
+_instances = weakref.WeakSet()
+
+def sizeof(value) -> int:
+  """
+  Estima a memória ocupada por um valor, em bytes.
+
+  DataFrames e Series são medidos com `memory_usage(deep=True)` (incluindo o conteúdo
+  das strings); arrays numpy com `nbytes`; dataclasses, tuplas, listas e dicionários
+  pela soma dos seus itens.
+
+  Example:
+      >>> sizeof(np.zeros(1000))
+      8000
+  """
+  if isinstance(value, pd.DataFrame):
+    return int(value.memory_usage(deep=True).sum())
+  if isinstance(value, (pd.Series, pd.Index)):
+    return int(value.memory_usage(deep=True))
+  if isinstance(value, np.ndarray):
+    if value.dtype == object:
+      return value.nbytes + sum(sys.getsizeof(item) for item in value.ravel())
+    return value.nbytes
+  if dataclasses.is_dataclass(value) and not isinstance(value, type):
+    return sum(sizeof(getattr(value, field.name)) for field in dataclasses.fields(value))
+  if isinstance(value, (tuple, list)):
+    return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+  if isinstance(value, dict):
+    return sys.getsizeof(value) + sum(sizeof(key) + sizeof(item) for key, item in value.items())
+  return sys.getsizeof(value)
+
+def freeze(value):
+  """
+  Marca como somente leitura os arrays numpy de um valor (array ou dataclass de arrays).
+
+  Estruturas carregadas antes do fork dos workers (ver gunicorn.conf.py) ficam em
+  páginas compartilhadas (copy-on-write) enquanto ninguém escreve nelas; com os arrays
+  congelados, uma escrita acidental falha em vez de copiar a página silenciosamente.
+
+  Returns:
+      O próprio valor.
+  """
+  if isinstance(value, np.ndarray):
+    value.flags.writeable = False
+  elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+    for field in dataclasses.fields(value):
+      freeze(getattr(value, field.name))
+  return value
+
+class _Entry:
+  __slots__ = ('value', 'size', 'hits', 'version')
+
+  def __init__(self, value, size: int, version: str = None):
+    self.value = value
+    self.size = size
+    self.hits = 0
+    self.version = version
+
+class ByteBudgetCache:
+  """
+  Cache em memória limitado pela quantidade de bytes ocupados pelas entradas.
+
+  Valores maiores que o orçamento inteiro não são guardados. É seguro para uso
+  concorrente (workers gthread).
+
+  Args:
+      max_bytes (int): Orçamento de memória, em bytes.
+      policy (str, optional): 'lru' (padrão) ou 'lfu'.
+
+  Example:
+      >>> cache = ByteBudgetCache(max_bytes=64 * 1024 ** 2)
+      >>> cache.set('pib', data)
+      >>> cache.get('pib') is data
+      True
+  """
+  def __init__(self, max_bytes: int, policy: str = 'lru'):
+    if policy not in POLICIES:
+      raise ValueError(f"Política de descarte desconhecida: {policy}. Use uma de {list(POLICIES)}.")
+
+    self.max_bytes = max_bytes
+    self.policy = policy
+    self._entries = OrderedDict()
+    self._bytes = 0
+    self._counters = Counter()
+    self._lock = threading.RLock()
+    _instances.add(self)
+
+  def get(self, key, default=None):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        self._counters['misses'] += 1
+        return default
+
+      self._counters['hits'] += 1
+      entry.hits += 1
+      self._entries.move_to_end(key)
+      return entry.value
+
+  def set(self, key, value, version: str = None):
+    size = sizeof(value)
+
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+
+      if size > self.max_bytes:
+        self._counters['rejected'] += 1
+        return
+
+      self._entries[key] = _Entry(value, size, version)
+      self._bytes += size
+
+      while self._bytes > self.max_bytes:
+        self._remove(self._victim(exclude=key), reason='bytes')
+
+  def version(self, key) -> str:
+    """Versão (hash do conteúdo) registrada com a entrada, sem contar como acesso."""
+    with self._lock:
+      entry = self._entries.get(key)
+      return entry.version if entry is not None else None
+
+  def pop(self, key, default=None):
+    with self._lock:
+      if key not in self._entries:
+        return default
+      return self._remove(key)
+
+  def clear(self):
+    with self._lock:
+      for key in list(self._entries):
+        self._remove(key)
+
+  def __len__(self):
+    with self._lock:
+      return len(self._entries)
+
+  def __contains__(self, key):
+    with self._lock:
+      return key in self._entries
+
+  @property
+  def nbytes(self) -> int:
+    """Memória ocupada pelas entradas, em bytes."""
+    return self._bytes
+
+  def _victim(self, exclude):
+    """Escolhe a entrada a descartar, sem considerar a recém-inserida (`exclude`)."""
+    candidates = (key for key in self._entries if key != exclude)
+    if self.policy == 'lfu':
+      # `min` devolve a primeira entrada com menos acessos, ou seja, a usada há mais tempo
+      return min(candidates, key=lambda key: self._entries[key].hits)
+    return next(candidates)
+
+  def _remove(self, key, reason: str = None):
+    """Remove uma entrada; `reason` identifica os descartes contabilizados nas estatísticas."""
+    entry = self._entries.pop(key)
+    self._bytes -= entry.size
+    if reason:
+      self._counters[f'evictions_{reason}'] += 1
+    return entry.value
+
+  def stats(self) -> dict:
+    """
+    Retorna o uso de memória e os contadores do cache.
+
+    Returns:
+        dict: 'policy', 'entries', 'bytes', 'max_bytes', 'hits', 'misses', 'hit_rate',
+            'rejected' (valores maiores que o orçamento) e 'evictions' (descartes por
+            motivo).
+    """
+    with self._lock:
+      lookups = self._counters['hits'] + self._counters['misses']
+      return dict(
+        policy=self.policy,
+        entries=len(self._entries),
+        bytes=self._bytes,
+        max_bytes=self.max_bytes,
+        hits=self._counters['hits'],
+        misses=self._counters['misses'],
+        hit_rate=self._counters['hits'] / lookups if lookups else None,
+        rejected=self._counters['rejected'],
+        evictions={
+          key[len('evictions_'):]: count
+          for key, count in self._counters.items() if key.startswith('evictions_')
+        },
+      )
+
+def _after_fork_in_child():
+  # A trava pode ter sido copiada do processo pai enquanto estava ocupada
+  for cache in list(_instances):
+    cache._lock = threading.RLock()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,256 @@
+"""
+Índice dos períodos disponíveis em cada tabela do SIDRA.
+
+Os períodos são lidos uma única vez dos metadados da tabela (API de agregados do
+IBGE) e mantidos em memória como uma tupla ordenada. Com o índice, cada ano
+solicitado é resolvido por busca binária para a tabela e o período corretos antes
+de qualquer consulta, evitando as consultas que voltam vazias (ex: Censo em um ano
+sem Censo) e as listas de anos mantidas à mão.
+
+A consulta aos metadados respeita o prazo do contexto (`sidra.deadline`) e o
+disjuntor da tabela, e é feita por uma única thread por tabela: enquanto o índice
+expirado de uma tabela é recarregado, as demais threads continuam usando o índice
+anterior (ou aguardam a primeira carga, até o fim do prazo).
+"""
+import bisect
+import collections
+import functools
+import inspect
+import os
+import threading
+import time
+
+import requests
+
+from app.dash_apps.data.sidra import CircuitBreaker, SidraUnavailable, scheduler, time_remaining
+
+PERIODS_URL = os.environ.get('STATVIEW_PERIODS_URL', 'https://servicodados.ibge.gov.br/api/v3/agregados/{table}/periodos')
+
+# Tempo (s) até recarregar os metadados, para enxergar períodos recém-publicados
+PERIODS_TTL = float(os.environ.get('STATVIEW_PERIODS_TTL', 24 * 60 * 60))
+
+# Se os metadados estiverem indisponíveis, a lista reserva é usada e uma nova
+# tentativa é feita depois deste intervalo (s)
+PERIODS_RETRY = 5 * 60
+
+PERIODS_TIMEOUT = 5
+
+# Períodos conhecidos de cada tabela, usados quando a API de metadados não responde
+FALLBACK_PERIODS = {
+  '9605': (2010, 2022),                                 # Censo: população, raça
+  '6579': tuple(range(2010, 2022)) + (2024,),           # Estimativas de população
+  '9606': (2010, 2022),                                 # Censo: grupos de idade
+  '9923': (2022,),                                      # Censo: situação urbana/rural
+  '5938': tuple(range(2010, 2022)),                     # PIB dos municípios
+  '9543': (2022,),                                      # Censo: alfabetização
+  '5457': tuple(range(1974, 2024)),                     # Produção agrícola municipal
+}
+
+# Tabela -> (períodos, instante de expiração, se os períodos vieram dos metadados)
+_index = {}
+# Tabela -> evento sinalizado quando a recarga em andamento do índice termina
+_refreshing = {}
+_breakers = collections.defaultdict(CircuitBreaker)
+_lock = threading.Lock()
+
+def _fetch_periods(table_code: str, breaker: CircuitBreaker) -> tuple:
+  if not breaker.allow():
+    raise SidraUnavailable(f"Disjuntor aberto para os metadados da tabela {table_code}.")
+
+  remaining = time_remaining()
+  if not scheduler.acquire(timeout=None if remaining is None else max(remaining, 0)):
+    raise SidraUnavailable("Prazo esgotado aguardando uma vaga para consultar os metadados.")
+
+  try:
+    remaining = time_remaining()
+    timeout = PERIODS_TIMEOUT if remaining is None else min(PERIODS_TIMEOUT, max(remaining, 0.1))
+    response = requests.get(PERIODS_URL.format(table=table_code), timeout=timeout)
+    response.raise_for_status()
+    periods = tuple(sorted(int(period['id']) for period in response.json()))
+  except Exception:
+    breaker.record_failure()
+    raise
+  finally:
+    scheduler.release()
+
+  breaker.record_success()
+  return periods
+
+def _usable(entry, fallback: bool) -> bool:
+  return entry is not None and (entry[2] or fallback)
+
+def _unavailable(table_code: str, fallback: bool, error: Exception) -> tuple:
+  if fallback and table_code in FALLBACK_PERIODS:
+    return FALLBACK_PERIODS[table_code]
+  raise error
+
+def _refresh(table_code: str, cached) -> tuple:
+  """Recarrega o índice da tabela; em caso de falha, mantém o índice anterior ou usa a lista reserva."""
+  with _lock:
+    breaker = _breakers[table_code]
+
+  try:
+    entry = (_fetch_periods(table_code, breaker), time.monotonic() + PERIODS_TTL, True)
+  except Exception as error:
+    if cached is not None and cached[2]:
+      entry = (cached[0], time.monotonic() + PERIODS_RETRY, True)
+    elif table_code in FALLBACK_PERIODS:
+      entry = (FALLBACK_PERIODS[table_code], time.monotonic() + PERIODS_RETRY, False)
+    else:
+      raise SidraUnavailable(f"Metadados da tabela {table_code} indisponíveis.") from error
+
+  with _lock:
+    _index[table_code] = entry
+  return entry
+
+def get_periods(table_code: str, fallback: bool = True) -> tuple:
+  """
+  Retorna os períodos disponíveis de uma tabela do SIDRA, em ordem crescente.
+
+  Args:
+      table_code (str): Código da tabela (ex: '9605').
+      fallback (bool, optional): Usa a lista reserva (`FALLBACK_PERIODS`) quando os
+          metadados estão indisponíveis. Com False, lança a exceção.
+
+  Returns:
+      tuple: Anos disponíveis (int).
+
+  Raises:
+      SidraUnavailable: Se os metadados estiverem indisponíveis e não houver índice
+          anterior nem lista reserva (ou `fallback` for False).
+
+  Example:
+      >>> get_periods('9605')
+      (2010, 2022)
+  """
+  table_code = str(table_code)
+
+  with _lock:
+    cached = _index.get(table_code)
+    if _usable(cached, fallback) and cached[1] > time.monotonic():
+      return cached[0]
+
+    event = _refreshing.get(table_code)
+    leader = event is None
+    if leader:
+      event = _refreshing[table_code] = threading.Event()
+
+  if not leader:
+    # Outra thread já recarrega o índice: vale o anterior, ou a primeira carga até o fim do prazo
+    if _usable(cached, fallback):
+      return cached[0]
+    remaining = time_remaining()
+    event.wait(PERIODS_TIMEOUT if remaining is None else max(min(remaining, PERIODS_TIMEOUT), 0))
+    with _lock:
+      cached = _index.get(table_code)
+    if _usable(cached, fallback):
+      return cached[0]
+    return _unavailable(table_code, fallback, SidraUnavailable(f"Metadados da tabela {table_code} indisponíveis."))
+
+  try:
+    entry = _refresh(table_code, cached)
+  finally:
+    with _lock:
+      del _refreshing[table_code]
+    event.set()
+
+  if not _usable(entry, fallback):
+    raise SidraUnavailable(f"Metadados da tabela {table_code} indisponíveis.")
+  return entry[0]
+
+def period_list(periods) -> str:
+  """
+  Formata períodos para o parâmetro `period` das consultas ao SIDRA.
+
+  Example:
+      >>> period_list([2020, 2021])
+      '2020,2021'
+      >>> period_list('all')
+      'all'
+  """
+  if isinstance(periods, str):
+    return periods
+  return ','.join(str(period) for period in periods)
+
+def resolve_year(tables, year) -> tuple:
+  """
+  Resolve o ano solicitado para a tabela e o período que devem ser consultados.
+
+  'last' corresponde ao período mais recente da primeira tabela (a preferencial, ex:
+  o Censo). Um ano disponível em mais de uma tabela usa a primeira delas; um ano
+  indisponível é trocado pelo mais próximo entre todas as tabelas (em caso de empate,
+  o mais antigo).
+
+  Args:
+      tables (tuple): Códigos das tabelas, em ordem de preferência.
+      year (str or int): Ano desejado ou 'last'.
+
+  Returns:
+      tuple: (código da tabela, ano como str).
+
+  Example:
+      >>> resolve_year(('9605', '6579'), '2015')
+      ('6579', '2015')
+      >>> resolve_year(('9605', '6579'), '2023')
+      ('9605', '2022')
+      >>> resolve_year(('9605', '6579'), 'last')
+      ('9605', '2022')
+  """
+  if str(year) == 'last':
+    return tables[0], str(get_periods(tables[0])[-1])
+
+  year = int(year)
+  owners = {}
+  for table in reversed(tables):
+    for period in get_periods(table):
+      owners[period] = table
+
+  available = sorted(owners)
+  position = bisect.bisect_left(available, year)
+  candidates = available[max(position - 1, 0):position + 1]
+  closest = min(candidates, key=lambda period: abs(period - year))
+
+  return owners[closest], str(closest)
+
+def resolved_year(*tables):
+  """
+  Decorador que troca o argumento `year` das funções de dados pelo período resolvido
+  com `resolve_year` antes da chamada.
+
+  Deve ficar acima de `cached` e `materialized`, para que 'last' e o ano concreto
+  correspondente compartilhem a mesma entrada de cache e a mesma partição. O job de
+  materialização usa `func.resolve_arguments` para resolver os anos do plano.
+
+  Args:
+      *tables (str): Códigos das tabelas consultadas, em ordem de preferência.
+  """
+  def decorator(func):
+    signature = inspect.signature(func)
+
+    def resolve_arguments(kwargs: dict) -> dict:
+      bound = signature.bind_partial(**kwargs)
+      year = bound.arguments.get('year', signature.parameters['year'].default)
+      return dict(kwargs, year=resolve_year(tables, year)[1])
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+      bound = signature.bind(*args, **kwargs)
+      return func(**resolve_arguments(bound.arguments))
+
+    wrapper.resolve_arguments = resolve_arguments
+    if hasattr(func, 'version'):
+      # A versão e as entradas do cache também são as do período resolvido (ver `cached`)
+      wrapper.version = lambda *args, **kwargs: func.version(**resolve_arguments(signature.bind(*args, **kwargs).arguments))
+      wrapper.contains = lambda *args, **kwargs: func.contains(**resolve_arguments(signature.bind(*args, **kwargs).arguments))
+      wrapper.prime = lambda value, *args, **kwargs: func.prime(value, **resolve_arguments(signature.bind(*args, **kwargs).arguments))
+    return wrapper
+
+  return decorator
+
+def _after_fork_in_child():
+  # Recargas em andamento no processo pai não existem no filho
+  global _lock
+  _lock = threading.Lock()
+  _refreshing.clear()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -1,12 +1,22 @@
-import sidrapy as sd
+import re
+from app.dash_apps.data import sidra
 import pandas as pd
 import numpy as np
 
-from app.dash_apps.data.utils import verify_closest_year
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dash_apps.data.materialized import materialized
+from app.dash_apps.data.cache import cached
+from app.dash_apps.data.periods import resolve_year, resolved_year
 
-def get_population_total(year='last') -> pd.Series:
+# Tabelas de população total: Censo oficial (preferencial) e estimativas anuais
+POPULATION_TABLES = ('9605', '6579')
+
+@resolved_year(*POPULATION_TABLES)
+@cached('local_code')
+@materialized('population_total')
+def get_population_total(year='last', local_code=FLORIANO_CODE) -> pd.Series:
   """
-  Retorna a população total do município de Floriano (PI) para um ano específico, 
+  Retorna a população total de um município (por padrão, Floriano - PI) para um ano específico, 
   com base em dados oficiais ou estimativas do IBGE via SIDRA.
 
   Por padrão, busca o dado mais recente disponível. Se o ano informado não tiver 
@@ -19,10 +29,11 @@ def get_population_total(year='last') -> pd.Series:
   Args:
       year (str or int, optional): Ano desejado no formato 'YYYY' ou 'last' (padrão)
           para buscar o dado mais recente.
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
 
   Returns:
       pd.Series: Série contendo:
-          - 'total_populacao': (int) População total de Floriano.
+          - 'total_populacao': (int) População total do município.
           - 'ano': (int) Ano de referência do dado.
           - 'footnote': (str) Descrição indicando se é estimativa ou dado de Censo.
 
@@ -38,43 +49,40 @@ def get_population_total(year='last') -> pd.Series:
       dtype: object
   """
   
-  # Existem alguns anos para os quais não há dados disponíveis
-  # Uma solução é verificar se há dado oficial para o ano solicitado
-  # Caso não haja, escolhe-se o ano mais próximo disponível
-  total_population_years = ['last'] + [str(year) for year in range(2010, 2025)]
-  total_population_years.remove('2023') # Não possui dado oficial
-  year = verify_closest_year(year, total_population_years)
+  # O ano já chega resolvido (`resolved_year`) para um período existente; a tabela
+  # indica se há dado oficial (Censo) ou apenas estimativa para ele
+  table, year = resolve_year(POPULATION_TABLES, year)
     
   population_tb = '9605' # Censo oficial
   city='6'
   population='93'
-  floriano_code='2203909'
   
-  total = sd.get_table(
-    table_code=population_tb,   
-    territorial_level=city,
-    categories=9521,
-    variable=population,
-    ibge_territorial_code=floriano_code,
-    period=year
-  )
+  total = pd.DataFrame()
+  if table == population_tb:
+    total = sidra.get_table(
+      table_code=population_tb,   
+      territorial_level=city,
+      categories=9521,
+      variable=population,
+      ibge_territorial_code=local_code,
+      period=year
+    )
   
-  total = total[1:]
+    total = total[1:]
   
   # Os dados oficiais de população são publicados aproximadamente a cada dez anos,
   # como em 2010 e 2022. Porém, estimativas são divulgadas quase todos os anos.
   # Caso o usuário solicite um ano sem dado oficial, retorna-se uma estimativa.
   if total.empty:
     city='6'
-    floriano_code='2203909'
     estimated_population_tb='6579'
     estimated_population_v='9324'
 
-    total = sd.get_table(
+    total = sidra.get_table(
         table_code=estimated_population_tb,
         territorial_level=city,
         variable=estimated_population_v,
-        ibge_territorial_code=floriano_code,
+        ibge_territorial_code=local_code,
         period=year
     )
   
@@ -102,13 +110,16 @@ def get_population_total(year='last') -> pd.Series:
   
   return total
 
-def get_population_age_group(year='last') -> pd.DataFrame:
+@resolved_year('9606')
+@cached('local_code')
+@materialized('population_age_group')
+def get_population_age_group(year='last', local_code=FLORIANO_CODE) -> pd.DataFrame:
   """
-  Retorna a distribuição da população do município de Floriano (PI) por grupos de idade,
+  Retorna a distribuição da população de um município (por padrão, Floriano - PI) por grupos de idade,
   com base nos dados oficiais do Censo mais recente ou de um ano especificado.
 
   Caso o ano informado não tenha dado oficial, a função seleciona automaticamente o ano
-  mais próximo disponível (2010 ou 2022).
+  mais próximo disponível nos metadados da tabela (ex: 2010 ou 2022).
 
   O resultado é um DataFrame com a quantidade de pessoas em cada faixa etária, o ano de 
   referência e uma nota de rodapé indicando o ano do Censo.
@@ -116,6 +127,7 @@ def get_population_age_group(year='last') -> pd.DataFrame:
   Args:
       year (str or int, optional): Ano desejado no formato 'YYYY' ou 'last' (padrão),
           que retorna o dado mais recente disponível.
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
 
   Returns:
       pd.DataFrame: DataFrame contendo:
@@ -135,21 +147,17 @@ def get_population_age_group(year='last') -> pd.DataFrame:
       ValueError: Se não houver dados disponíveis para o ano especificado.
       KeyError: Se as colunas esperadas não forem encontradas na resposta da API.
   """
-  age_group_years = ['last', '2010', '2022']
-  year = verify_closest_year(year, age_group_years)
-  
   population_age_group = '9606'
   city='6'
   population='93'
-  floriano_code='2203909'
   age='287'
-  age_group = sd.get_table(
+  age_group = sidra.get_table(
       table_code=population_age_group,
       territorial_level=city,
       classification=age,
       categories="93070,93084,93085,93086,93087,93088,93089,93090,93091,93092,93093,93094,93095,93096,93097,93098,49108,49109,60040,60041,6653",
       variable=population,
-      ibge_territorial_code=floriano_code,
+      ibge_territorial_code=local_code,
       period=year
       )
 
@@ -161,8 +169,11 @@ def get_population_age_group(year='last') -> pd.DataFrame:
   
   age_group['footnote'] = f'Censo do ano de {age_group.iloc[0]['ano']}'
   
-  return age_group
+  return age_group.infer_objects()
 
+@resolved_year(*POPULATION_TABLES)
+@cached()
+@materialized('top_population_cities')
 def get_top_population_cities(year='last')-> pd.DataFrame:
   """
   Retorna os 10 municípios mais populosos do estado do Piauí para um ano específico
@@ -183,6 +194,7 @@ def get_top_population_cities(year='last')-> pd.DataFrame:
           - 'populacao' (int): Quantidade de habitantes do município.
           - 'municipio' (str): Nome do município (sem sufixo " (PI)").
           - 'ano' (int): Ano de referência.
+          - 'codigo' (str): Código IBGE do município.
           - 'footnote' (str): Indicação de Censo oficial ou estimativa.
 
   Example:
@@ -196,9 +208,7 @@ def get_top_population_cities(year='last')-> pd.DataFrame:
       ValueError: Se não houver dados disponíveis para o ano especificado.
       KeyError: Se as colunas esperadas não estiverem presentes na resposta.
   """
-  total_population_years = ['last'] + [str(year) for year in range(2010, 2025)]
-  total_population_years.remove('2023')
-  year = verify_closest_year(year, total_population_years)
+  table, year = resolve_year(POPULATION_TABLES, year)
   
   with open('app/dash_apps/data/piaui_city_codes.txt', 'r') as file:
     city_codes = file.readline()
@@ -207,21 +217,23 @@ def get_top_population_cities(year='last')-> pd.DataFrame:
   city='6'
   population='93'
 
-  cities_population = sd.get_table(
-      table_code=population_of_cities,
-      territorial_level=city,
-      categories=9521,
-      variable=population,
-      ibge_territorial_code=city_codes,
-      period=year
-      )
-  cities_population = cities_population.iloc[1:].reset_index(drop=True)
+  cities_population = pd.DataFrame()
+  if table == population_of_cities:
+    cities_population = sidra.get_table(
+        table_code=population_of_cities,
+        territorial_level=city,
+        categories=9521,
+        variable=population,
+        ibge_territorial_code=city_codes,
+        period=year
+        )
+    cities_population = cities_population.iloc[1:].reset_index(drop=True)
 
   if cities_population.empty:
     estimated_population_tb='6579'
     estimated_population_v='9324'
 
-    cities_population = sd.get_table(
+    cities_population = sidra.get_table(
         table_code=estimated_population_tb,
         territorial_level=city,
         variable=estimated_population_v,
@@ -229,8 +241,8 @@ def get_top_population_cities(year='last')-> pd.DataFrame:
         period=year
     )
   
-    cities_population = cities_population.loc[:,['V','D1N', 'D2N']]
-    cities_population.columns = ['total_populacao', 'municipio', 'ano']
+    cities_population = cities_population.loc[:,['V','D1N', 'D2N', 'D1C']]
+    cities_population.columns = ['total_populacao', 'municipio', 'ano', 'codigo']
     cities_population = cities_population.iloc[1:].reset_index(drop=True)
 
     cities_population['municipio'] = cities_population['municipio'].str.replace(' (PI)', '', regex=False)
@@ -242,9 +254,9 @@ def get_top_population_cities(year='last')-> pd.DataFrame:
     cities_population['footnote'] = f"Estimativas do Censo de {cities_population.iloc[0]['ano']}"
     
   else:
-    cities_population = cities_population.loc[:, ['V', 'D1N', 'D2N']]
+    cities_population = cities_population.loc[:, ['V', 'D1N', 'D2N', 'D1C']]
 
-    cities_population.columns = ['populacao', 'municipio', 'ano']
+    cities_population.columns = ['populacao', 'municipio', 'ano', 'codigo']
 
 
     cities_population['municipio'] = cities_population['municipio'].str.replace(' (PI)', '', regex=False)
@@ -262,9 +274,12 @@ def get_top_population_cities(year='last')-> pd.DataFrame:
   top_population = top_population.reset_index(drop=True)
 
 
-  return top_population
+  return top_population.infer_objects()
 
-def get_population_by_race(level='6', local_code='2203909', year='last') -> pd.DataFrame:
+@resolved_year('9605')
+@cached('local_code')
+@materialized('population_by_race')
+def get_population_by_race(level='6', local_code=FLORIANO_CODE, year='last') -> pd.DataFrame:
   """
   Retorna a distribuição percentual da população de um município (ou outro nível territorial)
   por raça, com base nos dados do último Censo disponível ou de um ano especificado.
@@ -297,13 +312,10 @@ def get_population_by_race(level='6', local_code='2203909', year='last') -> pd.D
       ValueError: Se não houver dados disponíveis para o ano especificado.
       KeyError: Se as colunas esperadas não estiverem presentes na resposta da API.
   """
-  race_group_years = ['last', '2010', '2022']
-  year = verify_closest_year(year, race_group_years)
-  
   population_by_race = '9605'
   race='86'
   population_perc = '1000093'
-  distribuition = sd.get_table(
+  distribuition = sidra.get_table(
       table_code=population_by_race,
       territorial_level=level,
       classification=race,
@@ -325,9 +337,12 @@ def get_population_by_race(level='6', local_code='2203909', year='last') -> pd.D
 
   distribuition['footnote'] = f"Censo do ano de {distribuition.iloc[0]['ano']}"
 
-  return distribuition
+  return distribuition.infer_objects()
 
-def get_population_by_local(level='6', local_code='2203909', year='last') -> pd.DataFrame:
+@resolved_year('9923')
+@cached('local_code')
+@materialized('population_by_local')
+def get_population_by_local(level='6', local_code=FLORIANO_CODE, year='last') -> pd.DataFrame:
   """
   Retorna a distribuição percentual da população de um município (ou outro nível territorial) entre áreas urbanas e rurais, com base nos dados do Censo de 2022.
 
@@ -361,13 +376,11 @@ def get_population_by_local(level='6', local_code='2203909', year='last') -> pd.
       ValueError: Se houver erro na consulta à API.
       KeyError: Se as colunas esperadas não estiverem presentes na resposta.
   """
-  available_years = ['last', '2022']
-  year = verify_closest_year(year, available_years)
   population_by_local = '9923'
   local='1'
   population_perc = '1000093'
   
-  distribuition = sd.get_table(
+  distribuition = sidra.get_table(
       table_code=population_by_local,
       territorial_level=level,
       classification=local,
@@ -389,4 +402,42 @@ def get_population_by_local(level='6', local_code='2203909', year='last') -> pd.
 
   distribuition['footnote'] = 'Dado disponível somente no ano de 2022'
   
-  return distribuition
+  return distribuition.infer_objects()
+
+@cached('local_code')
+@materialized('municipality_name')
+def get_municipality_name(local_code=FLORIANO_CODE) -> pd.Series:
+  """
+  Retorna o nome de um município a partir do seu código IBGE, sem o sufixo da UF.
+
+  O nome é obtido da própria resposta do SIDRA (tabela de estimativas populacionais),
+  para não depender de outra API.
+
+  Args:
+      local_code (str, optional): Código IBGE do município (padrão: Floriano).
+
+  Returns:
+      pd.Series: Série contendo:
+          - 'municipio' (str): Nome do município (ex: 'Floriano').
+          - 'codigo' (str): Código IBGE consultado.
+
+  Example:
+      >>> get_municipality_name('2211001')['municipio']
+      'Teresina'
+  """
+  estimated_population_tb='6579'
+  estimated_population_v='9324'
+  city='6'
+
+  municipality = sidra.get_table(
+      table_code=estimated_population_tb,
+      territorial_level=city,
+      variable=estimated_population_v,
+      ibge_territorial_code=local_code,
+      period='last'
+  )
+
+  name = municipality.iloc[1]['D1N']
+  name = re.sub(r'\s*(\(\w{2}\)|- \w{2})$', '', name)
+
+  return pd.Series({'municipio': name, 'codigo': str(local_code)})
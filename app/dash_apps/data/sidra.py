@@ -0,0 +1,728 @@
+"""
+Camada única de acesso à API do SIDRA (apisidra.ibge.gov.br).
+
+Todas as consultas da camada de dados passam por `get_table`, que delega ao
+`sidrapy.get_table` depois de obter uma vaga no agendador. O agendador aplica:
+
+- um limite global de requisições simultâneas;
+- um limite de taxa (token bucket), para não sermos bloqueados pelo IBGE;
+- classes de prioridade: 'interactive' (callbacks) > 'refresh' (materialização)
+  > 'bulk' (exportações e cargas em lote). Quando uma vaga é liberada, ela vai
+  para a requisição pendente de maior prioridade, de modo que os callbacks passam
+  à frente do trabalho em lote ainda na fila.
+
+A prioridade é definida pelo contexto de quem consulta:
+
+    with priority('bulk'):
+        get_population_total(year='2010')
+
+Os limites são configurados pelas variáveis de ambiente STATVIEW_SIDRA_MAX_CONCURRENCY,
+STATVIEW_SIDRA_RATE (requisições por segundo) e STATVIEW_SIDRA_BURST e valem por
+processo. Processos criados por fork a partir de um mesmo pai (os workers do Gunicorn,
+ver gunicorn.conf.py, e o pool da carga em lote de data/warehouse.py) dividem um único
+limite de taxa com `SharedRateLimiter`; o limite de concorrência continua por processo.
+
+Para limitar a latência quando o SIDRA está degradado:
+
+- cada callback define um prazo (`deadline`), herdado por todas as consultas feitas
+  dentro dele;
+- um disjuntor (circuit breaker) por tabela deixa de consultar a API depois de
+  falhas consecutivas, até o fim de um período de espera;
+- consultas interativas que estouram o prazo, falham ou encontram o disjuntor
+  aberto recebem o último resultado válido da mesma consulta, marcado como
+  desatualizado (ver `track_staleness` e `mark_stale`);
+- consultas mais lentas que o p95 observado da mesma tabela recebem uma requisição
+  duplicada (hedge), e vale a primeira resposta.
+"""
+import collections
+import contextlib
+import contextvars
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import sidrapy as sd
+from sidrapy.resources import handler as sidrapy_handler
+from sidrapy.resources.http_client import HttpAdapter, HttpClient
+
+from app.dash_apps.data.memory import ByteBudgetCache
+
+# Endereço da API do SIDRA (ex: um servidor local para testes de carga, ver loadtest/standin.py)
+SIDRA_URL = os.environ.get('STATVIEW_SIDRA_URL')
+if SIDRA_URL:
+  sidrapy_handler.ENDPOINT_BASE = SIDRA_URL.rstrip('/')
+
+# Tempo máximo (s) de espera pelo SIDRA em cada requisição: para conectar e entre dois
+# pacotes da resposta. Uma requisição abandonada no prazo do callback continua em segundo
+# plano, ocupando uma vaga do agendador, até responder ou atingir este limite.
+REQUEST_TIMEOUT = float(os.environ.get('STATVIEW_SIDRA_REQUEST_TIMEOUT', 30))
+
+class _TimeoutAdapter(HttpAdapter):
+  """Adaptador do `sidrapy` com `REQUEST_TIMEOUT` como prazo padrão (o `sidrapy` não define nenhum)."""
+  def send(self, request, timeout=None, **kwargs):
+    return super().send(request, timeout=timeout or REQUEST_TIMEOUT, **kwargs)
+
+class _TimeoutHttpClient(HttpClient):
+  @staticmethod
+  def get_legacy_session():
+    session = HttpClient.get_legacy_session()
+    adapter = _TimeoutAdapter(session.get_adapter('https://').ssl_context)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+sidrapy_handler.HttpClient = _TimeoutHttpClient
+
+# Classes de prioridade: quanto menor o valor, maior a prioridade
+PRIORITIES = {'interactive': 0, 'refresh': 1, 'bulk': 2}
+
+DEFAULT_PRIORITY = 'interactive'
+
+MAX_CONCURRENCY = int(os.environ.get('STATVIEW_SIDRA_MAX_CONCURRENCY', 4))
+
+# Taxa de reposição do token bucket (requisições/segundo); 0 desativa o limite de taxa
+RATE = float(os.environ.get('STATVIEW_SIDRA_RATE', 5))
+
+# Quantidade de requisições que podem ser feitas em rajada antes do limite de taxa atuar
+BURST = int(os.environ.get('STATVIEW_SIDRA_BURST', 10))
+
+# Tokens do limite compartilhado reservados a cada classe de prioridade acima da
+# consulta: 'refresh' só consome um token se sobrarem 1 + 2 no bucket, 'bulk' se
+# sobrarem 1 + 4 (com o padrão 2). Assim, os callbacks de um worker passam à frente
+# do trabalho em lote de outro processo.
+PRIORITY_RESERVE = float(os.environ.get('STATVIEW_SIDRA_PRIORITY_RESERVE', 2))
+
+# Falhas consecutivas que abrem o disjuntor de uma tabela e tempo (s) até uma nova tentativa
+BREAKER_FAILURES = int(os.environ.get('STATVIEW_SIDRA_BREAKER_FAILURES', 5))
+BREAKER_COOLDOWN = float(os.environ.get('STATVIEW_SIDRA_BREAKER_COOLDOWN', 30))
+
+# Memória (bytes) reservada aos últimos resultados válidos de cada consulta, usados no fallback
+LAST_GOOD_BYTES = int(os.environ.get('STATVIEW_SIDRA_LAST_GOOD_BYTES', 128 * 1024 ** 2))
+
+# Amostras de latência necessárias antes de enviar requisições duplicadas (hedge)
+HEDGE_MIN_SAMPLES = 20
+
+STALE_NOTICE = "Dados desatualizados: o SIDRA está indisponível no momento."
+
+_current_priority = contextvars.ContextVar('sidra_priority', default=DEFAULT_PRIORITY)
+_current_deadline = contextvars.ContextVar('sidra_deadline', default=None)
+_stale_trackers = contextvars.ContextVar('sidra_stale_trackers', default=())
+_allow_stale = contextvars.ContextVar('sidra_allow_stale', default=None)
+
+class SidraUnavailable(Exception):
+  """O SIDRA não respondeu a tempo e não há um resultado anterior para a consulta."""
+
+@contextlib.contextmanager
+def priority(name: str):
+  """
+  Define a classe de prioridade das consultas ao SIDRA feitas dentro do bloco.
+
+  Args:
+      name (str): 'interactive', 'refresh' ou 'bulk'.
+
+  Raises:
+      ValueError: Se a classe de prioridade não existir.
+  """
+  if name not in PRIORITIES:
+    raise ValueError(f"Prioridade desconhecida: {name}. Use uma de {list(PRIORITIES)}.")
+
+  token = _current_priority.set(name)
+  try:
+    yield
+  finally:
+    _current_priority.reset(token)
+
+def current_priority() -> str:
+  """Retorna a classe de prioridade do contexto atual."""
+  return _current_priority.get()
+
+@contextlib.contextmanager
+def allow_stale(allowed: bool = True):
+  """
+  Define se as consultas feitas dentro do bloco podem receber o último resultado
+  válido quando o SIDRA não responde, independentemente da prioridade.
+
+  Fora do bloco, só as consultas 'interactive' recebem dados desatualizados. Use-o
+  para quem informa o usuário de que os dados estão desatualizados (ex: a API, com o
+  cabeçalho `X-Statview-Stale`), e nunca para quem grava os dados.
+
+  Example:
+      >>> with priority('bulk'), allow_stale(), track_staleness() as tracker:
+      ...     data = get_population_total(year='2010')
+  """
+  token = _allow_stale.set(allowed)
+  try:
+    yield
+  finally:
+    _allow_stale.reset(token)
+
+@contextlib.contextmanager
+def deadline(seconds: float):
+  """
+  Define um prazo para as consultas ao SIDRA feitas dentro do bloco.
+
+  Prazos aninhados nunca estendem o prazo externo.
+
+  Args:
+      seconds (float): Tempo disponível a partir de agora, em segundos.
+  """
+  end = time.monotonic() + seconds
+  outer = _current_deadline.get()
+  token = _current_deadline.set(end if outer is None else min(end, outer))
+  try:
+    yield
+  finally:
+    _current_deadline.reset(token)
+
+def time_remaining():
+  """Retorna os segundos restantes do prazo atual, ou None se não houver prazo."""
+  end = _current_deadline.get()
+  return None if end is None else end - time.monotonic()
+
+class StalenessTracker:
+  """Indica se alguma consulta feita dentro de `track_staleness` recebeu dados desatualizados."""
+  def __init__(self):
+    self.stale = False
+
+@contextlib.contextmanager
+def track_staleness():
+  """
+  Acompanha as consultas feitas dentro do bloco.
+
+  Example:
+      >>> with track_staleness() as tracker:
+      ...     data = get_literacy_rate()
+      >>> tracker.stale
+      False
+  """
+  tracker = StalenessTracker()
+  token = _stale_trackers.set(_stale_trackers.get() + (tracker,))
+  try:
+    yield tracker
+  finally:
+    _stale_trackers.reset(token)
+
+def flag_stale():
+  """Marca como desatualizados todos os rastreadores ativos (ver `track_staleness`)."""
+  for tracker in _stale_trackers.get():
+    tracker.stale = True
+
+def stale_footnote(text: str) -> str:
+  """Acrescenta o aviso de dados desatualizados a uma nota de rodapé."""
+  if not text:
+    return STALE_NOTICE
+  if STALE_NOTICE in text:
+    return text
+  return f"{text} ({STALE_NOTICE})"
+
+def mark_stale(data):
+  """
+  Marca como desatualizada a coluna (ou campo) 'footnote' de um resultado da camada de dados.
+
+  Resultados sem nota de rodapé são retornados sem alteração.
+  """
+  if isinstance(data, pd.Series) and 'footnote' in data.index:
+    data = data.copy()
+    data['footnote'] = stale_footnote(data['footnote'])
+  elif isinstance(data, pd.DataFrame) and 'footnote' in data.columns:
+    data = data.copy()
+    data['footnote'] = data['footnote'].map(stale_footnote)
+  return data
+
+class SharedRateLimiter:
+  """
+  Token bucket compartilhado entre processos (memória compartilhada do multiprocessing).
+
+  Deve ser criado no processo pai e herdado pelos filhos (ex: como argumento do
+  `initializer` de um `ProcessPoolExecutor`, ou pelo fork dos workers do Gunicorn),
+  que o instalam no agendador com `scheduler.share(limiter)`.
+
+  Como a fila de prioridade de cada processo não enxerga a dos outros, as classes de
+  menor prioridade só consomem um token se deixarem `reserve` tokens por nível de
+  prioridade no bucket (ver `PRIORITY_RESERVE`).
+  """
+  def __init__(self, rate: float = RATE, burst: int = BURST, context=multiprocessing, reserve: float = PRIORITY_RESERVE):
+    self.rate = rate
+    self.burst = max(1, burst)
+    self.reserve = max(0.0, reserve)
+    self._lock = context.Lock()
+    self._tokens = context.RawValue('d', float(self.burst))
+    self._last_refill = context.RawValue('d', time.monotonic())
+
+  def acquire(self, timeout: float = None, priority_name: str = None) -> bool:
+    """
+    Consome um token, aguardando até `timeout` segundos (padrão: sem limite).
+
+    Args:
+        priority_name (str, optional): Classe de prioridade. Padrão: a do contexto atual.
+
+    Returns:
+        bool: True se o token foi obtido; False se o tempo de espera se esgotou.
+    """
+    end = None if timeout is None else time.monotonic() + timeout
+    # Um bucket menor que a reserva não pode deixar as classes baixas sem nenhum token
+    required = min(1 + self.reserve * PRIORITIES[priority_name or current_priority()], self.burst)
+
+    while True:
+      with self._lock:
+        now = time.monotonic()
+        if self.rate > 0:
+          self._tokens.value = min(self.burst, self._tokens.value + (now - self._last_refill.value) * self.rate)
+        else:
+          self._tokens.value = float(self.burst)
+        self._last_refill.value = now
+
+        if self._tokens.value >= required:
+          self._tokens.value -= 1
+          return True
+        wait_for = (required - self._tokens.value) / self.rate
+
+      if end is not None:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+          return False
+        wait_for = min(wait_for, remaining)
+      time.sleep(wait_for)
+
+class SidraScheduler:
+  """
+  Agendador das requisições ao SIDRA, com limite de concorrência, token bucket
+  e fila de prioridade.
+
+  As requisições aguardam em um heap ordenado por (prioridade, ordem de chegada);
+  só a primeira da fila pode ocupar uma vaga livre. Requisições já em andamento não
+  são interrompidas: a preempção acontece na fila.
+
+  É seguro para uso concorrente (workers gthread).
+  """
+  def __init__(self, max_concurrency: int = MAX_CONCURRENCY, rate: float = RATE, burst: int = BURST):
+    self.max_concurrency = max(1, max_concurrency)
+    self.rate = rate
+    self.burst = max(1, burst)
+
+    self._shared = None
+    self._sequence = itertools.count()
+    self._stats = {name: {'requests': 0, 'timeouts': 0, 'wait_total': 0.0, 'wait_max': 0.0} for name in PRIORITIES}
+    self.reset()
+
+  def reset(self):
+    """Zera a fila e as vagas em uso (ex: em um processo filho criado com fork)."""
+    self._cond = threading.Condition()
+    self._queue = []
+    self._in_flight = 0
+    self._tokens = float(self.burst)
+    self._last_refill = time.monotonic()
+
+  def share(self, limiter: SharedRateLimiter):
+    """
+    Passa a limitar a taxa pelo token bucket compartilhado `limiter` em vez do local.
+
+    O limite de concorrência e a fila de prioridade continuam valendo por processo.
+    """
+    with self._cond:
+      self._shared = limiter
+      self.rate = 0
+      self._cond.notify_all()
+
+  def _refill(self):
+    now = time.monotonic()
+    if self.rate > 0:
+      self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+    else:
+      self._tokens = float(self.burst)
+    self._last_refill = now
+
+  def acquire(self, priority_name: str = None, timeout: float = None) -> bool:
+    """
+    Aguarda uma vaga para fazer uma requisição.
+
+    Args:
+        priority_name (str, optional): Classe de prioridade. Padrão: a do contexto atual.
+        timeout (float, optional): Tempo máximo de espera, em segundos. Padrão: sem limite.
+
+    Returns:
+        bool: True se a vaga foi obtida; False se o tempo de espera se esgotou.
+    """
+    priority_name = priority_name or current_priority()
+    ticket = (PRIORITIES[priority_name], next(self._sequence))
+    start = time.monotonic()
+    end = None if timeout is None else start + timeout
+
+    with self._cond:
+      heapq.heappush(self._queue, ticket)
+
+      while True:
+        self._refill()
+        ready = self._queue[0] == ticket and self._in_flight < self.max_concurrency
+        if ready and self._tokens >= 1:
+          break
+
+        wait_for = (1 - self._tokens) / self.rate if ready else None
+        if end is not None:
+          remaining = end - time.monotonic()
+          if remaining <= 0:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._stats[priority_name]['timeouts'] += 1
+            self._cond.notify_all()
+            return False
+          wait_for = remaining if wait_for is None else min(wait_for, remaining)
+
+        self._cond.wait(wait_for)
+
+      heapq.heappop(self._queue)
+      self._tokens -= 1
+      self._in_flight += 1
+
+      wait = time.monotonic() - start
+      stats = self._stats[priority_name]
+      stats['requests'] += 1
+      stats['wait_total'] += wait
+      stats['wait_max'] = max(stats['wait_max'], wait)
+
+      # A próxima requisição da fila pode ter uma vaga disponível
+      self._cond.notify_all()
+
+    if self._shared is not None:
+      remaining = None if end is None else max(end - time.monotonic(), 0)
+      if not self._shared.acquire(remaining, priority_name):
+        self.release()
+        with self._cond:
+          self._stats[priority_name]['timeouts'] += 1
+        return False
+
+    return True
+
+  def release(self):
+    """Libera a vaga ocupada por uma requisição concluída."""
+    with self._cond:
+      self._in_flight -= 1
+      self._cond.notify_all()
+
+  @contextlib.contextmanager
+  def slot(self, priority_name: str = None):
+    """Ocupa uma vaga durante o bloco."""
+    self.acquire(priority_name)
+    try:
+      yield
+    finally:
+      self.release()
+
+  def stats(self) -> dict:
+    """
+    Retorna as estatísticas do agendador, para ajustar os limites ao tráfego real.
+
+    Returns:
+        dict: Requisições em andamento, tokens disponíveis e, por classe de prioridade,
+            a profundidade da fila, o total de requisições e os tempos de espera
+            médio e máximo (em segundos).
+
+    Example:
+        >>> scheduler.stats()['interactive']
+        {'queued': 0, 'requests': 12, 'timeouts': 0, 'wait_avg': 0.004, 'wait_max': 0.31}
+    """
+    with self._cond:
+      self._refill()
+      queued = {name: 0 for name in PRIORITIES}
+      names = {value: name for name, value in PRIORITIES.items()}
+      for level, _ in self._queue:
+        queued[names[level]] += 1
+
+      result = {'in_flight': self._in_flight, 'tokens': round(self._tokens, 2)}
+      for name, stats in self._stats.items():
+        result[name] = {
+          'queued': queued[name],
+          'requests': stats['requests'],
+          'timeouts': stats['timeouts'],
+          'wait_avg': stats['wait_total'] / stats['requests'] if stats['requests'] else 0.0,
+          'wait_max': stats['wait_max'],
+        }
+
+      return result
+
+# Agendador compartilhado por toda a camada de dados do processo
+scheduler = SidraScheduler()
+
+class CircuitBreaker:
+  """
+  Disjuntor de uma tabela do SIDRA.
+
+  Abre depois de `max_failures` falhas consecutivas. Após `cooldown` segundos, deixa
+  passar uma única requisição de teste: se ela tiver sucesso, o disjuntor fecha;
+  se falhar, volta a abrir.
+  """
+  def __init__(self, max_failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+    self.max_failures = max_failures
+    self.cooldown = cooldown
+    self._failures = 0
+    self._opened_at = None
+    self._trial_at = None
+    self._lock = threading.Lock()
+
+  @property
+  def state(self) -> str:
+    with self._lock:
+      if self._opened_at is None:
+        return 'closed'
+      return 'half-open' if time.monotonic() - self._opened_at >= self.cooldown else 'open'
+
+  def allow(self) -> bool:
+    """Indica se uma requisição pode ser feita agora."""
+    with self._lock:
+      if self._opened_at is None:
+        return True
+
+      now = time.monotonic()
+      if now - self._opened_at < self.cooldown:
+        return False
+
+      # Semiaberto: uma requisição de teste por período de espera
+      if self._trial_at is None or now - self._trial_at >= self.cooldown:
+        self._trial_at = now
+        return True
+      return False
+
+  def record_success(self):
+    with self._lock:
+      self._failures = 0
+      self._opened_at = None
+      self._trial_at = None
+
+  def record_failure(self):
+    with self._lock:
+      self._failures += 1
+      if self._failures >= self.max_failures or self._trial_at is not None:
+        self._opened_at = time.monotonic()
+        self._trial_at = None
+
+_breakers = collections.defaultdict(CircuitBreaker)
+_breakers_lock = threading.Lock()
+
+def _breaker(table_code: str) -> CircuitBreaker:
+  with _breakers_lock:
+    return _breakers[table_code]
+
+_last_good = ByteBudgetCache(max_bytes=LAST_GOOD_BYTES)
+
+def _remember(key, data):
+  _last_good.set(key, data)
+
+def _recall(key):
+  return _last_good.get(key)
+
+# Latências recentes por tabela: o p95 de uma tabela leve não serve de referência
+# para outra que devolve o histórico completo. Os contadores e as latências são
+# atualizados pelas threads das requisições, sob `_stats_lock`.
+_latencies = collections.defaultdict(lambda: collections.deque(maxlen=200))
+_counters = collections.Counter()
+_stats_lock = threading.Lock()
+
+def _record_latency(table_code: str, seconds: float):
+  with _stats_lock:
+    _latencies[table_code].append(seconds)
+
+def _count(name: str):
+  with _stats_lock:
+    _counters[name] += 1
+
+def _hedge_delay(table_code: str):
+  """Retorna o p95 das latências observadas da tabela, ou None se ainda houver poucas amostras."""
+  with _stats_lock:
+    samples = sorted(_latencies.get(table_code, ()))
+  if len(samples) < HEDGE_MIN_SAMPLES:
+    return None
+  return samples[int(len(samples) * 0.95) - 1]
+
+# As requisições rodam em threads para que quem consulta possa desistir no prazo.
+# Cada requisição ocupa uma vaga do agendador, então nunca há mais threads ativas
+# do que o limite de concorrência. O pool é recriado em processos filhos (workers do
+# Gunicorn, carga em lote), pois as threads do processo pai não sobrevivem ao fork.
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+  global _executor, _executor_pid
+  with _executor_lock:
+    if _executor is None or _executor_pid != os.getpid():
+      _executor = ThreadPoolExecutor(max_workers=scheduler.max_concurrency, thread_name_prefix='sidra')
+      _executor_pid = os.getpid()
+    return _executor
+
+class _Attempt:
+  """
+  Uma consulta a `get_table`, que pode enviar mais de uma requisição (hedge) e
+  abandoná-las no prazo: o disjuntor registra no máximo uma falha por consulta.
+  """
+  def __init__(self, breaker: CircuitBreaker):
+    self.breaker = breaker
+    self._failed = False
+    self._lock = threading.Lock()
+
+  def fail(self):
+    with self._lock:
+      if self._failed:
+        return
+      self._failed = True
+    self.breaker.record_failure()
+
+def _request(kwargs: dict, key, attempt: _Attempt):
+  start = time.monotonic()
+  try:
+    data = sd.get_table(**kwargs)
+  except Exception:
+    attempt.fail()
+    raise
+  finally:
+    scheduler.release()
+
+  attempt.breaker.record_success()
+  _record_latency(str(kwargs.get('table_code')), time.monotonic() - start)
+  _remember(key, data)
+  return data
+
+def _fallback(key, reason: str, error: Exception = None):
+  """
+  Retorna o último resultado válido da consulta, marcando os rastreadores ativos.
+
+  Por padrão, só consultas interativas recebem dados desatualizados: a
+  materialização e as cargas em lote devem falhar, para não gravar dados antigos
+  como se fossem novos (ver `allow_stale`).
+  """
+  allowed = _allow_stale.get()
+  if allowed is None:
+    allowed = current_priority() == 'interactive'
+  data = _recall(key) if allowed else None
+  if data is None:
+    if error is not None:
+      raise error
+    raise SidraUnavailable(reason)
+
+  _count('stale_served')
+  flag_stale()
+  return data.copy()
+
+def get_table(**kwargs):
+  """
+  Consulta uma tabela do SIDRA respeitando os limites e a prioridade do agendador,
+  o prazo do contexto atual e o disjuntor da tabela.
+
+  Aceita os mesmos argumentos de `sidrapy.get_table`.
+
+  Raises:
+      SidraUnavailable: Se o prazo se esgotar (ou o disjuntor estiver aberto) e não
+          houver resultado anterior para a consulta.
+  """
+  key = tuple(sorted((name, str(value)) for name, value in kwargs.items()))
+  table_code = str(kwargs.get('table_code'))
+  breaker = _breaker(table_code)
+
+  if not breaker.allow():
+    return _fallback(key, f"Disjuntor aberto para a tabela {kwargs.get('table_code')}.")
+
+  remaining = time_remaining()
+  if not scheduler.acquire(timeout=None if remaining is None else max(remaining, 0)):
+    return _fallback(key, "Prazo esgotado aguardando uma vaga para consultar o SIDRA.")
+
+  start = time.monotonic()
+  end = None if remaining is None else start + remaining
+  hedge_at = _hedge_delay(table_code)
+  attempt = _Attempt(breaker)
+  futures = [_get_executor().submit(_request, kwargs, key, attempt)]
+  error = None
+
+  while futures:
+    now = time.monotonic()
+    timeout = None if end is None else max(end - now, 0)
+    if hedge_at is not None:
+      until_hedge = max(start + hedge_at - now, 0)
+      timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+
+    done, pending = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+    for future in done:
+      if future.exception() is None:
+        return future.result().copy()
+      error = future.exception()
+    futures = list(pending)
+
+    if not futures:
+      break
+    if end is not None and time.monotonic() >= end:
+      # A requisição continua em segundo plano (até `REQUEST_TIMEOUT`) e atualiza o
+      # último resultado válido; se ela falhar depois, a falha já foi registrada
+      attempt.fail()
+      return _fallback(key, "Prazo esgotado consultando o SIDRA.")
+    if hedge_at is not None and time.monotonic() >= start + hedge_at:
+      # Requisição duplicada só se houver vaga imediata, para não furar os limites
+      hedge_at = None
+      if scheduler.acquire(timeout=0):
+        _count('hedged')
+        futures.append(_get_executor().submit(_request, kwargs, key, attempt))
+
+  return _fallback(key, "Falha ao consultar o SIDRA.", error)
+
+def get_tables(locations, **kwargs) -> list:
+  """
+  Consulta vários níveis territoriais em uma única requisição (ex: `/n6/2203909/n3/22/n1/1`)
+  e separa a resposta por localidade.
+
+  Args:
+      locations (list): Pares (nível territorial, código IBGE).
+      **kwargs: Demais argumentos de `get_table` (sem `territorial_level` e
+          `ibge_territorial_code`).
+
+  Returns:
+      list: Um DataFrame por localidade, na ordem de `locations`, no formato de uma
+          consulta a `get_table` só com aquela localidade (a primeira linha é o cabeçalho).
+
+  Example:
+      >>> floriano, piaui, brasil = get_tables([('6', '2203909'), ('3', '22'), ('1', '1')], table_code='9543', ...)
+  """
+  locations = [(str(level), str(code)) for level, code in locations]
+  (level, code), *others = locations
+
+  data = get_table(
+    territorial_level=level,
+    ibge_territorial_code='/'.join([code] + [f'n{other_level}/{other_code}' for other_level, other_code in others]),
+    **kwargs)
+
+  header, rows = data.iloc[:1], data.iloc[1:]
+  return [
+    pd.concat([header, rows[(rows['NC'] == level) & (rows['D1C'] == code)]], ignore_index=True)
+    for level, code in locations
+  ]
+
+def _after_fork_in_child():
+  # Requisições e travas do processo pai não existem no filho (workers do Gunicorn, carga em lote)
+  global _breakers_lock, _executor_lock, _stats_lock
+  scheduler.reset()
+  _breakers_lock = threading.Lock()
+  _executor_lock = threading.Lock()
+  _stats_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def stats() -> dict:
+  """
+  Retorna as estatísticas do agendador, o estado dos disjuntores, o p95 de latência
+  de cada tabela e a quantidade de requisições duplicadas e de respostas desatualizadas.
+  """
+  with _breakers_lock:
+    breakers = {table: breaker.state for table, breaker in _breakers.items()}
+  with _stats_lock:
+    tables = list(_latencies)
+    counters = dict(_counters)
+
+  return dict(
+    scheduler.stats(),
+    breakers=breakers,
+    latency_p95={table: _hedge_delay(table) for table in tables},
+    hedged=counters.get('hedged', 0),
+    stale_served=counters.get('stale_served', 0),
+    last_good=_last_good.stats(),
+  )
@@ -0,0 +1,426 @@
+"""
+Dados de todos os municípios de um estado: composição do PIB (tabela SIDRA 5938)
+e produção das lavouras (tabela 5457).
+
+Cada tabela é baixada para todos os municípios do estado em poucas requisições
+(agrupando vários anos por requisição) e organizada como um array denso
+(município × ano × variável e município × produto × ano). Rankings, percentis,
+maiores produções e a comparação de um município com os demais são calculados
+com operações vetorizadas sobre esses arrays, então mudar o ano, o produto ou o
+município consultado não gera novas consultas ao SIDRA.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from app.dash_apps.data import sidra
+from app.dash_apps.data.cache import cached
+from app.dash_apps.data.indicators import PIB_VARIABLES, SECTORS
+from app.dash_apps.data.materialized import Incremental, materialized
+from app.dash_apps.data.memo import memoized
+from app.dash_apps.data.memory import freeze
+from app.dash_apps.data.periods import get_periods
+
+PIAUI_CODE = '22'
+
+# Anos por requisição. Com ~224 municípios e 7 variáveis, cada requisição traz cerca
+# de 9,4 mil valores, bem abaixo do limite de valores por consulta da API do SIDRA.
+BATCH_YEARS = 6
+
+SECTOR_LABELS = {
+  'agropecuaria': 'Agropecuária',
+  'industria': 'Indústria',
+  'servicos': 'Serviços',
+  'administracao_publica': 'Administração pública',
+}
+
+def fetch_state_pib_composition(periods, state_code=PIAUI_CODE) -> pd.DataFrame:
+  """
+  Baixa alguns períodos da tabela 5938 para todos os municípios de um estado, no formato
+  de `load_state_pib_composition` (usada também na sincronização incremental da visão).
+
+  Args:
+      periods (list): Períodos a baixar.
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+  """
+  periods = [str(period) for period in periods]
+  batches = []
+
+  for start in range(0, len(periods), BATCH_YEARS):
+    batch = sidra.get_table(
+      table_code='5938',
+      period=','.join(periods[start:start + BATCH_YEARS]),
+      territorial_level='6',
+      ibge_territorial_code=f'in n3 {state_code}',
+      variable=','.join(PIB_VARIABLES))
+
+    batches.append(batch.iloc[1:])
+
+  composition = pd.concat(batches, ignore_index=True)
+  composition = composition.loc[:, ['D1C', 'D1N', 'D2N', 'D3C', 'V']]
+  composition.columns = ['codigo', 'municipio', 'ano', 'variavel', 'valor']
+
+  composition['municipio'] = composition['municipio'].str.replace(r'\s*(\(\w{2}\)|- \w{2})$', '', regex=True)
+  composition['ano'] = pd.to_numeric(composition['ano'], errors='coerce').fillna(0).astype(np.int32)
+  composition['variavel'] = composition['variavel'].map(PIB_VARIABLES)
+  composition['valor'] = pd.to_numeric(composition['valor'], errors='coerce') * 1000
+
+  return composition
+
+@cached()
+@materialized('state_pib_composition', incremental=Incremental('5938', fetch_state_pib_composition))
+def load_state_pib_composition(state_code=PIAUI_CODE) -> pd.DataFrame:
+  """
+  Baixa a tabela 5938 (PIB e valor adicionado por setor) de todos os municípios de um estado.
+
+  Args:
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+
+  Returns:
+      pd.DataFrame: Formato longo, com as colunas 'codigo' (str), 'municipio' (str),
+          'ano' (int), 'variavel' (str, nome de `PIB_VARIABLES`) e 'valor' (float, em reais).
+  """
+  return fetch_state_pib_composition(get_periods('5938'), state_code)
+
+@dataclass(frozen=True)
+class CompositionCube:
+  """
+  PIB por município × ano × variável.
+
+  `values[i, j, k]` é o valor da variável `variables[k]` no município `codes[i]` e
+  no ano `years[j]` (NaN quando o dado não foi publicado).
+  """
+  codes: np.ndarray
+  names: np.ndarray
+  years: np.ndarray
+  variables: tuple
+  values: np.ndarray
+
+  def year_index(self, year) -> int:
+    """Posição do ano no eixo dos anos (o mais próximo, se o ano não existir)."""
+    return int(np.abs(self.years - int(year)).argmin())
+
+  def municipality_index(self, local_code) -> int:
+    positions = np.flatnonzero(self.codes == str(local_code))
+    if len(positions) == 0:
+      raise KeyError(f"Município {local_code} não encontrado nos dados do estado.")
+    return int(positions[0])
+
+  def sector_shares(self) -> np.ndarray:
+    """Participação (%) de cada setor de `SECTORS` no valor adicionado: array município × ano × setor."""
+    sectors = [self.variables.index(sector) for sector in SECTORS]
+    total = self.values[:, :, self.variables.index('valor_adicionado')]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+      return self.values[:, :, sectors] / total[:, :, None] * 100
+
+@cached()
+def get_state_composition(state_code=PIAUI_CODE) -> CompositionCube:
+  """
+  Organiza a composição do PIB do estado como um `CompositionCube`.
+
+  Args:
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+  """
+  composition = load_state_pib_composition(state_code=state_code)
+
+  codes, code_positions = np.unique(composition['codigo'].to_numpy(dtype=str), return_inverse=True)
+  years, year_positions = np.unique(composition['ano'].to_numpy(), return_inverse=True)
+  variables = tuple(PIB_VARIABLES.values())
+  variable_positions = composition['variavel'].map({name: position for position, name in enumerate(variables)}).to_numpy()
+
+  values = np.full((len(codes), len(years), len(variables)), np.nan)
+  values[code_positions, year_positions, variable_positions] = composition['valor'].to_numpy(dtype=np.float64)
+
+  names = composition.drop_duplicates('codigo').set_index('codigo')['municipio'].reindex(codes).to_numpy(dtype=str)
+
+  return freeze(CompositionCube(codes=codes, names=names, years=years, variables=variables, values=values))
+
+def _rank_and_percentile(values: np.ndarray) -> tuple:
+  """
+  Posição (1 = maior valor) e percentil de cada valor ao longo do eixo 0.
+
+  Valores NaN ficam sem posição e sem percentil.
+  """
+  valid = ~np.isnan(values)
+  filled = np.where(valid, values, -np.inf)
+
+  order = np.argsort(-filled, axis=0, kind='stable')
+  ranks = np.empty_like(order)
+  np.put_along_axis(ranks, order, np.arange(1, len(values) + 1)[:, None], axis=0)
+
+  counts = valid.sum(axis=0)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    percentiles = (counts - ranks + 1) / counts * 100
+
+  return np.where(valid, ranks, np.nan), np.where(valid, percentiles, np.nan)
+
+def rank_sector_shares(year, state_code=PIAUI_CODE) -> pd.DataFrame:
+  """
+  Ranking dos municípios do estado pela participação de cada setor no valor adicionado.
+
+  Args:
+      year (str or int): Ano desejado (o mais próximo disponível, se não houver).
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+
+  Returns:
+      pd.DataFrame: Uma linha por município e setor, com as colunas 'codigo',
+          'municipio', 'setor', 'participacao' (%), 'posicao' (1 = maior
+          participação) e 'percentil'.
+  """
+  cube = get_state_composition(state_code)
+  shares = cube.sector_shares()[:, cube.year_index(year), :]
+  ranks, percentiles = _rank_and_percentile(shares)
+
+  municipalities, sectors = len(cube.codes), len(SECTORS)
+  return pd.DataFrame({
+    'codigo': np.repeat(cube.codes, sectors),
+    'municipio': np.repeat(cube.names, sectors),
+    'setor': np.tile([SECTOR_LABELS[sector] for sector in SECTORS], municipalities),
+    'participacao': shares.ravel(),
+    'posicao': ranks.ravel(),
+    'percentil': percentiles.ravel(),
+  })
+
+@memoized
+def compare_with_state(local_code, year, state_code=PIAUI_CODE) -> pd.DataFrame:
+  """
+  Compara a composição do PIB de um município com a dos demais municípios do estado.
+
+  Args:
+      local_code (str): Código IBGE do município.
+      year (str or int): Ano desejado (o mais próximo disponível, se não houver).
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+
+  Returns:
+      pd.DataFrame: Uma linha por setor, com as colunas 'setor', 'participacao' (%,
+          no município), 'p25', 'mediana' e 'p75' (% entre os municípios do estado),
+          'posicao', 'percentil', 'municipios' (quantidade com dado no ano) e 'ano'.
+
+  Example:
+      >>> compare_with_state('2203909', 2021)[['setor', 'participacao', 'mediana', 'posicao']]
+                         setor  participacao  mediana  posicao
+      0           Agropecuária          6.10    24.80    201.0
+      ...
+  """
+  cube = get_state_composition(state_code)
+  year_position = cube.year_index(year)
+  municipality = cube.municipality_index(local_code)
+
+  shares = cube.sector_shares()[:, year_position, :]
+  ranks, percentiles = _rank_and_percentile(shares)
+  with np.errstate(invalid='ignore'):
+    quartiles = np.nanpercentile(shares, [25, 50, 75], axis=0)
+
+  return pd.DataFrame({
+    'setor': [SECTOR_LABELS[sector] for sector in SECTORS],
+    'participacao': shares[municipality],
+    'p25': quartiles[0],
+    'mediana': quartiles[1],
+    'p75': quartiles[2],
+    'posicao': ranks[municipality],
+    'percentil': percentiles[municipality],
+    'municipios': (~np.isnan(shares)).sum(axis=0),
+    'ano': int(cube.years[year_position]),
+  })
+
+# Primeiro ano considerado nos dados de lavouras (como em `load_crop_production`)
+CROPS_FIRST_YEAR = 2002
+
+# Anos por requisição na tabela 5457. Com ~224 municípios e ~60 produtos, cada
+# requisição traz cerca de 54 mil valores.
+CROPS_BATCH_YEARS = 4
+
+def fetch_state_crop_production(periods, state_code=PIAUI_CODE) -> pd.DataFrame:
+  """
+  Baixa alguns períodos (a partir de `CROPS_FIRST_YEAR`) da tabela 5457 para todos os
+  municípios de um estado, no formato de `load_state_crop_production` (usada também na
+  sincronização incremental da visão).
+
+  Args:
+      periods (list): Períodos a baixar.
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+  """
+  periods = [str(period) for period in periods if int(period) >= CROPS_FIRST_YEAR]
+  batches = []
+
+  for start in range(0, len(periods), CROPS_BATCH_YEARS):
+    batch = sidra.get_table(
+      table_code='5457',
+      classifications={'782': 'allxt'},
+      period=','.join(periods[start:start + CROPS_BATCH_YEARS]),
+      territorial_level='6',
+      ibge_territorial_code=f'in n3 {state_code}',
+      variable='214')
+
+    batches.append(batch.iloc[1:])
+
+  crops = pd.concat(batches, ignore_index=True)
+  crops = crops.loc[:, ['D1C', 'D1N', 'D2N', 'D4N', 'MN', 'V']]
+  crops.columns = ['codigo', 'municipio', 'ano', 'produto', 'medida', 'quantidade']
+
+  crops = crops[(crops['medida'] == 'Toneladas') & ~crops['quantidade'].isin(['...', 'X'])]
+
+  crops['municipio'] = crops['municipio'].str.replace(r'\s*(\(\w{2}\)|- \w{2})$', '', regex=True)
+  crops['ano'] = pd.to_numeric(crops['ano'], errors='coerce').fillna(0).astype(np.int32)
+  crops['quantidade'] = pd.to_numeric(
+    crops['quantidade'].replace(['-', '..'], '0').str.strip(), errors='coerce').fillna(0).astype(np.int64)
+
+  crops = crops[crops['quantidade'] != 0]
+
+  return crops.drop(columns='medida').reset_index(drop=True)
+
+@cached()
+@materialized('state_crop_production', incremental=Incremental('5457', fetch_state_crop_production))
+def load_state_crop_production(state_code=PIAUI_CODE) -> pd.DataFrame:
+  """
+  Baixa a produção das lavouras temporárias e permanentes (tabela SIDRA 5457) de todos
+  os municípios de um estado, a partir de `CROPS_FIRST_YEAR`.
+
+  Aplica a mesma limpeza de `load_crop_production`: só valores em toneladas, sem
+  valores omitidos ('...', 'X') e sem produção zero.
+
+  Args:
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+
+  Returns:
+      pd.DataFrame: Formato longo, com as colunas 'codigo' (str), 'municipio' (str),
+          'ano' (int), 'produto' (str) e 'quantidade' (int, em toneladas).
+  """
+  return fetch_state_crop_production(get_periods('5457'), state_code)
+
+@dataclass(frozen=True)
+class CropStore:
+  """
+  Produção das lavouras por município × produto × ano, em toneladas.
+
+  `quantities[i, j, k]` é a produção do produto `products[j]` no município `codes[i]`
+  no ano `years[k]` (0 quando não houve produção ou o dado não foi publicado).
+  """
+  codes: np.ndarray
+  names: np.ndarray
+  products: np.ndarray
+  years: np.ndarray
+  quantities: np.ndarray
+
+  def municipality_index(self, local_code) -> int:
+    positions = np.flatnonzero(self.codes == str(local_code))
+    if len(positions) == 0:
+      raise KeyError(f"Município {local_code} não encontrado nos dados do estado.")
+    return int(positions[0])
+
+  def product_index(self, product: str) -> int:
+    positions = np.flatnonzero(self.products == product)
+    if len(positions) == 0:
+      raise KeyError(f"Produto '{product}' não encontrado nos dados do estado.")
+    return int(positions[0])
+
+@cached()
+def get_state_crops(state_code=PIAUI_CODE) -> CropStore:
+  """
+  Organiza a produção das lavouras do estado como um `CropStore`.
+
+  Args:
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+  """
+  crops = load_state_crop_production(state_code=state_code)
+
+  codes, code_positions = np.unique(crops['codigo'].to_numpy(dtype=str), return_inverse=True)
+  products, product_positions = np.unique(crops['produto'].to_numpy(dtype=str), return_inverse=True)
+  years, year_positions = np.unique(crops['ano'].to_numpy(), return_inverse=True)
+
+  quantities = np.zeros((len(codes), len(products), len(years)), dtype=np.int64)
+  quantities[code_positions, product_positions, year_positions] = crops['quantidade'].to_numpy()
+
+  names = crops.drop_duplicates('codigo').set_index('codigo')['municipio'].reindex(codes).to_numpy(dtype=str)
+
+  return freeze(CropStore(codes=codes, names=names, products=products, years=years, quantities=quantities))
+
+def covers_crops(level, local_code, state_code=PIAUI_CODE) -> bool:
+  """
+  Indica se a localidade é um município do estado cujo `CropStore` já está disponível:
+  em cache ou com a visão materializada gravada, de modo que consultá-lo não baixa nada.
+
+  O `CropStore` é montado no aquecimento (data/warmup.py) ou a partir da materialização
+  (data/materialize.py), nunca dentro de um callback: baixar o histórico do estado
+  inteiro não cabe no prazo de uma requisição. Sem ele, os municípios do estado usam a
+  consulta da própria localidade (`economy.load_crop_production`).
+  """
+  if str(level) != '6' or not str(local_code).startswith(str(state_code)):
+    return False
+  return (get_state_crops.contains(state_code=state_code)
+          or load_state_crop_production.partition_version(state_code=state_code) is not None)
+
+def top_crops_for_municipality(local_code, start_year, end_year, top_crops=3, state_code=PIAUI_CODE) -> pd.DataFrame:
+  """
+  Retorna as `top_crops` maiores produções de cada ano de um município, no mesmo
+  formato de `get_crop_production`.
+
+  Args:
+      local_code (str): Código IBGE do município.
+      start_year (int): Ano inicial do intervalo.
+      end_year (int): Ano final do intervalo.
+      top_crops (int, optional): Quantidade de produtos por ano (padrão: 3).
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+
+  Returns:
+      pd.DataFrame: Colunas 'medida', 'quantidade', 'ano' e 'produto', ordenadas pela
+          quantidade produzida (decrescente).
+  """
+  store = get_state_crops(state_code)
+  in_range = (store.years >= int(start_year)) & (store.years <= int(end_year))
+
+  production = store.quantities[store.municipality_index(local_code)][:, in_range]
+  top_crops = min(int(top_crops), len(store.products))
+
+  top = np.argsort(-production, axis=0, kind='stable')[:top_crops]
+  quantities = np.take_along_axis(production, top, axis=0)
+  years = np.broadcast_to(store.years[in_range], top.shape)
+
+  crops = pd.DataFrame({
+    'medida': 'Toneladas',
+    'quantidade': quantities.ravel(),
+    'ano': years.ravel(),
+    'produto': store.products[top].ravel(),
+  })
+
+  crops = crops[crops['quantidade'] > 0]
+  return crops.sort_values(by='quantidade', ascending=False, kind='stable').reset_index(drop=True)
+
+def top_producers(product: str, year, top=10, state_code=PIAUI_CODE) -> pd.DataFrame:
+  """
+  Retorna os municípios do estado que mais produziram um produto em um ano.
+
+  Args:
+      product (str): Nome do produto (ex: 'Milho (em grão)').
+      year (str or int): Ano desejado (o mais próximo disponível, se não houver).
+      top (int, optional): Quantidade de municípios (padrão: 10).
+      state_code (str, optional): Código IBGE da UF (padrão: '22', Piauí).
+
+  Returns:
+      pd.DataFrame: Colunas 'posicao', 'codigo', 'municipio', 'quantidade' e 'ano'.
+
+  Example:
+      >>> top_producers('Soja (em grão)', 2022, top=3)
+         posicao   codigo        municipio  quantidade   ano
+      0        1  2204303      Uruçuí       1200000  2022
+      ...
+  """
+  store = get_state_crops(state_code)
+  year_position = int(np.abs(store.years - int(year)).argmin())
+
+  production = store.quantities[:, store.product_index(product), year_position]
+  top = min(int(top), len(production))
+
+  leaders = np.argpartition(-production, top - 1)[:top]
+  leaders = leaders[np.argsort(-production[leaders], kind='stable')]
+  leaders = leaders[production[leaders] > 0]
+
+  return pd.DataFrame({
+    'posicao': np.arange(1, len(leaders) + 1),
+    'codigo': store.codes[leaders],
+    'municipio': store.names[leaders],
+    'quantidade': production[leaders],
+    'ano': int(store.years[year_position]),
+  })
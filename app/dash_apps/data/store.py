@@ -0,0 +1,204 @@
+"""
+Armazenamento analítico local (SQLite) dos dados já limpos do SIDRA.
+
+Os históricos carregados pela camada de dados (ex: produção das lavouras de cada
+localidade) são gravados em tabelas SQLite com índices de cobertura, que começam
+pelo código da localidade e pelo ano. Filtros por intervalo de anos, as maiores
+produções de cada ano (top-k) e a busca por localidade viram varreduras de um
+trecho do índice, sem ler as demais localidades nem interpretar expressões do
+`DataFrame.query` a cada chamada.
+
+Os dados de cada localidade são gravados junto com a sua versão (hash do conteúdo,
+ver data/versions.py) e o instante da gravação, e só são regravados quando a versão
+muda. Enquanto estão dentro do prazo (`fresh`), a camada de dados consulta direto o
+armazenamento, sem baixar o histórico de novo. O arquivo (`STATVIEW_STORE_PATH`,
+padrão 'cache/store.sqlite3') é compartilhado pelos workers, em modo WAL: leituras
+não bloqueiam umas às outras nem a gravação. Cada tabela guarda no máximo
+`STATVIEW_STORE_MAX_LOCALITIES` localidades; ao ultrapassar o limite, as gravadas há
+mais tempo são apagadas, e o espaço liberado é reaproveitado pelas próximas gravações.
+
+Example:
+    >>> if not store.fresh('crop_production', '2211001'):
+    ...     store.ensure('crop_production', '2211001', crops, version)
+    >>> store.top_per_year('crop_production', '2211001', 2010, 2020, 3)
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+STORE_PATH = os.environ.get('STATVIEW_STORE_PATH', 'cache/store.sqlite3')
+
+# Tempo (s) durante o qual os dados gravados de uma localidade são usados sem baixá-los de novo
+STORE_TTL = float(os.environ.get('STATVIEW_STORE_TTL', 24 * 60 * 60))
+
+# Quantidade máxima de localidades gravadas em cada tabela
+STORE_MAX_LOCALITIES = int(os.environ.get('STATVIEW_STORE_MAX_LOCALITIES', 1000))
+
+# Colunas e índices de cada tabela. Toda tabela tem ainda 'codigo' (localidade) e
+# 'ordem' (posição da linha no DataFrame original, para devolver as linhas na mesma
+# ordem). Os índices incluem todas as colunas consultadas (índices de cobertura).
+TABLES = {
+  'crop_production': {
+    'columns': {'medida': 'TEXT', 'quantidade': 'INTEGER', 'ano': 'INTEGER', 'produto': 'TEXT'},
+    'ranking': 'quantidade',
+    'index': ('codigo', 'ano', 'quantidade DESC', 'ordem', 'produto', 'medida'),
+  },
+  'pib_composition': {
+    'columns': {'medida': 'TEXT', 'valor': 'REAL', 'ano': 'INTEGER', 'setor': 'TEXT'},
+    'ranking': 'valor',
+    'index': ('codigo', 'ano', 'ordem', 'setor', 'medida', 'valor'),
+  },
+}
+
+class LocalStore:
+  """
+  Tabelas SQLite por localidade, com uma conexão por thread.
+
+  As conexões são recriadas em processos filhos (fork), pois uma conexão SQLite não
+  pode ser usada por dois processos.
+  """
+  def __init__(self, path: str = STORE_PATH, max_localities: int = STORE_MAX_LOCALITIES):
+    self.path = path
+    self.max_localities = max(1, max_localities)
+    self._local = threading.local()
+
+  def _connection(self) -> sqlite3.Connection:
+    connection = getattr(self._local, 'connection', None)
+    if connection is not None and self._local.pid == os.getpid():
+      return connection
+
+    if self.path != ':memory:':
+      os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+    connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    self._create(connection)
+
+    self._local.connection, self._local.pid = connection, os.getpid()
+    return connection
+
+  def _create(self, connection: sqlite3.Connection):
+    connection.execute(
+      'CREATE TABLE IF NOT EXISTS versions '
+      '(tabela TEXT, codigo TEXT, versao TEXT, gravado_em REAL NOT NULL DEFAULT 0, PRIMARY KEY (tabela, codigo))')
+    # Arquivos criados antes da coluna 'gravado_em': as localidades já gravadas ficam expiradas
+    if 'gravado_em' not in {row[1] for row in connection.execute('PRAGMA table_info(versions)')}:
+      try:
+        connection.execute('ALTER TABLE versions ADD COLUMN gravado_em REAL NOT NULL DEFAULT 0')
+      except sqlite3.OperationalError:
+        pass  # Outro worker acabou de adicionar a coluna
+    for name, table in TABLES.items():
+      columns = ', '.join(f'{column} {kind}' for column, kind in table['columns'].items())
+      connection.execute(f'CREATE TABLE IF NOT EXISTS {name} (codigo TEXT, ordem INTEGER, {columns})')
+      connection.execute(f"CREATE INDEX IF NOT EXISTS {name}_lookup ON {name} ({', '.join(table['index'])})")
+
+  def _stored(self, table: str, local_code) -> tuple:
+    return self._connection().execute(
+      'SELECT versao, gravado_em FROM versions WHERE tabela = ? AND codigo = ?', (table, str(local_code))).fetchone()
+
+  def version(self, table: str, local_code) -> str:
+    """Versão dos dados gravados de uma localidade (None se não houver)."""
+    row = self._stored(table, local_code)
+    return row[0] if row else None
+
+  def fresh(self, table: str, local_code, max_age: float = None) -> bool:
+    """
+    Indica se há dados da localidade gravados há menos de `max_age` segundos
+    (padrão: `STORE_TTL`), que podem ser consultados sem baixá-los de novo.
+    """
+    row = self._stored(table, local_code)
+    return row is not None and time.time() - row[1] < (STORE_TTL if max_age is None else max_age)
+
+  def ensure(self, table: str, local_code, frame: pd.DataFrame, version: str, expired: bool = False) -> bool:
+    """
+    Garante que a tabela tenha os dados `frame` da localidade, na versão `version`.
+
+    Se a versão gravada já é a mesma, os dados não são regravados (só o prazo é
+    renovado, se já tiver vencido); senão, as linhas da localidade são substituídas
+    em uma única transação, e as localidades excedentes são apagadas (ver `_prune`).
+
+    Args:
+        expired (bool, optional): Grava os dados já vencidos (ex: dados desatualizados
+            do SIDRA), para que a próxima consulta tente baixá-los de novo.
+
+    Returns:
+        bool: True se os dados foram gravados; False se já estavam atualizados.
+    """
+    local_code = str(local_code)
+    written_at = 0.0 if expired else time.time()
+    connection = self._connection()
+
+    stored = self._stored(table, local_code)
+    if stored is not None and stored[0] == version:
+      if not expired and written_at - stored[1] >= STORE_TTL:
+        connection.execute(
+          'UPDATE versions SET gravado_em = ? WHERE tabela = ? AND codigo = ?', (written_at, table, local_code))
+      return False
+
+    columns = list(TABLES[table]['columns'])
+    rows = zip(
+      [local_code] * len(frame), range(len(frame)),
+      *(frame[column].tolist() for column in columns))
+
+    with connection:
+      connection.execute('BEGIN IMMEDIATE')
+      connection.execute(f'DELETE FROM {table} WHERE codigo = ?', (local_code,))
+      connection.executemany(
+        f"INSERT INTO {table} (codigo, ordem, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 2))})",
+        rows)
+      connection.execute(
+        'INSERT OR REPLACE INTO versions (tabela, codigo, versao, gravado_em) VALUES (?, ?, ?, ?)',
+        (table, local_code, version, written_at))
+      self._prune(connection, table, keep=local_code)
+
+    return True
+
+  def _prune(self, connection: sqlite3.Connection, table: str, keep: str):
+    # Apaga as localidades gravadas há mais tempo além de `max_localities` (nunca a recém-gravada)
+    count = connection.execute('SELECT COUNT(*) FROM versions WHERE tabela = ?', (table,)).fetchone()[0]
+    if count <= self.max_localities:
+      return
+
+    codes = [
+      code for code, in connection.execute(
+        'SELECT codigo FROM versions WHERE tabela = ? AND codigo != ? ORDER BY gravado_em LIMIT ?',
+        (table, keep, count - self.max_localities))
+    ]
+    connection.executemany(f'DELETE FROM {table} WHERE codigo = ?', [(code,) for code in codes])
+    connection.executemany('DELETE FROM versions WHERE tabela = ? AND codigo = ?', [(table, code) for code in codes])
+
+  def _frame(self, table: str, sql: str, params: tuple) -> pd.DataFrame:
+    columns = list(TABLES[table]['columns'])
+    return pd.DataFrame(self._connection().execute(sql, params).fetchall(), columns=columns)
+
+  def year_range(self, table: str, local_code, start_year, end_year) -> pd.DataFrame:
+    """
+    Linhas de uma localidade com o ano entre `start_year` e `end_year` (inclusive),
+    na ordem do DataFrame original.
+    """
+    columns = ', '.join(TABLES[table]['columns'])
+    return self._frame(
+      table,
+      f'SELECT {columns} FROM {table} WHERE codigo = ? AND ano BETWEEN ? AND ? ORDER BY ordem',
+      (str(local_code), int(start_year), int(end_year)))
+
+  def top_per_year(self, table: str, local_code, start_year, end_year, top: int) -> pd.DataFrame:
+    """
+    As `top` linhas de maior valor (coluna 'ranking' da tabela) de cada ano do
+    intervalo, ordenadas pelo valor (decrescente).
+    """
+    columns = ', '.join(TABLES[table]['columns'])
+    ranking = TABLES[table]['ranking']
+    return self._frame(
+      table,
+      f'SELECT {columns} FROM ('
+      f'  SELECT *, ROW_NUMBER() OVER (PARTITION BY ano ORDER BY {ranking} DESC, ordem) AS posicao'
+      f'  FROM {table} WHERE codigo = ? AND ano BETWEEN ? AND ?'
+      f') WHERE posicao <= ? ORDER BY {ranking} DESC, ordem',
+      (str(local_code), int(start_year), int(end_year), int(top)))
+
+# Armazenamento compartilhado por toda a camada de dados do processo
+store = LocalStore()
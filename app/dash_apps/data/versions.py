@@ -0,0 +1,68 @@
+"""
+Versões dos dados identificadas pelo conteúdo.
+
+Cada conjunto carregado pela camada de dados recebe um hash dos seus valores limpos
+(ver `cached` em data/cache.py). Caches derivados (indicadores, partições
+materializadas, ETags da API) usam esse hash como chave: uma atualização que traz
+exatamente os mesmos dados não invalida nada, e uma revisão real invalida apenas o
+que depende do conjunto revisado.
+"""
+import dataclasses
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+def _canonical(value):
+  # Colunas de objetos viram texto (depois de inferir os tipos), para que o mesmo dado
+  # gere o mesmo hash calculado a partir do SIDRA ou lido de volta do Parquet (ex: um
+  # número guardado como `int` em uma coluna de objetos ou como `np.int64`)
+  value = value.infer_objects()
+  if isinstance(value, pd.Series):
+    return value.astype(str) if value.dtype == object else value
+
+  objects = value.columns[value.dtypes == object]
+  if len(objects):
+    value = value.copy()
+    value[objects] = value[objects].astype(str)
+  return value
+
+def _update(digest, value):
+  if isinstance(value, (pd.DataFrame, pd.Series)):
+    # Só os nomes e os valores: tipos equivalentes (ex: int32 e int64) geram o mesmo hash
+    labels = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+    digest.update(repr([str(label) for label in labels]).encode())
+    digest.update(pd.util.hash_pandas_object(_canonical(value), index=True).to_numpy().tobytes())
+  elif isinstance(value, pd.Index):
+    digest.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+  elif isinstance(value, np.ndarray):
+    digest.update(repr(value.shape).encode())
+    digest.update(pd.util.hash_array(value.ravel()).tobytes())
+  elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+    for field in dataclasses.fields(value):
+      digest.update(field.name.encode())
+      _update(digest, getattr(value, field.name))
+  elif isinstance(value, (tuple, list)):
+    for item in value:
+      _update(digest, item)
+  elif isinstance(value, dict):
+    for key in sorted(value, key=repr):
+      digest.update(repr(key).encode())
+      _update(digest, value[key])
+  else:
+    digest.update(repr(value).encode())
+
+def content_hash(value) -> str:
+  """
+  Calcula o hash do conteúdo de um conjunto de dados.
+
+  Aceita DataFrames, Series, arrays numpy, dataclasses de arrays (ex: `CompositionCube`)
+  e coleções desses valores.
+
+  Example:
+      >>> content_hash(pd.DataFrame({'ano': [2021], 'pib': [1.0]}))
+      'f8b5f93778d24260'
+  """
+  digest = hashlib.sha1()
+  _update(digest, value)
+  return digest.hexdigest()[:16]
@@ -0,0 +1,385 @@
+"""
+Carga em lote dos indicadores de todos os municípios brasileiros em um armazém Parquet.
+
+Pré-calcula, para os ~5.570 municípios, os mesmos indicadores dos dashboards:
+população (Censo e estimativas), grupos de idade, raça, situação do domicílio,
+alfabetização, PIB e valor adicionado por setor, lavouras e PIB per capita.
+
+O job tem três etapas:
+
+- planejamento: cada tabela é dividida em tarefas (conjunto, UF, lote de períodos),
+  com lotes dimensionados para ficar abaixo de `VALUES_PER_REQUEST` valores por
+  consulta (municípios da UF × categorias × períodos);
+- execução: as tarefas rodam em um pool de processos, cada uma baixando (uma
+  consulta ao SIDRA, `in n3 <uf>`), limpando e gravando a sua partição. Os processos
+  dividem um único limite de taxa (`sidra.SharedRateLimiter`), então o volume de
+  requisições ao IBGE não cresce com o número de workers;
+- derivados: o PIB per capita de cada UF é calculado a partir das partições de PIB e
+  população já gravadas.
+
+Cada tarefa grava um arquivo `<conjunto>/uf=<uf>/<primeiro>-<último período>.parquet`
+(gravação atômica, ver `materialized.write_partition`), que serve também de
+checkpoint: uma execução interrompida é retomada a partir das tarefas que faltam.
+Todos os conjuntos têm o mesmo formato longo: 'codigo', 'municipio', 'ano',
+'categoria' e 'valor', e podem ser lidos com `pd.read_parquet('<armazém>/<conjunto>')`.
+
+Uso:
+    python -m app.dash_apps.data.warehouse --output warehouse --workers 8 [--full] [--dry-run]
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from app.dash_apps.data import sidra
+from app.dash_apps.data.indicators import PIB_VARIABLES
+from app.dash_apps.data.materialized import VERSION_METADATA_KEY, write_partition
+from app.dash_apps.data.periods import get_periods
+from app.dash_apps.data.versions import content_hash
+
+WAREHOUSE_DIR = os.environ.get('STATVIEW_WAREHOUSE_DIR', 'warehouse')
+
+# Valores por consulta ao SIDRA usados para dimensionar os lotes de períodos. A API
+# recusa consultas acima de 100 mil valores; o maior caso de um único período (as
+# lavouras dos 853 municípios de Minas Gerais) fica em torno de 56 mil.
+VALUES_PER_REQUEST = int(os.environ.get('STATVIEW_WAREHOUSE_VALUES_PER_REQUEST', 50_000))
+
+# Prazo (s) de cada consulta e tentativas por tarefa, para que o job termine em tempo
+# limitado mesmo com o SIDRA instável
+REQUEST_DEADLINE = float(os.environ.get('STATVIEW_WAREHOUSE_DEADLINE', 120))
+TASK_ATTEMPTS = int(os.environ.get('STATVIEW_WAREHOUSE_ATTEMPTS', 3))
+
+# Municípios por UF (IBGE, 2022)
+UF_MUNICIPALITIES = {
+  '11': 52, '12': 22, '13': 62, '14': 15, '15': 144, '16': 16, '17': 139,
+  '21': 217, '22': 224, '23': 184, '24': 167, '25': 223, '26': 185, '27': 102,
+  '28': 75, '29': 417, '31': 853, '32': 78, '33': 92, '35': 645,
+  '41': 399, '42': 295, '43': 497, '50': 79, '51': 141, '52': 246, '53': 1,
+}
+
+# Sufixo da UF no nome do município (ex: 'Floriano (PI)' ou 'Floriano - PI')
+MUNICIPALITY_SUFFIX = r'\s*(\(\w{2}\)|- \w{2})$'
+
+COLUMNS = ['codigo', 'municipio', 'ano', 'categoria', 'valor']
+
+@dataclass(frozen=True)
+class Dataset:
+  """
+  Conjunto do armazém: uma consulta a uma tabela do SIDRA para todos os municípios.
+
+  Attributes:
+      table_code (str): Tabela do SIDRA.
+      query (dict): Demais argumentos de `sidra.get_table` (variável e classificação).
+      categories (int): Valores por município e período (categorias × variáveis),
+          usado para dimensionar os lotes.
+      category (str): Coluna da resposta com a categoria (None para um valor único).
+      labels (dict): Nomes das categorias, a partir da coluna `category` (opcional).
+      unit (str): Unidade de medida a manter (opcional; ex: 'Toneladas').
+      scale (float): Fator aplicado aos valores (ex: 1000 para valores em mil reais).
+  """
+  table_code: str
+  query: dict
+  categories: int = 1
+  category: str = None
+  labels: dict = None
+  unit: str = None
+  scale: float = 1
+
+# Mesmas tabelas, variáveis e classificações das funções de dados dos dashboards
+DATASETS = {
+  'population_census': Dataset('9605', {'categories': 9521, 'variable': '93'}),
+  'population_estimates': Dataset('6579', {'variable': '9324'}),
+  'population_age_group': Dataset(
+    '9606',
+    {
+      'classification': '287',
+      'categories': "93070,93084,93085,93086,93087,93088,93089,93090,93091,93092,93093,93094,93095,93096,93097,93098,49108,49109,60040,60041,6653",
+      'variable': '93',
+    },
+    categories=21, category='D4N'),
+  'population_by_race': Dataset(
+    '9605',
+    {'classification': '86', 'categories': '2776,2777,2778,2779,2780', 'variable': '1000093'},
+    categories=5, category='D4N'),
+  'population_by_local': Dataset(
+    '9923', {'classification': '1', 'categories': '1,2', 'variable': '1000093'}, categories=2, category='D4N'),
+  'literacy_rate': Dataset(
+    '9543',
+    {'classification': '287', 'categories': '93086,93087,2999,9482,9483,9484,3000', 'variable': '2513'},
+    categories=7, category='D4N'),
+  'pib_composition': Dataset(
+    '5938', {'variable': ','.join(PIB_VARIABLES)},
+    categories=len(PIB_VARIABLES), category='D3C', labels=PIB_VARIABLES, scale=1000),
+  'crop_production': Dataset(
+    '5457', {'classifications': {'782': 'allxt'}, 'variable': '214'},
+    categories=66, category='D4N', unit='Toneladas'),
+}
+
+# Conjunto derivado, calculado depois das tarefas de PIB e população
+PER_CAPITA = 'pib_per_capita'
+PER_CAPITA_INPUTS = ('pib_composition', 'population_census', 'population_estimates')
+
+@dataclass(frozen=True)
+class Task:
+  """Uma consulta ao SIDRA: um conjunto, uma UF e um lote de períodos."""
+  dataset: str
+  state_code: str
+  periods: tuple
+
+  @property
+  def values(self) -> int:
+    """Estimativa de valores da consulta."""
+    return UF_MUNICIPALITIES[self.state_code] * DATASETS[self.dataset].categories * len(self.periods)
+
+  def path(self, root: str) -> str:
+    return os.path.join(root, self.dataset, f'uf={self.state_code}', f'{self.periods[0]}-{self.periods[-1]}.parquet')
+
+def plan(datasets=None, states=None) -> list:
+  """
+  Divide os conjuntos em tarefas por UF e lote de períodos.
+
+  Os lotes de cada UF agrupam tantos períodos quanto cabem em `VALUES_PER_REQUEST`
+  (ao menos um). As tarefas são ordenadas da maior para a menor, para que as mais
+  demoradas não fiquem para o fim da execução.
+
+  Os lotes dependem dos períodos publicados de cada tabela, então o plano só é
+  montado com os metadados do IBGE, nunca com a lista reserva de data/periods.py:
+  com outros lotes, `run` apagaria partições válidas.
+
+  Args:
+      datasets (list, optional): Conjuntos a planejar (padrão: todos de `DATASETS`).
+      states (list, optional): Códigos das UFs (padrão: todas).
+
+  Returns:
+      list: Lista de `Task`.
+
+  Raises:
+      SidraUnavailable: Se os metadados de alguma tabela estiverem indisponíveis.
+
+  Example:
+      >>> plan(['population_by_local'], ['22'])
+      [Task(dataset='population_by_local', state_code='22', periods=(2022,))]
+  """
+  tasks = []
+
+  for name in datasets or DATASETS:
+    dataset = DATASETS[name]
+    periods = get_periods(dataset.table_code, fallback=False)
+
+    for state_code in states or UF_MUNICIPALITIES:
+      batch = max(1, VALUES_PER_REQUEST // (UF_MUNICIPALITIES[state_code] * dataset.categories))
+      tasks += [
+        Task(name, state_code, tuple(periods[start:start + batch]))
+        for start in range(0, len(periods), batch)
+      ]
+
+  return sorted(tasks, key=lambda task: task.values, reverse=True)
+
+def clean(raw: pd.DataFrame, dataset: Dataset) -> pd.DataFrame:
+  """
+  Converte a resposta do SIDRA para o formato longo do armazém.
+
+  Valores sem dado numérico ('...', 'X', '..') são descartados; '-' (zero absoluto)
+  vira 0.
+  """
+  raw = raw.iloc[1:]
+  if dataset.unit is not None:
+    raw = raw[raw['MN'] == dataset.unit]
+
+  if dataset.category is None:
+    category = 'Total'
+  elif dataset.labels is not None:
+    category = raw[dataset.category].map(dataset.labels)
+  else:
+    category = raw[dataset.category]
+
+  frame = pd.DataFrame({
+    'codigo': raw['D1C'],
+    'municipio': raw['D1N'].str.replace(MUNICIPALITY_SUFFIX, '', regex=True),
+    'ano': pd.to_numeric(raw['D2N'], errors='coerce').fillna(0).astype(np.int32),
+    'categoria': category,
+    'valor': pd.to_numeric(raw['V'].str.strip().replace('-', '0'), errors='coerce') * dataset.scale,
+  })
+
+  return frame.dropna(subset=['valor']).reset_index(drop=True)
+
+def run_task(task: Task, root: str) -> tuple:
+  """
+  Baixa, limpa e grava a partição de uma tarefa, com até `TASK_ATTEMPTS` tentativas.
+
+  Returns:
+      tuple: (tarefa, linhas gravadas, segundos).
+  """
+  dataset = DATASETS[task.dataset]
+  start = time.monotonic()
+
+  for attempt in range(TASK_ATTEMPTS):
+    try:
+      with sidra.priority('bulk'), sidra.deadline(REQUEST_DEADLINE):
+        raw = sidra.get_table(
+          table_code=dataset.table_code,
+          territorial_level='6',
+          ibge_territorial_code=f'in n3 {task.state_code}',
+          period=','.join(str(period) for period in task.periods),
+          **dataset.query)
+      break
+    except Exception:
+      if attempt == TASK_ATTEMPTS - 1:
+        raise
+      # Espera o disjuntor da tabela (ou a instabilidade da API) passar
+      time.sleep(sidra.BREAKER_COOLDOWN * (attempt + 1))
+
+  frame = clean(raw, dataset)
+  write_partition(task.path(root), frame, {VERSION_METADATA_KEY: content_hash(frame).encode()})
+
+  return task, len(frame), time.monotonic() - start
+
+def _init_worker(limiter: sidra.SharedRateLimiter):
+  sidra.scheduler.share(limiter)
+
+def read_dataset(root: str, name: str, state_code: str) -> pd.DataFrame:
+  """Lê todas as partições de um conjunto em uma UF (vazio, se não houver nenhuma)."""
+  paths = sorted(glob.glob(os.path.join(root, name, f'uf={state_code}', '*.parquet')))
+  if not paths:
+    return pd.DataFrame(columns=COLUMNS)
+  return pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+
+def compute_per_capita(root: str, state_code: str) -> pd.DataFrame:
+  """
+  Calcula o PIB per capita dos municípios de uma UF a partir das partições gravadas.
+
+  Como em `indicators.compute_indicators`, a população do ano é a do Censo, quando
+  houver, ou a estimativa anual; anos sem população publicada usam a do ano mais
+  próximo do mesmo município.
+  """
+  pib = read_dataset(root, 'pib_composition', state_code)
+  pib = pib[pib['categoria'] == 'pib'].drop(columns='categoria')
+
+  population = pd.concat([
+    read_dataset(root, 'population_census', state_code),
+    read_dataset(root, 'population_estimates', state_code),
+  ], ignore_index=True)
+  population = population.drop_duplicates(['codigo', 'ano'])[['codigo', 'ano', 'valor']]
+
+  per_capita = pd.merge_asof(
+    pib.astype({'ano': np.int64}).sort_values('ano'),
+    population.astype({'ano': np.int64}).sort_values('ano').rename(columns={'valor': 'populacao'}),
+    on='ano', by='codigo', direction='nearest')
+
+  per_capita['valor'] = per_capita['valor'] / per_capita['populacao']
+  per_capita['categoria'] = 'pib_per_capita'
+  per_capita['ano'] = per_capita['ano'].astype(np.int32)
+
+  return per_capita[COLUMNS].sort_values(['codigo', 'ano']).reset_index(drop=True)
+
+def _prune(root: str, tasks: list):
+  # Partições de lotes que não existem mais no plano (ex: os lotes mudaram com a
+  # publicação de um novo período) sobreporiam os períodos das partições atuais
+  planned = {os.path.abspath(task.path(root)) for task in tasks}
+  for dataset, state_code in {(task.dataset, task.state_code) for task in tasks}:
+    for path in glob.glob(os.path.join(root, dataset, f'uf={state_code}', '*.parquet')):
+      if os.path.abspath(path) not in planned:
+        os.remove(path)
+
+def run(root: str = WAREHOUSE_DIR, workers: int = None, datasets=None, states=None, full: bool = False) -> list:
+  """
+  Executa a carga em lote, retomando a partir das partições já gravadas.
+
+  Args:
+      root (str, optional): Diretório do armazém (padrão: `WAREHOUSE_DIR`).
+      workers (int, optional): Processos do pool (padrão: número de CPUs).
+      datasets (list, optional): Conjuntos a carregar (padrão: todos).
+      states (list, optional): Códigos das UFs (padrão: todas).
+      full (bool, optional): Refaz também as tarefas já concluídas.
+
+  Returns:
+      list: Lista de (tarefa, erro) das tarefas que falharam.
+
+  Raises:
+      SidraUnavailable: Se os metadados de alguma tabela estiverem indisponíveis
+          (ver `plan`); nesse caso, nenhuma partição é apagada.
+  """
+  workers = workers or os.cpu_count()
+  datasets = list(datasets or DATASETS)
+  states = list(states or UF_MUNICIPALITIES)
+
+  tasks = plan(datasets, states)
+  _prune(root, tasks)
+  pending = [task for task in tasks if full or not os.path.exists(task.path(root))]
+  print(f"{len(tasks)} tarefas planejadas, {len(tasks) - len(pending)} já concluídas, {len(pending)} a executar.")
+
+  # Os processos herdam (fork) a camada de dados já importada e um único limite de taxa
+  context = multiprocessing.get_context('fork')
+  limiter = sidra.SharedRateLimiter(sidra.RATE, sidra.BURST, context)
+  failures = []
+  started = time.monotonic()
+
+  with ProcessPoolExecutor(
+      max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(limiter,)) as executor:
+    futures = {executor.submit(run_task, task, root): task for task in pending}
+
+    for done, future in enumerate(as_completed(futures), start=1):
+      task = futures[future]
+      try:
+        _, rows, seconds = future.result()
+        print(f"[{done}/{len(pending)}] {task.dataset} uf={task.state_code} {task.periods[0]}-{task.periods[-1]}: "
+              f"{rows} linhas em {seconds:.1f} s")
+      except Exception as error:
+        failures.append((task, error))
+        print(f"[{done}/{len(pending)}] Falha em {task.dataset} uf={task.state_code} {task.periods}: {error}")
+
+  if PER_CAPITA_INPUTS[0] in datasets:
+    failed = {(task.dataset, task.state_code) for task, _ in failures}
+    for state_code in states:
+      if any((name, state_code) in failed for name in PER_CAPITA_INPUTS):
+        continue
+      per_capita = compute_per_capita(root, state_code)
+      write_partition(
+        os.path.join(root, PER_CAPITA, f'uf={state_code}', 'all.parquet'), per_capita,
+        {VERSION_METADATA_KEY: content_hash(per_capita).encode()})
+
+  print(f"Carga concluída em {time.monotonic() - started:.0f} s.")
+  return failures
+
+def main():
+  parser = argparse.ArgumentParser(description="Carrega os indicadores de todos os municípios em um armazém Parquet.")
+  parser.add_argument('--output', default=WAREHOUSE_DIR, help="Diretório do armazém.")
+  parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processos do pool.")
+  parser.add_argument('--datasets', help=f"Conjuntos separados por vírgula (padrão: todos de {list(DATASETS)}).")
+  parser.add_argument('--states', help="Códigos das UFs separados por vírgula (padrão: todas).")
+  parser.add_argument('--full', action='store_true', help="Refaz também as tarefas já concluídas.")
+  parser.add_argument('--dry-run', action='store_true', help="Só exibe o plano e a duração mínima estimada.")
+  args = parser.parse_args()
+
+  datasets = args.datasets.split(',') if args.datasets else None
+  states = args.states.split(',') if args.states else None
+
+  try:
+    tasks = plan(datasets, states)
+  except sidra.SidraUnavailable as error:
+    # Sem os períodos publicados, os lotes (e as partições a manter) não são conhecidos
+    print(f"Carga interrompida: {error} Tente novamente mais tarde.")
+    sys.exit(1)
+
+  if args.dry_run:
+    for task in tasks:
+      print(f"{task.dataset} uf={task.state_code} {task.periods[0]}-{task.periods[-1]}: ~{task.values} valores")
+    # Limite inferior: o limite de taxa é compartilhado por todo o pool
+    if sidra.RATE > 0:
+      print(f"{len(tasks)} consultas; duração mínima de ~{max(len(tasks) - sidra.BURST, 0) / sidra.RATE:.0f} s "
+            f"com {sidra.RATE:g} requisições/s.")
+    return
+
+  failures = run(args.output, args.workers, datasets, states, args.full)
+  print(f"{len(failures)} tarefa(s) com falha; execute novamente para retomar.")
+  sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,76 @@
+"""
+Aquecimento dos conjuntos de dados de referência.
+
+Carrega no cache em memória os dados usados por todas as sessões (estruturas
+estaduais, séries de indicadores, alfabetização de Floriano, Piauí e Brasil e o
+índice de períodos das tabelas) e importa os módulos dos dashboards que baixam
+dados na importação (ex: a série completa do PIB da composição do PIB). Com `preload_app` (ver gunicorn.conf.py), o
+aquecimento roda uma única vez no processo mestre, antes do fork: os workers
+herdam os dados prontos em páginas compartilhadas (copy-on-write), em vez de cada
+um consultar o SIDRA e manter a sua própria cópia.
+"""
+import importlib
+import logging
+import time
+
+from app.dash_apps.data import economy as econ
+from app.dash_apps.data import education as educ
+from app.dash_apps.data import indicators
+from app.dash_apps.data import population as pop
+from app.dash_apps.data import statewide
+from app.dash_apps.data.periods import FALLBACK_PERIODS, get_periods
+from app.dash_apps.data.sidra import priority
+from app.dash_apps.data.utils import FLORIANO_CODE
+
+# Módulos dos dashboards que carregam dados na importação. Importados no mestre, o app
+# criado no worker só monta o layout, sem consultar o SIDRA dentro da primeira requisição
+# (e sem o prazo dos callbacks), mesmo que o prefixo não esteja em STATVIEW_EAGER_APPS.
+PRELOADED_MODULES = (
+  'app.dash_apps.layout.composicao_pib',
+)
+
+# Conjuntos carregados no aquecimento, como pares (função, argumentos)
+REFERENCE_DATASETS = (
+  [(get_periods, {'table_code': table}) for table in FALLBACK_PERIODS]
+  + [
+    (statewide.get_state_composition, {}),
+    (statewide.get_state_crops, {}),
+    (indicators.get_indicators, {'local_code': FLORIANO_CODE}),
+    (pop.get_population_total, {'year': 'last'}),
+    (pop.get_top_population_cities, {'year': 'last'}),
+    (econ.get_total_pib, {'year': 'last'}),
+    (pop.get_municipality_name, {'local_code': FLORIANO_CODE}),
+    (educ.get_literacy_rates, {}),
+  ]
+  + [(importlib.import_module, {'name': module}) for module in PRELOADED_MODULES]
+)
+
+def warm(log=None) -> list:
+  """
+  Carrega os conjuntos de `REFERENCE_DATASETS`.
+
+  Falhas (ex: SIDRA indisponível) não interrompem o aquecimento: o conjunto é
+  carregado sob demanda pelo primeiro callback que precisar dele. As consultas usam
+  a prioridade 'refresh'.
+
+  Args:
+      log (optional): Onde registrar as falhas e a duração (ex: `server.log` do
+          Gunicorn). Padrão: o logger deste módulo.
+
+  Returns:
+      list: Lista de (nome da função, argumentos, erro) dos conjuntos que falharam.
+  """
+  log = log or logging.getLogger(__name__)
+  failures = []
+  start = time.monotonic()
+
+  with priority('refresh'):
+    for func, kwargs in REFERENCE_DATASETS:
+      try:
+        func(**kwargs)
+      except Exception as error:
+        failures.append((func.__qualname__, kwargs, error))
+        log.warning(f"Falha ao aquecer {func.__qualname__} {kwargs}: {error}")
+
+  log.info(f"Aquecimento concluído em {time.monotonic() - start:.1f} s com {len(failures)} falha(s).")
+  return failures
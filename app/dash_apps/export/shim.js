@@ -0,0 +1,75 @@
+/*
+  Troca de dados da versão estática dos dashboards.
+
+  Cada página exportada traz um manifesto (script#export-manifest) que descreve
+  quais seletores alimentam cada pacote JSON. Ao mudar um seletor, o pacote
+  correspondente é baixado e aplicado aos gráficos e textos da página.
+*/
+(function () {
+  const manifest = JSON.parse(document.getElementById("export-manifest").textContent);
+
+  function inputKey(id) {
+    const el = document.getElementById(id);
+    if (el.tagName === "SELECT") {
+      return String(el.selectedIndex);
+    }
+    // Intervalo (RangeSlider): dois selects com data-part 0 e 1
+    const parts = el.querySelectorAll("select");
+    let start = parts[0].selectedIndex;
+    let end = parts[1].selectedIndex;
+    if (start > end) {
+      [start, end] = [end, start];
+    }
+    return start + "-" + end;
+  }
+
+  function applyOutputs(outputs) {
+    for (const [id, value] of Object.entries(outputs)) {
+      const el = document.getElementById(id);
+      if (!el) {
+        continue;
+      }
+      if ("figure" in value) {
+        const figure = value.figure || {};
+        Plotly.react(el, figure.data || [], figure.layout || {}, { responsive: true });
+      } else {
+        el.textContent = value.children == null ? "" : value.children;
+      }
+    }
+  }
+
+  function loadBundle(bundle) {
+    const path = "bundles/" + bundle.name + "/" + bundle.inputs.map(inputKey).join("/") + ".json";
+    return fetch(path)
+      .then((response) => response.json())
+      .then(applyOutputs);
+  }
+
+  function setupTabs() {
+    document.querySelectorAll(".export-tabs").forEach((tabs) => {
+      const buttons = tabs.querySelectorAll(":scope > .export-tab-buttons > button");
+      const panels = tabs.querySelectorAll(":scope > .export-tab-panel");
+      buttons.forEach((button, index) => {
+        button.addEventListener("click", () => {
+          panels.forEach((panel, i) => {
+            panel.hidden = i !== index;
+          });
+          buttons.forEach((b, i) => b.classList.toggle("selected", i === index));
+          panels[index].querySelectorAll(".js-plotly-plot").forEach((el) => Plotly.Plots.resize(el));
+        });
+      });
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", () => {
+    applyOutputs(manifest.static);
+    setupTabs();
+
+    for (const bundle of manifest.bundles) {
+      for (const id of bundle.inputs) {
+        document.getElementById(id).addEventListener("change", () => loadBundle(bundle));
+      }
+      loadBundle(bundle);
+    }
+  });
+})();
@@ -0,0 +1,313 @@
+"""
+Exporta versões estáticas (somente leitura) dos dashboards.
+
+Para cada combinação de opções dos seletores, os callbacks dos apps são executados
+uma única vez e as saídas (figuras e textos) são gravadas como pacotes JSON. O HTML
+de cada app é gerado a partir do próprio layout Dash, e um pequeno script (shim.js)
+troca os pacotes quando o usuário muda um seletor. O resultado pode ser servido por
+qualquer servidor de arquivos estáticos, sem Python no caminho da requisição.
+
+Uso:
+    python -m app.dash_apps.export.static --output build/static
+"""
+import argparse
+import html as html_lib
+import itertools
+import json
+import os
+import shutil
+
+from plotly.offline import get_plotlyjs
+from plotly.utils import PlotlyJSONEncoder
+
+from app.dash_apps.data.sidra import priority
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dash_apps.layout import composicao_pib
+from app.dash_apps.layout.components import callbacks
+from app.dash_apps.layout.config.options import (
+  city_code_options,
+  outputs_mapping_graphs,
+  outputs_mapping_heavy,
+  outputs_mapping_infos,
+  outputs_mapping_metrics,
+  state_code_options)
+from app.dash_apps.layout.dashboards import general_information_dashboard as general_info
+
+SHIM_PATH = os.path.join(os.path.dirname(__file__), 'shim.js')
+ASSETS_PATH = 'assets'
+
+def _ignore_progress(progress):
+  """Substitui o `set_progress` dos callbacks em segundo plano durante a exportação."""
+
+def _outputs(component_ids):
+  return [(component_id, 'figure' if 'graph' in component_id else 'children') for component_id in component_ids]
+
+# A exportação estática é do dashboard de Floriano (rota padrão do app geral)
+EXPORTED_PATHNAME = f"/municipio/{FLORIANO_CODE}/"
+
+# As comparações de raça têm pacotes próprios; no pacote de anos, os seus valores são ignorados
+DEFAULT_RACE_KEYS = (next(iter(city_code_options)), next(iter(state_code_options)))
+
+# Cada pacote é descrito por (nome, ids dos seletores de entrada, [(callback, saídas), ...]).
+# Os callbacks recebem os valores dos seletores na mesma ordem dos ids de entrada; saídas
+# extras dos callbacks (ex: sinais do carregamento progressivo) são ignoradas.
+# Pacotes sem seletores são calculados uma vez e embutidos no próprio HTML.
+GENERAL_BUNDLES = [
+  ('alfabetizacao', [], [
+    (lambda: callbacks.update_literacy(_ignore_progress, EXPORTED_PATHNAME),
+      [('literacy-table', 'figure'), ('comparison-literacy', 'figure'), ('literacy-rate-footnote', 'children')]),
+  ]),
+  ('anos', ['year-filter'], [
+    (lambda year: callbacks.update_metrics(year, EXPORTED_PATHNAME), _outputs(outputs_mapping_metrics.keys())),
+    (lambda year: callbacks.update_year_panels(year, EXPORTED_PATHNAME, True, *DEFAULT_RACE_KEYS),
+      _outputs(list(outputs_mapping_graphs) + list(outputs_mapping_infos))),
+    (lambda year: callbacks.update_heavy_panels(year, EXPORTED_PATHNAME, True), _outputs(outputs_mapping_heavy.keys())),
+  ]),
+  ('zona-capitais', ['city-code-filter'], [
+    (callbacks.update_city_location_interactive, _outputs(['city-comparison-graph', 'city-comparison-footnote'])),
+  ]),
+  ('zona-estados', ['state-code-filter'], [
+    (callbacks.update_state_location_interactive, _outputs(['state-comparison-graph', 'state-comparison-footnote'])),
+  ]),
+  ('raca-capitais', ['race-city-code-filter', 'year-filter'], [
+    (lambda location_key, year: callbacks.race_comparison(city_code_options, location_key, year),
+      _outputs(['city-race-comparison-graph', 'city-race-comparison-footnote'])),
+  ]),
+  ('raca-estados', ['race-state-code-filter', 'year-filter'], [
+    (lambda location_key, year: callbacks.race_comparison(state_code_options, location_key, year),
+      _outputs(['state-race-comparison-graph', 'state-race-comparison-footnote'])),
+  ]),
+  ('culturas', ['start-year', 'end-year', 'top-n-producoes'], [
+    (lambda start_year, end_year, top_crops: callbacks.update_top_crops_graph(_ignore_progress, start_year, end_year, top_crops, EXPORTED_PATHNAME),
+      [('top_crops_productions_graph', 'figure'), ('crops_footnote', 'children')]),
+  ]),
+]
+
+PIB_BUNDLES = [
+  ('composicao', ['year-slider'], [
+    (composicao_pib.update_graph, [('composicao-pib', 'figure')]),
+    (composicao_pib.update_state_comparison, [('composicao-pib-estado', 'figure'), ('composicao-pib-estado-footnote', 'children')]),
+  ]),
+]
+
+# Apps exportados: (diretório de saída, título, função de layout, pacotes)
+EXPORTED_APPS = [
+  ('floriano-statview', "Floriano Statview", general_info.create_layout, GENERAL_BUNDLES),
+  ('pib-floriano', "Composição do PIB de Floriano", composicao_pib.create_layout, PIB_BUNDLES),
+]
+
+def _find_component(component, component_id):
+  """Procura recursivamente um componente pelo id dentro da árvore do layout."""
+  if getattr(component, 'id', None) == component_id:
+    return component
+
+  children = getattr(component, 'children', None)
+  if children is None:
+    return None
+
+  for child in children if isinstance(children, (list, tuple)) else [children]:
+    found = _find_component(child, component_id) if hasattr(child, '_type') else None
+    if found is not None:
+      return found
+
+  return None
+
+def _option_values(component) -> list:
+  """
+  Retorna a lista de valores selecionáveis de um componente de entrada.
+
+  Dropdowns usam as próprias opções; sliders de intervalo viram a lista de todos os
+  pares (início, fim) com início <= fim, na mesma ordem usada pelo shim.js.
+  """
+  if component._type == 'Dropdown':
+    return [option['value'] if isinstance(option, dict) else option for option in component.options]
+
+  if component._type == 'RangeSlider':
+    steps = list(range(component.min, component.max + 1, component.step or 1))
+    return [[steps[i], steps[j]] for i in range(len(steps)) for j in range(i, len(steps))]
+
+  raise ValueError(f"Componente de entrada não suportado na exportação: {component._type}")
+
+def _option_keys(component) -> list:
+  """Retorna as chaves de caminho (índices) correspondentes a `_option_values`."""
+  if component._type == 'RangeSlider':
+    size = len(range(component.min, component.max + 1, component.step or 1))
+    return [f"{i}-{j}" for i in range(size) for j in range(i, size)]
+
+  return [str(i) for i in range(len(component.options))]
+
+def _style_to_css(style: dict) -> str:
+  return ';'.join(
+    f"{''.join('-' + c.lower() if c.isupper() else c for c in key)}:{value}"
+    for key, value in style.items()
+  )
+
+def _attrs(component, **extra) -> str:
+  component_id = getattr(component, 'id', None)
+  attrs = {
+    # Ids de pattern-matching (dicionários) não são endereçáveis pelo shim
+    'id': component_id if isinstance(component_id, str) else None,
+    'class': getattr(component, 'className', None),
+    'for': getattr(component, 'htmlFor', None),
+    'style': _style_to_css(component.style) if getattr(component, 'style', None) else None,
+  }
+  attrs.update(extra)
+  return ''.join(f' {key}="{html_lib.escape(str(value))}"' for key, value in attrs.items() if value is not None)
+
+def _select(options, value, **attrs) -> str:
+  items = []
+  for option in options:
+    label, option_value = (option['label'], option['value']) if isinstance(option, dict) else (option, option)
+    selected = ' selected' if option_value == value else ''
+    items.append(f'<option{selected}>{html_lib.escape(str(label))}</option>')
+  attributes = ''.join(f' {key}="{html_lib.escape(str(v))}"' for key, v in attrs.items() if v is not None)
+  return f"<select{attributes}>{''.join(items)}</select>"
+
+def render_html(component, static_outputs: dict) -> str:
+  """
+  Converte a árvore de componentes Dash em HTML estático.
+
+  Gráficos que já possuem figura no layout (ex: tabela de alfabetização) são
+  registrados em `static_outputs` para serem desenhados pelo shim ao carregar a página.
+  """
+  if component is None:
+    return ''
+  if isinstance(component, (list, tuple)):
+    return ''.join(render_html(child, static_outputs) for child in component)
+  if not hasattr(component, '_type'):
+    return html_lib.escape(str(component))
+
+  kind = component._type
+  if kind == 'Location' or getattr(component, 'className', None) == 'loading-controls':
+    return ''
+
+  children = render_html(getattr(component, 'children', None), static_outputs)
+
+  if kind == 'Graph':
+    if getattr(component, 'figure', None) is not None:
+      static_outputs[component.id] = {'figure': component.figure}
+    return f'<div{_attrs(component)}></div>'
+
+  if kind == 'Dropdown':
+    return _select(component.options, component.value, id=component.id, **{'class': getattr(component, 'className', None)})
+
+  if kind in ('Slider', 'RangeSlider'):
+    steps = list(range(component.min, component.max + 1, component.step or 1))
+    values = component.value if kind == 'RangeSlider' else [component.value]
+    selects = ''.join(_select(steps, value, **{'data-part': i}) for i, value in enumerate(values))
+    return f'<div{_attrs(component, **{"class": "export-range"})}>{selects}</div>'
+
+  if kind == 'Tabs':
+    tabs = component.children
+    buttons = ''.join(
+      f'<button type="button"{" class=\"selected\"" if tab.value == component.value else ""}>{html_lib.escape(tab.label)}</button>'
+      for tab in tabs)
+    panels = ''.join(
+      f'<div class="export-tab-panel"{"" if tab.value == component.value else " hidden"}>{render_html(tab.children, static_outputs)}</div>'
+      for tab in tabs)
+    return f'<div{_attrs(component, **{"class": "export-tabs"})}><div class="export-tab-buttons">{buttons}</div>{panels}</div>'
+
+  tag = kind.lower() if component._namespace == 'dash_html_components' else 'div'
+  return f'<{tag}{_attrs(component)}>{children}</{tag}>'
+
+def render_page(title: str, body: str, manifest: dict, static_outputs: dict) -> str:
+  manifest = dict(manifest, static=static_outputs)
+  manifest_json = json.dumps(manifest, cls=PlotlyJSONEncoder).replace('</', '<\\/')
+  return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+  <meta charset="utf-8">
+  <title>{html_lib.escape(title)}</title>
+  <link rel="stylesheet" href="../assets/style.css">
+  <script src="../assets/plotly.min.js"></script>
+  <script id="export-manifest" type="application/json">{manifest_json}</script>
+  <script src="../assets/shim.js"></script>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+def _run_bundle(bundle_callbacks, values) -> dict:
+  outputs = {}
+  for func, func_outputs in bundle_callbacks:
+    results = func(*values)
+    for (component_id, prop), result in zip(func_outputs, results):
+      outputs[component_id] = {prop: result}
+  return outputs
+
+def export_bundles(layout, bundles, output_dir: str, static_outputs: dict):
+  """
+  Executa os callbacks para todas as combinações de opções dos seletores e grava
+  cada resultado em `bundles/<nome>/<índices>.json`. Pacotes sem seletores são
+  adicionados a `static_outputs`.
+  """
+  for name, input_ids, bundle_callbacks in bundles:
+    if not input_ids:
+      static_outputs.update(_run_bundle(bundle_callbacks, []))
+      continue
+
+    components = [_find_component(layout, input_id) for input_id in input_ids]
+    combinations = itertools.product(*[zip(_option_keys(c), _option_values(c)) for c in components])
+
+    for combination in combinations:
+      keys = [key for key, _ in combination]
+      values = [value for _, value in combination]
+
+      outputs = _run_bundle(bundle_callbacks, values)
+
+      path = os.path.join(output_dir, 'bundles', name, *keys[:-1], keys[-1] + '.json')
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      with open(path, 'w', encoding='utf-8') as file:
+        json.dump(outputs, file, cls=PlotlyJSONEncoder)
+
+    print(f"  pacote '{name}' exportado")
+
+def export_app(output_root: str, directory: str, title: str, create_layout, bundles):
+  """Exporta um app Dash: página HTML e pacotes JSON de todas as opções."""
+  output_dir = os.path.join(output_root, directory)
+  os.makedirs(output_dir, exist_ok=True)
+
+  layout = create_layout()
+  static_outputs = {}
+  body = render_html(layout, static_outputs)
+
+  export_bundles(layout, bundles, output_dir, static_outputs)
+
+  manifest = {'bundles': [{'name': name, 'inputs': input_ids} for name, input_ids, _ in bundles if input_ids]}
+  page = render_page(title, body, manifest, static_outputs)
+  with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as file:
+    file.write(page)
+
+def export_all(output_root: str):
+  """Exporta todos os apps, os assets e uma página inicial com links para cada app."""
+  assets_dir = os.path.join(output_root, 'assets')
+  os.makedirs(assets_dir, exist_ok=True)
+
+  for file_name in os.listdir(ASSETS_PATH):
+    shutil.copy(os.path.join(ASSETS_PATH, file_name), assets_dir)
+  shutil.copy(SHIM_PATH, assets_dir)
+  with open(os.path.join(assets_dir, 'plotly.min.js'), 'w', encoding='utf-8') as file:
+    file.write(get_plotlyjs())
+
+  list_items = ""
+  for directory, title, create_layout, bundles in EXPORTED_APPS:
+    print(f"Exportando {title}...")
+    export_app(output_root, directory, title, create_layout, bundles)
+    list_items += f"<li><a href=\"{directory}/\">{html_lib.escape(title)}</a></li>\n"
+
+  with open(os.path.join(output_root, 'index.html'), 'w', encoding='utf-8') as file:
+    file.write(f"<!DOCTYPE html>\n<html lang=\"pt-BR\">\n<meta charset=\"utf-8\">\n<ul>\n{list_items}</ul>\n</html>\n")
+
+def main():
+  parser = argparse.ArgumentParser(description="Exporta os dashboards como páginas estáticas.")
+  parser.add_argument('--output', default='build/static', help="Diretório de saída (padrão: build/static)")
+  args = parser.parse_args()
+
+  # A exportação é trabalho em lote: cede a vez às consultas dos usuários
+  with priority('bulk'):
+    export_all(args.output)
+
+if __name__ == "__main__":
+  main()
@@ -1,3 +1,7 @@
+import plotly.io as pio
+
+from app.dash_apps.graphs.utils import compact_template
+
 
 COLOR_PALETTE = [
   "#2B6CB0",  # Azul escuro
@@ -20,3 +24,10 @@ CROPS_COLOR_PALETTE = {
     "Melancia": "#4FD1C5",            # Verde água
     "Outros": "#A0AEC0"               # Cinza neutro
 }
+
+# Tipos de traço usados nos gráficos do app
+FIGURE_TRACE_TYPES = ['bar', 'pie', 'scatter', 'table']
+
+# Template padrão das figuras: o 'plotly' sem os estilos que o app não usa (ver `compact_template`)
+pio.templates['statview'] = compact_template('plotly', FIGURE_TRACE_TYPES)
+pio.templates.default = 'statview'
@@ -1,21 +1,23 @@
 import plotly.express as px
 from plotly.graph_objs import Figure
 from app.dash_apps.data import population as pop
+from app.dash_apps.data.utils import FLORIANO_CODE
 import plotly.graph_objects as go
 from app.dash_apps.graphs.constants import *
 
-def create_age_pyramid(year='last')->Figure:
+def create_age_pyramid(year='last', local_code: str = FLORIANO_CODE)->Figure:
   """
-  Gera um gráfico de pirâmide etária para Floriano baseado no ano informado.
+  Gera um gráfico de pirâmide etária para o município baseado no ano informado.
 
   Args:
     year (str): Ano da consulta (por padrão, 'last' para o mais recente).
+    local_code (str): Código IBGE do município (padrão Floriano).
 
   Returns:
     plotly.graph_objs.Figure: Gráfico de barras horizontais com idade versus população.
   """
   graph = px.bar(
-    data_frame= pop.get_population_age_group(year),
+    data_frame= pop.get_population_age_group(year, local_code),
     x='valor',
     y='grupo_idade',
     orientation='h',
@@ -32,24 +34,28 @@ def create_age_pyramid(year='last')->Figure:
 
   return graph
 
-def get_age_pyramid_info(year='last'):
+def get_age_pyramid_info(year='last', local_code: str = FLORIANO_CODE):
   
-  df = pop.get_population_age_group(year)
+  df = pop.get_population_age_group(year, local_code)
   return df.iloc[0]['footnote']
 
-def create_most_populated_cities(year='last')->Figure:
+def create_most_populated_cities(year='last', local_code: str = FLORIANO_CODE)->Figure:
   """
   Gera um gráfico de barras horizontais com as 10 cidades mais populosas do Piauí.
-  Destaca Floriano com uma cor diferente.
+  Destaca o município selecionado com uma cor diferente, caso esteja entre elas.
+
+  Args:
+    year (str): Ano da consulta (padrão 'last' para o mais recente).
+    local_code (str): Código IBGE do município destacado (padrão Floriano).
 
   Returns:
     plotly.graph_objs.Figure: Gráfico com população por município.
   """
   df = pop.get_top_population_cities(year)
   
-  floriano_idx = df[df['municipio'] == "Floriano"].index[0]
   colors = [COLOR_PALETTE[0],] * len(df) 
-  colors[floriano_idx] = COLOR_PALETTE[3]
+  for idx in df[df['codigo'] == str(local_code)].index:
+    colors[idx] = COLOR_PALETTE[3]
   
   graph = go.Bar(
     x=df['populacao'],
@@ -80,33 +86,33 @@ def create_most_populated_cities(year='last')->Figure:
   
   return fig
 
-def get_most_populated_cities_info(year='last'):
+def get_most_populated_cities_info(year='last', local_code: str = FLORIANO_CODE):
   df = pop.get_top_population_cities(year)
   return df.iloc[0]['footnote']
 
-def create_race_distribution(level: str = '6', local_code: str = '2203909', year='last')->Figure:
+def create_race_distribution(level: str = '6', local_code: str = FLORIANO_CODE, year='last')->Figure:
   """
-  Gera um gráfico de pizza com a distribuição racial da população de Floriano.
+  Gera um gráfico de pizza com a distribuição racial da população do município.
 
   Args:
     level (str): Nível territorial (padrão '6' para município).
-    local_code (str): Código IBGE do município (padrão Floriano: '2203909').
+    local_code (str): Código IBGE do município (padrão Floriano).
 
   Returns:
     plotly.graph_objs.Figure: Gráfico de pizza com porcentagem por raça.
   """
   df = pop.get_population_by_race(level, local_code, year).sort_values(ascending=True,by=['porcentagem'])
   
-  formatted_values = [f"{v:.2f}" for v in df['porcentagem']]
+  # Os rótulos são formatados no cliente, a partir dos próprios valores
   graph = px.bar(
     data_frame=df,
     y='raca',
     x='porcentagem',
     orientation='h',
     labels={'raca':"Raça", 'porcentagem': "Porcentagem"},
-    text=formatted_values,
     color_discrete_sequence=COLOR_PALETTE,
   )
+  graph.update_traces(texttemplate='%{x:.2f}')
 
   graph.update_layout(
     plot_bgcolor='rgba(0,0,0,0)',
@@ -115,17 +121,12 @@ def create_race_distribution(level: str = '6', local_code: str = '2203909', year
   
   return graph
 
-def get_race_distribution_info(level: str = '6', local_code: str = '2203909', year: str = 'last')->Figure:
+def get_race_distribution_info(level: str = '6', local_code: str = FLORIANO_CODE, year: str = 'last')->Figure:
   distribuition = pop.get_population_by_race(level, local_code, year)
 
   return distribuition.iloc[0]['footnote']
 
-def get_location_distribution_info(level: str = '6', local_code: str = '2203909', year: str = 'last')->Figure:
-  distribuition = pop.get_population_by_race(level, local_code, year)
-
-  return distribuition.iloc[0]['footnote']
-
-def create_location_distribution(level: str = '6', local_code: str = '2203909', year: str = 'last')->Figure:
+def create_location_distribution(level: str = '6', local_code: str = FLORIANO_CODE, year: str = 'last')->Figure:
   """
   Gera um gráfico de pizza com a distribuição da população entre zonas urbanas e rurais.
 
@@ -152,9 +153,9 @@ def create_location_distribution(level: str = '6', local_code: str = '2203909',
 
   return graph
 
-def get_location_distribution_info(level: str = '6', local_code: str = '2203909', year: str = 'last')->Figure:
+def get_location_distribution_info(level: str = '6', local_code: str = FLORIANO_CODE, year: str = 'last')->str:
   """
-  Gera um gráfico de pizza com a distribuição da população entre zonas urbanas e rurais.
+  Retorna a nota de rodapé da distribuição da população entre zonas urbanas e rurais.
 
   Args:
     level (str): Nível territorial (padrão '6' para município).
@@ -162,33 +163,35 @@ def get_location_distribution_info(level: str = '6', local_code: str = '2203909'
     year (str): Ano da consulta (padrão 'last' para o mais recente).
 
   Returns:
-    plotly.graph_objs.Figure: Gráfico de pizza com porcentagem por zona (urbana/rural).
+    str: Nota de rodapé com o ano de referência dos dados.
   """
   distribuition = pop.get_population_by_local(level, local_code, year)
 
   return distribuition.iloc[0]['footnote']
 
 
-def get_metric_total_population(year='last'):
+def get_metric_total_population(year='last', local_code: str = FLORIANO_CODE):
   """
-  Obtém a população total de Floriano para o ano especificado.
+  Obtém a população total do município para o ano especificado.
 
   Args:
     year (str): Ano da consulta (padrão 'last').
+    local_code (str): Código IBGE do município (padrão Floriano).
 
   Returns:
     int: População total.
   """
-  return pop.get_population_total(year=year)['total_populacao']
+  return pop.get_population_total(year=year, local_code=local_code)['total_populacao']
 
-def get_metric_total_population_info(year='last'):
+def get_metric_total_population_info(year='last', local_code: str = FLORIANO_CODE):
   """
   Retorna o ano de referência da população total consultada.
 
   Args:
     year (str): Ano da consulta (padrão 'last').
+    local_code (str): Código IBGE do município (padrão Floriano).
 
   Returns:
     str: Texto com o ano do censo usado.
   """
-  return pop.get_population_total(year=year)['footnote']
+  return pop.get_population_total(year=year, local_code=local_code)['footnote']
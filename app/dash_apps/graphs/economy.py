@@ -1,69 +1,76 @@
 import plotly.express as px
+import plotly.graph_objects as go
 from app.dash_apps.data import economy as econ
+from app.dash_apps.data import statewide
+from app.dash_apps.data.utils import FLORIANO_CODE
 from app.dash_apps.graphs.utils import format_pib_value
 from app.dash_apps.graphs.constants import *
 
-def get_metric_total_pib(year='last', format: bool = True):
+def get_metric_total_pib(year='last', format: bool = True, local_code: str = FLORIANO_CODE):
   """
-  Obtém o PIB total de Floriano formatado em reais.
+  Obtém o PIB total do município formatado em reais.
 
   Args:
     year (str): Ano da consulta (padrão 'last').
     format (bool): Se o valor deve ser formatado com notação de milhar/milhão/bilhão
+    local_code (str): Código IBGE do município (padrão Floriano).
 
   Returns:
     str: PIB formatado.
   """
-  value = econ.get_total_pib(year)['total']
+  value = econ.get_total_pib(year, local_code)['total']
   if format:
     moeda = format_pib_value(value)
   else: 
     moeda = f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
   return moeda
 
-def get_metric_total_pib_info(year='last'):
+def get_metric_total_pib_info(year='last', local_code: str = FLORIANO_CODE):
   """
   Retorna o ano de referência do PIB consultado.
 
   Args:
     year (str): Ano da consulta (padrão 'last').
+    local_code (str): Código IBGE do município (padrão Floriano).
 
   Returns:
     str: Texto com o ano do censo usado para o PIB.
   """
-  return econ.get_total_pib(year)['footnote']
+  return econ.get_total_pib(year, local_code)['footnote']
 
-def get_metric_pib_per_capita(year='last', format: bool = True):
+def get_metric_pib_per_capita(year='last', format: bool = True, local_code: str = FLORIANO_CODE):
   """
-  Obtém o PIB per capita de Floriano formatado em reais.
+  Obtém o PIB per capita do município formatado em reais.
 
   Args:
     year (str): Ano da consulta (padrão 'last').
     format (bool): Se o valor deve ser formatado com notação de milhar/milhão/bilhão
+    local_code (str): Código IBGE do município (padrão Floriano).
 
   Returns:
     str: PIB formatado.
   """
-  value = econ.get_pib_per_capita(year)['pib_per_capita']
+  value = econ.get_pib_per_capita(year, local_code)['pib_per_capita']
   if format:
     moeda = format_pib_value(value)
   else: 
     moeda = f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
   return moeda
 
-def get_metric_pib_per_capita_info(year='last'):
+def get_metric_pib_per_capita_info(year='last', local_code: str = FLORIANO_CODE):
   """
   Retorna o ano de referência do PIB consultado.
 
   Args:
     year (str): Ano da consulta (padrão 'last').
+    local_code (str): Código IBGE do município (padrão Floriano).
 
   Returns:
     str: Texto com o ano do censo usado para o PIB.
   """
-  return econ.get_pib_per_capita(year)['footnote']
+  return econ.get_pib_per_capita(year, local_code)['footnote']
 
-def create_top_crops(level="6",local_code="2203909", start_year=2010, end_year=2025, top_crops=3):
+def create_top_crops(level="6",local_code=FLORIANO_CODE, start_year=2010, end_year=2025, top_crops=3):
   top_crops = econ.get_crop_production(level, local_code, start_year, end_year, top_crops)
   fig = None
   
@@ -72,7 +79,6 @@ def create_top_crops(level="6",local_code="2203909", start_year=2010, end_year=2
       data_frame=top_crops,
       y="quantidade",
       x="ano",
-      text="quantidade",
       labels={'ano': 'Ano', 'quantidade': 'Produção em Toneladas', 'produto': 'Cultura'},
       orientation="v",
       color="produto",
@@ -84,7 +90,6 @@ def create_top_crops(level="6",local_code="2203909", start_year=2010, end_year=2
       data_frame=top_crops,
       y="quantidade",
       x="produto",
-      text="quantidade",
       labels={'produto': 'Cultura', 'quantidade': 'Produção em Toneladas'},
       orientation="v",
       color="produto",
@@ -92,9 +97,79 @@ def create_top_crops(level="6",local_code="2203909", start_year=2010, end_year=2
       color_discrete_map=CROPS_COLOR_PALETTE,
     )
   
+  # Rótulos com a quantidade de cada barra, sem repetir os valores em `text`
+  fig.update_traces(texttemplate='%{y:.0f}')
+
   fig.update_layout(  
     plot_bgcolor='rgba(0,0,0,0)',
     paper_bgcolor='rgba(0,0,0,0)',
   )
 
   return fig
+
+def create_state_sector_comparison(year, local_code: str = FLORIANO_CODE):
+  """
+  Compara a participação de cada setor no valor adicionado do município com a dos
+  demais municípios do Piauí (mediana e faixa entre os percentis 25 e 75).
+
+  Args:
+    year (str or int): Ano da comparação (o mais próximo disponível, se não houver).
+    local_code (str): Código IBGE do município (padrão Floriano).
+
+  Returns:
+    plotly.graph_objs._figure.Figure: Gráfico de barras com a comparação.
+  """
+  comparison = statewide.compare_with_state(local_code, year)
+  cube = statewide.get_state_composition()
+  name = cube.names[cube.municipality_index(local_code)]
+
+  fig = go.Figure([
+    go.Bar(
+      name=name,
+      x=comparison['setor'],
+      y=comparison['participacao'],
+      marker_color=COLOR_PALETTE[0],
+      customdata=comparison[['posicao', 'municipios', 'percentil']],
+      hovertemplate="%{y:.1f}%<br>%{customdata[0]:.0f}º de %{customdata[1]} (percentil %{customdata[2]:.0f})<extra></extra>",
+    ),
+    go.Bar(
+      name="Mediana do Piauí",
+      x=comparison['setor'],
+      y=comparison['mediana'],
+      marker_color=COLOR_PALETTE[7],
+      error_y=dict(
+        type='data',
+        symmetric=False,
+        array=comparison['p75'] - comparison['mediana'],
+        arrayminus=comparison['mediana'] - comparison['p25'],
+      ),
+      hovertemplate="%{y:.1f}%<extra></extra>",
+    ),
+  ])
+
+  fig.update_layout(
+    barmode='group',
+    yaxis_title="Participação no valor adicionado (%)",
+    legend=dict(orientation="h", yanchor="top", y=-0.2),
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+  )
+
+  return fig
+
+def get_state_sector_comparison_info(year, local_code: str = FLORIANO_CODE):
+  """
+  Retorna a posição do município no estado em cada setor, para a nota de rodapé.
+
+  Args:
+    year (str or int): Ano da comparação.
+    local_code (str): Código IBGE do município (padrão Floriano).
+
+  Returns:
+    str: Texto com o ano e a posição do município em cada setor.
+  """
+  comparison = statewide.compare_with_state(local_code, year)
+  positions = "; ".join(
+    f"{row.setor}: {row.posicao:.0f}º de {row.municipios}" for row in comparison.itertuples()
+  )
+  return f"Dados de {comparison['ano'].iloc[0]}. Posição entre os municípios do Piauí — {positions}. As barras cinzas indicam a faixa entre os percentis 25 e 75."
@@ -4,14 +4,11 @@ from plotly.graph_objs import Figure
 import plotly.graph_objects as go
 
 from app.dash_apps.data import education as educ
+from app.dash_apps.data.utils import FLORIANO_CODE
 from app.dash_apps.graphs.constants import *
 
-def create_literacy_table(level: str = '6', local_code: str = '2203909', year: str = 'last')->Figure:
+def create_literacy_table(level: str = '6', local_code: str = FLORIANO_CODE, year: str = 'last')->Figure:
   df = educ.get_literacy_rate(level, local_code, year)
-  values = []
-  
-  for value in df['quantidade']:
-    values.append(f"{value:.2f}")
     
   graph = go.Figure(
     data=[
@@ -23,7 +20,8 @@ def create_literacy_table(level: str = '6', local_code: str = '2203909', year: s
           font=dict(color='#2B5C7B')  # Azul escuro
           ),
         cells=dict(
-          values=[df['grupo'], values],
+          values=[df['grupo'], df['quantidade']],
+          format=[None, '.2f'],  # Taxas formatadas no cliente
           fill_color='lavender',  # Lavanda suave
           align='left',
           font=dict(color='#4A4A4A')  # Texto cinza escuro para melhor legibilidade
@@ -38,27 +36,25 @@ def create_literacy_table(level: str = '6', local_code: str = '2203909', year: s
   )
   return graph
 
-def create_comparison_literacy(year='last'):
+def create_comparison_literacy(year='last', local_code: str = FLORIANO_CODE):
   """
-  Compara graficamente a taxa de alfabetização por faixa etária entre Floriano (PI), o estado do Piauí e o Brasil.
+  Compara graficamente a taxa de alfabetização por faixa etária entre o município (por padrão, Floriano - PI),
+  o estado do Piauí e o Brasil.
 
   Esta função utiliza dados da tabela SIDRA sobre a taxa de alfabetismo, gera um gráfico de linha usando Plotly Express
   e retorna a figura. A comparação é feita com base em faixas etárias, e o gráfico permite visualizar as diferenças
   regionais nos níveis de alfabetização.
 
   Dados utilizados:
-      - Floriano: nível territorial 6, código IBGE 2203909
+      - Município: nível territorial 6, código IBGE `local_code` (padrão Floriano, 2203909)
       - Piauí: nível territorial 3, código IBGE 22
       - Brasil: nível territorial 1, código IBGE 1
 
   Returns:
       plotly.graph_objs._figure.Figure: Objeto de figura contendo o gráfico de linha com os dados de alfabetização.
   """
-  floriano_dt = educ.get_literacy_rate(level= 6,code=2203909, year=year)
-    
-  piaui_dt = educ.get_literacy_rate(level= 3,code=22, year=year)
-  
-  brasil_dt = educ.get_literacy_rate(level= 1,code=1, year=year)
+  # Uma única consulta ao SIDRA para as três localidades (ver `educ.get_literacy_rates`)
+  floriano_dt, piaui_dt, brasil_dt = educ.get_literacy_rates([('6', local_code), ('3', '22'), ('1', '1')], year=year)
   
   df = pd.concat(
     [floriano_dt, piaui_dt, brasil_dt],
@@ -90,7 +86,7 @@ def create_comparison_literacy(year='last'):
     
   return fig
 
-def get_literacy_rate_info(year='last'):
-  floriano_dt = educ.get_literacy_rate(level= 6,code=2203909, year=year)
+def get_literacy_rate_info(year='last', local_code: str = FLORIANO_CODE):
+  floriano_dt = educ.get_literacy_rate(level= 6,code=local_code, year=year)
   return floriano_dt.iloc[0]['footnote']
 
@@ -1,3 +1,17 @@
+import importlib.util
+
+import plotly.graph_objects as go
+import plotly.io as pio
+from dash import Patch
+
+# As respostas dos callbacks são serializadas por `plotly.io.json.to_json_plotly`; com
+# o orjson instalado, a serialização é várias vezes mais rápida que a do json padrão
+if importlib.util.find_spec('orjson'):
+  pio.json.config.default_engine = 'orjson'
+
+# Itens do layout do template 'plotly' que só afetam subplots e escalas de cor
+# contínuas, que o app não usa
+UNUSED_TEMPLATE_LAYOUT = ('colorscale', 'coloraxis', 'geo', 'mapbox', 'polar', 'scene', 'ternary')
 
 def format_pib_value(value) -> str:
   """
@@ -16,3 +30,101 @@ def format_pib_value(value) -> str:
     return f"R$ {value / 1_000_000:.2f} milhões".replace(".", ",")
   else:
     return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def create_skeleton_figure() -> dict:
+  """
+  Retorna uma figura leve (sem dados e sem template) exibida enquanto os dados
+  do gráfico ainda não chegaram.
+
+  A figura é um dicionário simples, para que o layout inicial da página seja pequeno.
+
+  Returns:
+    dict: Figura Plotly com os eixos ocultos e a mensagem "Carregando...".
+  """
+  return {
+    'data': [],
+    'layout': {
+      'template': None,
+      'xaxis': {'visible': False},
+      'yaxis': {'visible': False},
+      'plot_bgcolor': 'rgba(0,0,0,0)',
+      'paper_bgcolor': 'rgba(0,0,0,0)',
+      'annotations': [{
+        'text': 'Carregando...',
+        'showarrow': False,
+        'font': {'size': 14, 'color': '#A0AEC0'},
+      }],
+    },
+  }
+
+def compact_template(base: str, trace_types) -> go.layout.Template:
+  """
+  Cria uma versão enxuta de um template do Plotly, com os estilos apenas dos tipos de
+  traço informados.
+
+  O template é enviado dentro de cada figura; o 'plotly' completo tem cerca de 7 KB,
+  a maior parte com estilos de tipos de gráfico (heatmap, surface, carpet...) e de
+  subplots que o app não usa. A aparência dos gráficos do app não muda.
+
+  Args:
+    base (str): Nome do template de origem (ex: 'plotly').
+    trace_types (iterable): Tipos de traço usados (ex: ['bar', 'pie']).
+
+  Returns:
+    plotly.graph_objects.layout.Template: Template enxuto.
+  """
+  template = pio.templates[base].to_plotly_json()
+  return go.layout.Template(
+    data={trace_type: template['data'][trace_type] for trace_type in trace_types if trace_type in template['data']},
+    layout={key: value for key, value in template['layout'].items() if key not in UNUSED_TEMPLATE_LAYOUT},
+  )
+
+# Propriedades dos traços que dependem dos dados; cores, template e eixos já estão no cliente
+TRACE_DATA_PROPS = ('x', 'y', 'text', 'customdata', 'labels', 'values', 'hovertext')
+
+def figure_signature(fig, kind: str = '') -> list:
+  """
+  Descreve a estrutura de uma figura: o tipo de gráfico e o tipo e o nome de cada traço.
+
+  Args:
+    fig (plotly.graph_objs._figure.Figure): Figura.
+    kind (str, optional): Variante do gráfico que não aparece nos traços (ex: eixo x
+      por ano ou por produto).
+
+  Returns:
+    list: Assinatura serializável em JSON, para ser guardada em um dcc.Store.
+  """
+  return [kind] + [[trace.type, trace.name] for trace in fig.data]
+
+def patch_figure(fig, shown_signature=None, kind: str = '') -> tuple:
+  """
+  Prepara a atualização de uma figura já exibida no cliente.
+
+  Se a figura exibida tem a mesma estrutura (`figure_signature`), apenas os dados dos
+  traços, o título e as anotações são enviados, como um `dash.Patch`; o layout, o
+  template e as cores continuam os do cliente. Caso contrário (ex: primeira exibição
+  ou outro conjunto de traços), a figura completa é enviada.
+
+  Args:
+    fig (plotly.graph_objs._figure.Figure): Figura nova, completa.
+    shown_signature (list, optional): Assinatura da figura exibida no cliente.
+    kind (str, optional): Ver `figure_signature`.
+
+  Returns:
+    tuple: (figura completa ou Patch, assinatura da figura nova).
+  """
+  signature = figure_signature(fig, kind)
+  if signature != shown_signature:
+    return fig, signature
+
+  # `to_dict` codifica os arrays numéricos como typed arrays (base64), como na figura completa
+  patch = Patch()
+  for position, trace in enumerate(fig.to_dict()['data']):
+    for prop in TRACE_DATA_PROPS:
+      if trace.get(prop) is not None:
+        patch['data'][position][prop] = trace[prop]
+
+  patch['layout']['title'] = fig.layout.title.to_plotly_json()
+  patch['layout']['annotations'] = [annotation.to_plotly_json() for annotation in fig.layout.annotations]
+
+  return patch, signature
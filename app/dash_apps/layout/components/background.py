@@ -0,0 +1,125 @@
+"""
+Gerenciador dos callbacks em segundo plano que executa os jobs em threads do worker.
+
+O `DiskcacheManager` do Dash executa cada job em um processo novo, descartado ao
+final: o cache da camada de dados e os últimos resultados válidos do SIDRA que o job
+preenche se perdem com ele, e o job não enxerga o que o worker já carregou (ex: um
+prazo estourado não encontra resultado anterior e o painel falha). Aqui, cada job
+roda em um pool de threads do próprio worker: os painéis lentos continuam fora das
+threads que atendem as requisições, mas compartilham os caches do processo. As
+consultas ao SIDRA passam a maior parte do tempo esperando a resposta, sem o GIL.
+
+O andamento, o resultado e o estado de cada job ficam no diskcache, como no
+`DiskcacheManager`, então a consulta ao job pode chegar a qualquer worker. O
+resultado é gravado por job, e não só pelos argumentos do callback: duas sessões com
+os mesmos argumentos não disputam o mesmo resultado, e o resultado de um job que
+ninguém consultou (ex: a aba foi fechada) não é entregue a outra sessão; ele expira
+depois de `JOB_LEASE`. O cancelamento é cooperativo: o job é interrompido na próxima
+chamada a `set_progress`.
+"""
+import contextvars
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from dash import DiskcacheManager
+from dash.exceptions import PreventUpdate
+
+# Jobs executados ao mesmo tempo por worker; os demais aguardam na fila do pool
+BACKGROUND_THREADS = int(os.environ.get('STATVIEW_BACKGROUND_THREADS', 4))
+
+# Tempo (s) depois do qual um job sem conclusão deixa de ser considerado em andamento
+# (ex: o worker que o executava foi reiniciado)
+JOB_LEASE = 10 * 60
+
+_current_job = contextvars.ContextVar('background_job', default=None)
+
+class ThreadManager(DiskcacheManager):
+    """
+    `DiskcacheManager` que executa os jobs em um pool de threads do processo.
+
+    Args:
+        cache (diskcache.Cache): Onde ficam o andamento, o resultado e o estado dos jobs.
+        threads (int, optional): Jobs executados ao mesmo tempo (padrão: `BACKGROUND_THREADS`).
+    """
+    def __init__(self, cache, threads: int = BACKGROUND_THREADS):
+        super().__init__(cache)
+        self.threads = max(1, threads)
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # O pool é criado no processo que executa os jobs: threads não sobrevivem ao fork
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='dash-job')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    @staticmethod
+    def _running_key(job) -> str:
+        return f'job-{job}-running'
+
+    @staticmethod
+    def _cancel_key(job) -> str:
+        return f'job-{job}-cancel'
+
+    @staticmethod
+    def _result_key(key, job) -> str:
+        return f'{key}-{job}'
+
+    def call_job_fn(self, key, job_fn, args, context):
+        job = uuid.uuid4().hex
+        self.handle.set(self._running_key(job), True, expire=JOB_LEASE)
+        self._get_executor().submit(self._run, job, key, job_fn, args, context)
+        return job
+
+    def _run(self, job, key, job_fn, args, context):
+        token = _current_job.set(job)
+        try:
+            # Jobs cancelados enquanto aguardavam na fila nem começam
+            if self.handle.get(self._cancel_key(job)) is None:
+                job_fn(self._result_key(key, job), self._make_progress_key(key), args, context)
+                self.handle.touch(self._result_key(key, job), expire=JOB_LEASE)
+        finally:
+            _current_job.reset(token)
+            self.handle.delete(self._running_key(job))
+            self.handle.delete(self._cancel_key(job))
+
+    def make_job_fn(self, fn, progress, key=None):
+        def cancellable(*args, **kwargs):
+            if progress:
+                set_progress, *args = args
+                args = [self._checked(set_progress), *args]
+            return fn(*args, **kwargs)
+
+        return super().make_job_fn(cancellable, progress, key)
+
+    def _checked(self, set_progress):
+        """Envolve o `set_progress` do job para interrompê-lo se ele tiver sido cancelado."""
+        job = _current_job.get()
+
+        def checked(progress_value):
+            if self.handle.get(self._cancel_key(job)) is not None:
+                raise PreventUpdate
+            set_progress(progress_value)
+
+        return checked
+
+    def get_result(self, key, job):
+        return super().get_result(self._result_key(key, job), job)
+
+    def terminate_job(self, job):
+        if not job:
+            return
+        if self.handle.get(self._running_key(job)) is not None:
+            self.handle.set(self._cancel_key(job), True, expire=JOB_LEASE)
+        self.handle.delete(self._running_key(job))
+
+    def terminate_unhealthy_job(self, job):
+        return False
+
+    def job_running(self, job):
+        return bool(job) and self.handle.get(self._running_key(job)) is not None
@@ -1,11 +1,66 @@
-from dash import callback, Output, Input
+import functools
+import os
+import re
+
+import diskcache
+from dash import callback_context, no_update, Output, Input, State, ALL
+from app.dash_apps.data.economy import load_crop_history
+from app.dash_apps.data.memo import request_memo
+from app.dash_apps.data.population import (
+    get_municipality_name,
+    get_population_age_group,
+    get_population_by_local,
+    get_population_by_race)
+from app.dash_apps.data.sidra import deadline, stale_footnote, track_staleness
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dash_apps.graphs.utils import patch_figure
+from app.dash_apps.layout.components.background import ThreadManager
 from app.dash_apps.layout.config.options import * 
 
-@callback(
-    Output('city-comparison-graph', 'figure'),
-    Output('city-comparison-footnote', 'children'),
-    Input('city-code-filter', 'value'),
+# Gerenciador dos callbacks em segundo plano. Os painéis que dependem de consultas lentas
+# ao SIDRA rodam em threads do worker separadas das que atendem as requisições e
+# compartilham os caches do processo (ver components/background.py). O diretório do
+# andamento e dos resultados é compartilhado entre workers (STATVIEW_BACKGROUND_CACHE_DIR).
+background_manager = ThreadManager(
+    diskcache.Cache(os.environ.get('STATVIEW_BACKGROUND_CACHE_DIR', 'cache/background'))
 )
+
+# Com '0', os painéis lentos rodam na própria requisição, como os demais (ex: para
+# comparar a vazão sob carga mista com loadtest/mixed.py)
+BACKGROUND_CALLBACKS = os.environ.get('STATVIEW_BACKGROUND_CALLBACKS', '1') != '0'
+
+# Prazo (s) das consultas ao SIDRA de cada callback. Ao estourar, as funções de dados
+# retornam o último resultado válido, com a nota de rodapé marcada como desatualizada.
+CALLBACK_DEADLINE = float(os.environ.get('STATVIEW_CALLBACK_DEADLINE', 8))
+
+def latency_bounded(func):
+    """
+    Executa o callback com o prazo `CALLBACK_DEADLINE` para as consultas ao SIDRA e com
+    o memo da requisição: chamadas idênticas à camada de dados feitas pelo callback são
+    executadas uma única vez (ver `app.dash_apps.data.memo`).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with deadline(CALLBACK_DEADLINE), request_memo():
+            return func(*args, **kwargs)
+    return wrapper
+
+def get_local_code_from_path(pathname: str) -> str:
+    """
+    Extrai o código IBGE do município da URL (rota `/municipio/<codigo_ibge>/`).
+
+    Retorna o código de Floriano quando a URL não traz um código válido de 7 dígitos.
+    """
+    match = re.search(r'/municipio/(\d{7})/?$', pathname or '')
+    return match.group(1) if match else FLORIANO_CODE
+
+@latency_bounded
+def update_municipality_name(pathname):
+    """Atualiza todos os textos que exibem o nome do município selecionado na URL."""
+    name = get_municipality_name(get_local_code_from_path(pathname))['municipio']
+    return [name] * len(callback_context.outputs_list)
+
+@latency_bounded
 def update_city_location_interactive(location_key)-> dict:
     """Atualiza o gráfico de distribuição urbana/rural baseado na localização selecionada."""
     location= city_code_options[location_key]
@@ -14,80 +69,258 @@ def update_city_location_interactive(location_key)-> dict:
         get_location_distribution_info(level=location['level'], local_code=location['code'])]
 
 
-@callback(
-    [Output(component_id, 'figure' if 'graph' in component_id else 'children') for component_id in outputs_mapping_graphs.keys()],
-    Input("year-filter", 'value')
-)
-def update_all_graphs(year):
+def _year_outputs(mapping: dict, year, pathname) -> list:
     year = 'last' if year=='Mais Recente' else year
-    return [func(year=year) for func in outputs_mapping_graphs.values()]
+    local_code = get_local_code_from_path(pathname)
+    return [func(year=year, local_code=local_code) for func in mapping.values()]
 
-@callback(
-    [Output(component_id, 'children') for component_id in outputs_mapping_infos.keys()],
-    Input("year-filter", 'value')
-)
-def update_all_footnotes(year):
-    year = 'last' if year=='Mais Recente' else year
-    return [func(year=year) for func in outputs_mapping_infos.values()]
+def _outputs(mapping: dict) -> list:
+    return [Output(component_id, 'figure' if 'graph' in component_id else 'children') for component_id in mapping.keys()]
 
-@callback(
-    Output('state-comparison-graph', 'figure'),
-    Output('state-comparison-footnote', 'children'),
-    Input('state-code-filter', 'value'),
-)
-def update_state_location_interactive(location_key)-> dict:
-    """Atualiza o gráfico de distribuição urbana/rural baseado na localização selecionada."""
-    location= state_code_options[location_key]
-    return [
-        create_location_distribution(level=location['level'], local_code=location['code']),
-        get_location_distribution_info(level=location['level'], local_code=location['code'])]
+# Carregamento progressivo: cada etapa grava um sinal em um dcc.Store, usado como Input
+# pela etapa seguinte. O Dash só dispara um callback depois que os callbacks que
+# produzem seus Inputs terminam, então as métricas chegam primeiro, seguidas dos
+# gráficos leves e, por fim, dos painéis pesados.
 
-@callback(
-    Output('city-race-comparison-graph', 'figure'),
-    Output('city-race-comparison-footnote', 'children'),
-    Input('race-city-code-filter', 'value'),
-    Input('year-filter', 'value')
-)
-def update_race_city_interactive(location_key, year):
-    """Atualiza o gráfico de distribuição racial baseado na localização selecionada."""
-    
+@latency_bounded
+def update_metrics(year, pathname):
+    """Primeira etapa: cartões de métricas (população, PIB e PIB per capita)."""
+    return _year_outputs(outputs_mapping_metrics, year, pathname) + [True]
+
+# Função de dados de cada painel do callback de ano. O período resolvido por ela (ver
+# data/periods.py) indica se uma troca de ano muda o que o painel exibe: painéis de
+# tabelas com um único período (ex: situação urbana/rural, só no Censo 2022) não são
+# recalculados nem reenviados.
+YEAR_PANELS = {
+    'location-distribution': get_population_by_local,
+    'age-pyramid': get_population_age_group,
+    'race-distribution': get_population_by_race,
+}
+
+# Comparações de raça: (prefixo dos ids, opções do dropdown)
+RACE_COMPARISONS = [
+    ('city-race-comparison', city_code_options),
+    ('state-race-comparison', state_code_options),
+]
+
+def _period(data_func, year) -> str:
+    return data_func.resolve_arguments({'year': year})['year']
+
+def race_comparison(options: dict, location_key, year) -> list:
+    """Gráfico e nota de rodapé da distribuição racial da localidade selecionada em um dropdown."""
     year = 'last' if year == 'Mais Recente' else year
-    
-    location= city_code_options[location_key]
+    location = options[location_key]
     return [
         create_race_distribution(level=location['level'], local_code=location['code'], year=year),
         get_race_distribution_info(level=location['level'], local_code=location['code'], year=year)]
 
-@callback(
-    Output('state-race-comparison-graph', 'figure'),
-    Output('state-race-comparison-footnote', 'children'),
-    Input('race-state-code-filter', 'value'),
-    Input('year-filter', 'value')
-)
-def update_race_state_interactive(location_key, year):
-    """Atualiza o gráfico de distribuição racial baseado na localização selecionada."""
-    
+@latency_bounded
+def update_year_panels(year, pathname, metrics_loaded, race_city_key, race_state_key, shown=None):
+    """
+    Segunda etapa: gráficos e notas de rodapé que dependem do ano, em uma única requisição.
+
+    O dcc.Store 'year-panels' guarda, para cada saída, a localidade e o período exibidos.
+    Saídas cujo período resolvido não mudou (ex: troca de 2015 para 2016 em um painel
+    só do Censo) retornam `no_update`. Saídas montadas com dados desatualizados não
+    são registradas, para serem recalculadas na próxima chamada. Gráficos que mudam
+    só nos dados são enviados como `dash.Patch` (ver `patch_figure`).
+    """
     year = 'last' if year == 'Mais Recente' else year
-    
+    local_code = get_local_code_from_path(pathname)
+    shown = shown or {}
+    shown_traces = shown.get('traces', {})
+    current = {'traces': {}}
+    outputs = []
+
+    def render(key, signature, build, size, figure_ids=()):
+        # Saídas de um painel (as figuras primeiro), ou `no_update` se ele já exibe `signature`
+        if shown.get(key) == signature:
+            current[key] = signature
+            for figure_id in figure_ids:
+                current['traces'][figure_id] = shown_traces.get(figure_id)
+            return [no_update] * size
+
+        with track_staleness() as tracker:
+            values = build()
+        if not tracker.stale:
+            current[key] = signature
+
+        for position, figure_id in enumerate(figure_ids):
+            values[position], current['traces'][figure_id] = patch_figure(values[position], shown_traces.get(figure_id))
+        return values
+
+    for component_id, func in list(outputs_mapping_graphs.items()) + list(outputs_mapping_infos.items()):
+        signature = [local_code, _period(YEAR_PANELS[component_id.rsplit('-', 1)[0]], year)]
+        figure_ids = [component_id] if component_id in outputs_mapping_graphs else []
+        outputs += render(component_id, signature, lambda: [func(year=year, local_code=local_code)], 1, figure_ids)
+
+    for (prefix, options), location_key in zip(RACE_COMPARISONS, (race_city_key, race_state_key)):
+        signature = [options[location_key]['code'], _period(get_population_by_race, year)]
+        outputs += render(
+            prefix, signature, lambda: race_comparison(options, location_key, year), 2, [f'{prefix}-graph'])
+
+    # O sinal da próxima etapa só é emitido quando a página (ou o município) é carregada
+    first_load = shown.get('local_code') != local_code
+    current['local_code'] = local_code
+
+    return outputs + [True if first_load else no_update, current]
+
+@latency_bounded
+def update_heavy_panels(year, pathname, graphs_loaded):
+    """Última etapa: painéis pesados (ranking estadual de população)."""
+    return _year_outputs(outputs_mapping_heavy, year, pathname)
+
+@latency_bounded
+def update_literacy(set_progress, pathname):
+    """
+    Atualiza a tabela e a comparação da taxa de alfabetização do município selecionado.
+
+    Executado em segundo plano. A comparação consulta os três níveis territoriais em uma
+    única requisição ao SIDRA e é montada primeiro: ela preenche o cache do município,
+    usado pela tabela e pela nota de rodapé.
+    """
+    local_code = get_local_code_from_path(pathname)
+
+    with track_staleness() as tracker:
+        set_progress(("0", "2"))
+        comparison = create_comparison_literacy(local_code=local_code)
+
+        set_progress(("1", "2"))
+        table = create_literacy_table(local_code=local_code)
+
+        set_progress(("2", "2"))
+        footnote = get_literacy_rate_info(local_code=local_code)
+
+    # A comparação também consulta o estado e o país, que não aparecem na nota de rodapé
+    return [table, comparison, stale_footnote(footnote) if tracker.stale else footnote]
+
+@latency_bounded
+def update_state_location_interactive(location_key)-> dict:
+    """Atualiza o gráfico de distribuição urbana/rural baseado na localização selecionada."""
     location= state_code_options[location_key]
     return [
-        create_race_distribution(level=location['level'], local_code=location['code'], year=year),
-        get_race_distribution_info(level=location['level'], local_code=location['code'], year=year)]
+        create_location_distribution(level=location['level'], local_code=location['code']),
+        get_location_distribution_info(level=location['level'], local_code=location['code'])]
 
-@callback(
-    Output('top_crops_productions_graph', 'figure'),
-    Output('crops_footnote', 'children'),
-    Input('start-year', 'value'),
-    Input('end-year', 'value'),
-    Input('top-n-producoes', 'value')
-)
-def update_top_crops_graph(start_year, end_year, top_crops):
+@latency_bounded
+def update_top_crops_graph(set_progress, start_year, end_year, top_crops, pathname, graphs_loaded=None, shown_traces=None):
+    """
+    Atualiza o gráfico das maiores produções agrícolas.
+
+    Executado em segundo plano: sem cache, os dados da tabela 5457 são baixados (para o
+    Piauí inteiro, no caso de municípios piauienses).
+    Por ser um painel pesado, só é disparado depois dos gráficos leves (`graphs-loaded`).
+    Se as culturas exibidas não mudam, só as barras novas são enviadas (ver `patch_figure`).
+    """
     footnote = ''
     
     if start_year > end_year:
         start_year, end_year = end_year, start_year
         footnote = f"O intervalo foi ajustado automaticamente para {start_year}–{end_year}."
     
-    top_crops_graph = create_top_crops(start_year=start_year, end_year= end_year, top_crops=top_crops)
-    
-    return [top_crops_graph, footnote]
+    local_code = get_local_code_from_path(pathname)
+
+    with track_staleness() as tracker:
+        set_progress(("0", "2"))
+        load_crop_history(local_code=local_code)
+
+        set_progress(("1", "2"))
+        top_crops_graph = create_top_crops(local_code=local_code, start_year=start_year, end_year= end_year, top_crops=top_crops)
+
+    # Com um único ano, o eixo x é o produto em vez do ano
+    top_crops_graph, traces = patch_figure(top_crops_graph, shown_traces, kind='ano' if start_year < end_year else 'produto')
+
+    return [top_crops_graph, stale_footnote(footnote) if tracker.stale else footnote, traces]
+
+def _background_arguments(progress_id: str, cancel_id: str) -> dict:
+    """Argumentos de `app.callback` de um painel lento: segundo plano, progresso e cancelamento."""
+    if not BACKGROUND_CALLBACKS:
+        return {}
+    return dict(
+        background=True,
+        manager=background_manager,
+        progress=[Output(progress_id, 'value'), Output(progress_id, 'max')],
+        running=[(Output(f'{progress_id}-container', 'style'), {'display': 'flex'}, {'display': 'none'})],
+        cancel=[Input(cancel_id, 'n_clicks')],
+    )
+
+def _slow_panel(func):
+    """Callback de um painel lento; fora do segundo plano, o `set_progress` não faz nada."""
+    if BACKGROUND_CALLBACKS:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(lambda progress: None, *args, **kwargs)
+    return wrapper
+
+def register_callbacks(app):
+    """
+    Registra os callbacks do dashboard geral no app Dash `app`.
+
+    Os callbacks ficam no próprio app, e não na lista global do Dash (`dash.callback`),
+    então nenhum outro app montado pode capturá-los.
+    """
+    app.callback(
+        Output({'type': 'municipality-name', 'index': ALL}, 'children'),
+        Input('url', 'pathname'),
+    )(update_municipality_name)
+
+    app.callback(
+        Output('city-comparison-graph', 'figure'),
+        Output('city-comparison-footnote', 'children'),
+        Input('city-code-filter', 'value'),
+    )(update_city_location_interactive)
+
+    app.callback(
+        _outputs(outputs_mapping_metrics) + [Output('metrics-loaded', 'data')],
+        Input("year-filter", 'value'),
+        Input('url', 'pathname'),
+    )(update_metrics)
+
+    app.callback(
+        _outputs(outputs_mapping_graphs) + _outputs(outputs_mapping_infos)
+        + [Output(f'{prefix}-{suffix}', prop) for prefix, _ in RACE_COMPARISONS
+           for suffix, prop in (('graph', 'figure'), ('footnote', 'children'))]
+        + [Output('graphs-loaded', 'data'), Output('year-panels', 'data')],
+        Input("year-filter", 'value'),
+        Input('url', 'pathname'),
+        Input('metrics-loaded', 'data'),
+        Input('race-city-code-filter', 'value'),
+        Input('race-state-code-filter', 'value'),
+        State('year-panels', 'data'),
+    )(update_year_panels)
+
+    app.callback(
+        _outputs(outputs_mapping_heavy),
+        Input("year-filter", 'value'),
+        Input('url', 'pathname'),
+        Input('graphs-loaded', 'data'),
+    )(update_heavy_panels)
+
+    app.callback(
+        Output('literacy-table', 'figure'),
+        Output('comparison-literacy', 'figure'),
+        Output('literacy-rate-footnote', 'children'),
+        Input('url', 'pathname'),
+        **_background_arguments('literacy-progress', 'literacy-cancel'),
+    )(_slow_panel(update_literacy))
+
+    app.callback(
+        Output('state-comparison-graph', 'figure'),
+        Output('state-comparison-footnote', 'children'),
+        Input('state-code-filter', 'value'),
+    )(update_state_location_interactive)
+
+    app.callback(
+        Output('top_crops_productions_graph', 'figure'),
+        Output('crops_footnote', 'children'),
+        Output('top-crops-traces', 'data'),
+        Input('start-year', 'value'),
+        Input('end-year', 'value'),
+        Input('top-n-producoes', 'value'),
+        Input('url', 'pathname'),
+        Input('graphs-loaded', 'data'),
+        State('top-crops-traces', 'data'),
+        **_background_arguments('crops-progress', 'crops-cancel'),
+    )(_slow_panel(update_top_crops_graph))
@@ -1,5 +1,15 @@
 from dash import html, dcc
 from app.dash_apps.layout.components.callbacks import *
+from app.dash_apps.graphs.utils import create_skeleton_figure
+
+def municipality_name(index: str) -> html.Span:
+    """
+    Retorna um trecho de texto com o nome do município selecionado na URL.
+
+    O conteúdo inicial é o município padrão (Floriano) e é atualizado pelo
+    callback `update_municipality_name`.
+    """
+    return html.Span("Floriano", id={'type': 'municipality-name', 'index': index})
 
 def create_graph_card_with_dropdown(
     title: str,
@@ -20,11 +30,26 @@ def create_graph_card_with_dropdown(
                 id=dropdown_id,
                 className="dropdown"
             ),
-            dcc.Graph(id=graph_id),
+            dcc.Graph(id=graph_id, figure=create_skeleton_figure()),
             html.P(id=footnote_id, className='footnote')
         ]
     )
 
+def create_loading_controls(progress_id: str, cancel_id: str) -> html.Div:
+    """
+    Cria a barra de progresso e o botão de cancelar de um callback em segundo plano.
+
+    O contêiner fica oculto e só é exibido enquanto o callback está em execução.
+    """
+    return html.Div(
+        id=f"{progress_id}-container",
+        className="loading-controls",
+        children=[
+            html.Progress(id=progress_id, value="0", max="1"),
+            html.Button("Cancelar", id=cancel_id),
+        ]
+    )
+
 def create_year_select_card():
     return html.Div(
         children=[
@@ -40,23 +65,23 @@ def create_year_select_card():
     )
 
 def create_metric_card(title: str, value_id, footnote_id) -> html.Div:
-  """Retorna um card de métrica simples."""
+  """Retorna um card de métrica simples, com um esqueleto até o valor ser carregado."""
   return html.Div(
       className="metric-card card",
       children=[
           html.P(title),
-          html.H3(id=value_id),
+          html.H3(html.Span(className='skeleton-text'), id=value_id),
           html.P(id=footnote_id, className='footnote')
       ]
   )
 
 def create_graph_card(title: str, graph_id: str, footnote_id) -> html.Div:
-  """Retorna um card contendo um gráfico."""
+  """Retorna um card contendo um gráfico, exibido como esqueleto até os dados chegarem."""
   return html.Div(
       className="graph-card card",
       children=[
           html.P(title),
-          dcc.Graph(id=graph_id),
+          dcc.Graph(id=graph_id, figure=create_skeleton_figure()),
           html.P(id=footnote_id, className='footnote')
       ]
   )
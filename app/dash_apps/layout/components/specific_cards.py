@@ -1,12 +1,12 @@
 from dash import html, dcc
+from app.dash_apps.graphs.utils import create_skeleton_figure
 from app.dash_apps.layout.config.options import city_code_options, state_code_options
-from app.dash_apps.graphs.education import create_comparison_literacy, create_literacy_table, get_literacy_rate_info
 from app.dash_apps.layout.components.callbacks import (
   update_city_location_interactive, 
-  update_race_city_interactive,
-  update_race_state_interactive,
-  update_state_location_interactive)
-from app.dash_apps.layout.components.generic_cards import create_graph_card_with_dropdown
+  update_literacy,
+  update_state_location_interactive,
+  update_year_panels)
+from app.dash_apps.layout.components.generic_cards import create_graph_card_with_dropdown, create_loading_controls, municipality_name
 
 
 def create_city_location_graph_card():
@@ -54,34 +54,35 @@ def create_literacy_tabs_card()-> html.Div:
     """Retorna o card com abas para visualização da taxa de alfabetização."""
     return html.Div(
         children=[
-            html.P("Taxa de Alfabetização"),
+            html.P(["Taxa de Alfabetização - ", municipality_name('literacy')]),
+            create_loading_controls('literacy-progress', 'literacy-cancel'),
             dcc.Tabs(
                 id="tabs",
                 value="tab-1",
                 children=[
                     dcc.Tab(
-                        label="Floriano",
+                        label="Município",
                         value="tab-1",
                         children=[
                             dcc.Graph(
                                 id="literacy-table", 
-                                figure=create_literacy_table()
+                                figure=create_skeleton_figure()
                                 )
                             ],
                         ),
                     dcc.Tab(
-                        label="Floriano x Piauí x Brasil",
+                        label="Município x Piauí x Brasil",
                         value="tab-2",
                         children=[
                             dcc.Graph(
                                 id="comparison-literacy",
-                                figure=create_comparison_literacy()
+                                figure=create_skeleton_figure()
                                 )
                             ],
                         ),
                     ],
                 )
-            ,html.P(get_literacy_rate_info() ,id="literacy-rate-footnote", className='footnote')
+            ,html.P(id="literacy-rate-footnote", className='footnote')
             ],
         className="graph-card card",
         )
@@ -130,7 +131,10 @@ def create_production_graph_card() -> html.Div:
                 ]
             ),
 
-            dcc.Graph(id="top_crops_productions_graph"),
+            create_loading_controls('crops-progress', 'crops-cancel'),
+
+            dcc.Graph(id="top_crops_productions_graph", figure=create_skeleton_figure()),
+            dcc.Store(id="top-crops-traces"),
             
             html.P(id='crops_footnote',className='footnote alert')
         ]
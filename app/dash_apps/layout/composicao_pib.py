@@ -1,16 +1,25 @@
-from dash import Dash, html, dcc, callback, Output, Input
+from dash import Dash, html, dcc, callback, Output, Input, State
 import plotly.express as px
 import pandas as pd
 import numpy as np
-import sidrapy as sd
-
-def load_data():
-    """Carrega e processa os dados do PIB."""
-    data = sd.get_table(
+from app.dash_apps.data import sidra
+
+from app.dash_apps.data.materialized import Incremental, materialized
+from app.dash_apps.data.memo import request_scoped
+from app.dash_apps.data.periods import period_list
+from app.dash_apps.data.store import store
+from app.dash_apps.data.utils import FLORIANO_CODE
+from app.dash_apps.data.versions import content_hash
+from app.dash_apps.graphs.economy import create_state_sector_comparison, get_state_sector_comparison_info
+from app.dash_apps.graphs.utils import patch_figure
+
+def fetch_data(periods='all'):
+    """Baixa e processa os dados do PIB de alguns períodos (ou de todos, com 'all')."""
+    data = sidra.get_table(
         table_code='5938',
-        period='all',
+        period=period_list(periods),
         territorial_level="6",
-        ibge_territorial_code="2203909",
+        ibge_territorial_code=FLORIANO_CODE,
         variable='498,517,513,6575,525,37,543'
     )
 
@@ -38,7 +47,13 @@ def load_data():
 
     return data
 
+@materialized('pib_composition', incremental=Incremental('5938', fetch_data))
+def load_data():
+    """Carrega e processa os dados do PIB."""
+    return fetch_data('all')
+
 df = load_data()
+df_version = content_hash(df)
 
 year_range_slider = dcc.RangeSlider(
     value=[2002, 2022],
@@ -56,19 +71,30 @@ def create_layout():
         children=[
             html.H1("Composição do PIB de Floriano ao longo do tempo", style={"textAlign": "center"}),
             dcc.Graph(id="composicao-pib"),
+            # Estrutura da figura exibida, para que o seletor envie só os dados novos
+            dcc.Store(id="composicao-pib-traces"),
             html.Div(
                 children=[year_range_slider],
                 style={"textAlign": "center", "paddingTop": "20px", "width": "80%", "margin": "auto"}
-            )
+            ),
+            html.H2("Floriano entre os municípios do Piauí", style={"textAlign": "center", "paddingTop": "20px"}),
+            dcc.Graph(id="composicao-pib-estado"),
+            html.P(id="composicao-pib-estado-footnote", className="footnote")
         ]
     )
 
 def get_pib_df(init_year, final_year):
-    """Filtra os dados com base no intervalo de anos selecionado."""
-    return df.query(f"ano >= {init_year} and ano <= {final_year}")
+    """Filtra os dados com base no intervalo de anos selecionado (consulta indexada, ver data/store.py)."""
+    store.ensure('pib_composition', FLORIANO_CODE, df, df_version)
+    return store.year_range('pib_composition', FLORIANO_CODE, init_year, final_year)
+
+def update_graph(year_range, shown_traces=None):
+    """
+    Atualiza o gráfico com base no intervalo de anos selecionado.
 
-def update_graph(year_range):
-    """Atualiza o gráfico com base no intervalo de anos selecionado."""
+    Depois da primeira exibição, os setores (traços) são sempre os mesmos, então mover
+    o seletor envia apenas os novos pontos de cada traço (ver `patch_figure`).
+    """
     filtered_df = get_pib_df(year_range[0], year_range[1])
 
     fig = px.line(
@@ -96,7 +122,19 @@ def update_graph(year_range):
         )
     )
 
-    return fig
+    return list(patch_figure(fig, shown_traces))
+
+def update_state_comparison(year_range):
+    """
+    Atualiza a comparação com os municípios do Piauí para o último ano selecionado.
+
+    Usa os dados do estado inteiro já carregados em memória (array município × ano × setor),
+    então mover o seletor não gera novas consultas ao SIDRA. Fica em um callback separado
+    para que o gráfico de evolução nunca espere por ela.
+    """
+    return [
+        create_state_sector_comparison(year_range[1], FLORIANO_CODE),
+        get_state_sector_comparison_info(year_range[1], FLORIANO_CODE)]
 
 def create_app(url_path, server=None):
     """Cria e retorna o servidor Flask para o app Dash."""
@@ -106,7 +144,15 @@ def create_app(url_path, server=None):
 
     app.callback(
         Output("composicao-pib", "figure"),
-        Input("year-slider", "value")
+        Output("composicao-pib-traces", "data"),
+        Input("year-slider", "value"),
+        State("composicao-pib-traces", "data"),
     )(update_graph)
 
+    app.callback(
+        Output("composicao-pib-estado", "figure"),
+        Output("composicao-pib-estado-footnote", "children"),
+        Input("year-slider", "value")
+    )(request_scoped(update_state_comparison))
+
     return app.server
@@ -84,22 +84,32 @@ state_code_options = {
 
 years = ['Mais Recente'] + [str(i) for i in range(2010,2026)] 
 
-outputs_mapping_graphs = {
+# A página é renderizada em etapas (carregamento progressivo): primeiro as métricas,
+# depois os gráficos leves e, por último, os painéis mais pesados. Cada etapa só é
+# disparada quando a anterior termina (ver layout/components/callbacks.py).
+
+outputs_mapping_metrics = {
     "total_population_metric": get_metric_total_population,
     "total_pib_metric": get_metric_total_pib,
     "pib_per_capita_metric": get_metric_pib_per_capita,
+    "total_population_footnote": get_metric_total_population_info,
+    "total_pib_footnote": get_metric_total_pib_info,
+    "pib_per_capita_footnote": get_metric_pib_per_capita_info,
+}
+
+outputs_mapping_graphs = {
     'location-distribution-graph': create_location_distribution,
     'age-pyramid-graph': create_age_pyramid,
     'race-distribution-graph': create_race_distribution,
-    'most-populated-cities-graph': create_most_populated_cities
 }
 
 outputs_mapping_infos = {
-    "total_population_footnote": get_metric_total_population_info,
-    "total_pib_footnote": get_metric_total_pib_info,
-    "pib_per_capita_footnote": get_metric_pib_per_capita_info,
     'location-distribution-footnote': get_location_distribution_info,
     'age-pyramid-footnote': get_age_pyramid_info,
     'race-distribution-footnote': get_race_distribution_info,
-    'most-populated-cities-footnote': get_most_populated_cities_info
+}
+
+outputs_mapping_heavy = {
+    'most-populated-cities-graph': create_most_populated_cities,
+    'most-populated-cities-footnote': get_most_populated_cities_info,
 }
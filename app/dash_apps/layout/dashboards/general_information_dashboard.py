@@ -1,12 +1,18 @@
-from dash import Dash, html
+from dash import Dash, html, dcc
 from flask import Flask
-from app.dash_apps.layout.components import generic_cards as g_card, specific_cards as s_card 
+from app.dash_apps.layout.components import callbacks, generic_cards as g_card, specific_cards as s_card 
 
 def create_layout():
   """Cria o layout do aplicativo Dash."""
   return html.Div([
+      dcc.Location(id='url'),
+      # Sinais das etapas do carregamento progressivo (ver components/callbacks.py)
+      dcc.Store(id='metrics-loaded'),
+      dcc.Store(id='graphs-loaded'),
+      # Localidade e período exibidos por cada painel do callback de ano
+      dcc.Store(id='year-panels'),
       html.Header([
-          html.H1('Floriano StatView - Informações Gerais')
+          html.H1([g_card.municipality_name('header'), ' StatView - Informações Gerais'])
       ]),
       html.Main(id='content', children=[
         html.Div([
@@ -14,20 +20,20 @@ def create_layout():
           ], className="year-select"),
         html.Div([
             g_card.create_metric_card("População Total", "total_population_metric", "total_population_footnote"),
-            g_card.create_metric_card("PIB de Floriano", "total_pib_metric", "total_pib_footnote"),
-            g_card.create_metric_card("PIB Per Capita de Floriano", "pib_per_capita_metric", "pib_per_capita_footnote"),
+            g_card.create_metric_card(["PIB de ", g_card.municipality_name('pib')], "total_pib_metric", "total_pib_footnote"),
+            g_card.create_metric_card(["PIB Per Capita de ", g_card.municipality_name('pib-per-capita')], "pib_per_capita_metric", "pib_per_capita_footnote"),
           
           ], className='metric-row row'),
         
         html.Div([
-            g_card.create_graph_card("Distribuição da População por Zona Urbana/Rural - Floriano", 'location-distribution-graph', "location-distribution-footnote"),
+            g_card.create_graph_card(["Distribuição da População por Zona Urbana/Rural - ", g_card.municipality_name('location')], 'location-distribution-graph', "location-distribution-footnote"),
             s_card.create_city_location_graph_card(),
             s_card.create_state_location_graph_card(),
           
           ], className='metric-row row'),
           
         html.Div([
-            g_card.create_graph_card("Distribuição da População por Raça - Floriano", 'race-distribution-graph', 'race-distribution-footnote'),
+            g_card.create_graph_card(["Distribuição da População por Raça - ", g_card.municipality_name('race')], 'race-distribution-graph', 'race-distribution-footnote'),
             s_card.create_race_city_graph_card(),
             s_card.create_race_state_graph_card(),
             
@@ -48,10 +54,17 @@ def create_layout():
   ])
 
 def create_app(url_path: str, server: Flask=None):
-  """Cria e retorna o servidor Flask para o app Dash."""
+  """
+  Cria e retorna o servidor Flask para o app Dash.
+
+  Um único app atende todos os municípios: o código IBGE vem da URL
+  (`<url_path><codigo_ibge>/`) e os callbacks o repassam à camada de dados.
+  """
   app = Dash(requests_pathname_prefix=url_path)
   app.title = "Taxa de Alfabetização - Floriano x Piauí x Brasil"
 
   app.layout = create_layout()
 
+  callbacks.register_callbacks(app)
+
   return app.server
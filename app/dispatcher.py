@@ -0,0 +1,66 @@
+"""
+Montagem sob demanda dos apps Dash no `DispatcherMiddleware`.
+
+Cada app é criado (módulo importado, layout montado e dados de inicialização
+carregados) só na primeira requisição ao seu prefixo, em vez de na criação do
+servidor. Workers que nunca recebem requisições de um dashboard não pagam o tempo
+de inicialização nem a memória dele. Apps críticos podem ser criados já na
+inicialização (lista `eager`), por exemplo no processo mestre do Gunicorn, antes
+do fork (ver gunicorn.conf.py).
+
+Example:
+    >>> mounts = LazyMounts({'/pib-floriano': 'app.dash_apps.layout.composicao_pib:create_app'})
+    >>> DispatcherMiddleware(flask_app, mounts)
+"""
+import importlib
+import threading
+from collections.abc import Mapping
+
+def load_factory(path: str):
+  """Importa a função `create_app` indicada por 'módulo:função'."""
+  module_name, function_name = path.split(':')
+  return getattr(importlib.import_module(module_name), function_name)
+
+class LazyMounts(Mapping):
+  """
+  Prefixos -> apps WSGI para o `DispatcherMiddleware`, criados no primeiro acesso.
+
+  A criação é protegida por uma trava por prefixo: requisições simultâneas ao mesmo
+  prefixo ainda não criado aguardam uma única criação, sem bloquear os demais
+  prefixos. Se a criação falhar, a requisição recebe o erro e a próxima tenta de novo.
+
+  Args:
+      factories (dict): Prefixo -> 'módulo:função'. A função recebe o prefixo com a
+          barra final (ex: '/municipio/') e retorna o app WSGI.
+      eager (list, optional): Prefixos criados imediatamente.
+  """
+  def __init__(self, factories: dict, eager=()):
+    self._factories = dict(factories)
+    self._apps = {}
+    self._locks = {prefix: threading.Lock() for prefix in self._factories}
+
+    for prefix in eager:
+      self[prefix]
+
+  def __getitem__(self, prefix):
+    app = self._apps.get(prefix)
+    if app is not None:
+      return app
+
+    with self._locks[prefix]:
+      if prefix not in self._apps:
+        self._apps[prefix] = load_factory(self._factories[prefix])(prefix + '/')
+      return self._apps[prefix]
+
+  def __contains__(self, prefix):
+    return prefix in self._factories
+
+  def __iter__(self):
+    return iter(self._factories)
+
+  def __len__(self):
+    return len(self._factories)
+
+  def loaded(self) -> list:
+    """Prefixos cujos apps já foram criados."""
+    return list(self._apps)
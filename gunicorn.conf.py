@@ -0,0 +1,53 @@
+"""
+Configuração do Gunicorn (lida automaticamente ao executar `gunicorn run:app` na raiz do projeto).
+
+O app é importado e os dados de referência são aquecidos uma única vez no processo
+mestre (`preload_app` + `when_ready`); os workers são criados depois, por fork, e
+compartilham essas páginas de memória (copy-on-write) em vez de carregar cada um a
+sua própria cópia. As callbacks passam a maior parte do tempo esperando o SIDRA,
+então cada worker atende várias requisições em threads (gthread).
+
+O limite de taxa das consultas ao SIDRA (STATVIEW_SIDRA_RATE e STATVIEW_SIDRA_BURST)
+é um só para todos os workers: o token bucket é criado no mestre e herdado no fork.
+O limite de concorrência (STATVIEW_SIDRA_MAX_CONCURRENCY) continua por worker.
+"""
+import gc
+import os
+
+wsgi_app = 'run:app'
+bind = os.environ.get('STATVIEW_BIND', '0.0.0.0:8050')
+
+workers = int(os.environ.get('STATVIEW_WORKERS', 4))
+worker_class = 'gthread'
+threads = int(os.environ.get('STATVIEW_THREADS', 8))
+
+# Callbacks têm prazo próprio (STATVIEW_CALLBACK_DEADLINE); este limite só encerra workers travados
+timeout = 60
+
+preload_app = True
+
+# Token bucket do SIDRA compartilhado pelos workers (criado em `on_starting`)
+sidra_limiter = None
+
+def on_starting(server):
+  # Executado no mestre, antes do fork dos workers
+  global sidra_limiter
+  from app.dash_apps.data import sidra
+
+  sidra_limiter = sidra.SharedRateLimiter()
+
+def post_fork(server, worker):
+  from app.dash_apps.data import sidra
+
+  sidra.scheduler.share(sidra_limiter)
+
+def when_ready(server):
+  # Executado no mestre, depois de importar o app e antes do fork dos workers
+  from app.dash_apps.data import warmup
+
+  if os.environ.get('STATVIEW_WARMUP', '1') != '0':
+    warmup.warm(log=server.log)
+
+  # Move os objetos já carregados para a geração permanente do coletor de lixo, para
+  # que as coletas nos workers não escrevam nas páginas compartilhadas
+  gc.freeze()
@@ -0,0 +1,122 @@
+"""
+Tempo até o servidor ficar pronto e memória dos workers, com e sem `preload_app`.
+
+Inicia o Gunicorn duas vezes com a configuração do projeto (gunicorn.conf.py):
+
+- preload: como em produção, o app é importado e os dados de referência são
+  aquecidos no processo mestre, antes do fork;
+- sem preload: cada worker importa o app por conta própria, sem aquecimento.
+
+Para cada execução, informa o tempo até a primeira resposta do dashboard geral, o
+tempo até o carregamento completo de duas sessões por worker abertas em paralelo
+(dashboard de Floriano) e, por worker, a memória residente (RSS), a exclusiva (USS)
+e a proporcional (PSS, que divide as páginas compartilhadas entre os processos).
+
+Deve ser executado contra o servidor local que imita o SIDRA (loadtest/standin.py):
+
+    python -m loadtest.standin --port 8099 --latency 0.3
+    STATVIEW_SIDRA_URL=http://127.0.0.1:8099 \\
+    STATVIEW_PERIODS_URL=http://127.0.0.1:8099/api/v3/agregados/{table}/periodos \\
+    python -m loadtest.boot --workers 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+import requests
+
+from loadtest.harness import DashSession, Recorder
+
+# Configuração sem preload: a do projeto, com `preload_app` desligado
+NO_PRELOAD_CONFIG = """
+exec(open({path!r}).read())
+preload_app = False
+"""
+
+def _wait_for(url: str, timeout: float) -> float:
+  """Aguarda a primeira resposta de `url` e retorna o instante (monotonic) em que ela chegou."""
+  end = time.monotonic() + timeout
+  while time.monotonic() < end:
+    try:
+      if requests.get(url, timeout=1).ok:
+        return time.monotonic()
+    except requests.RequestException:
+      pass
+    time.sleep(0.05)
+  raise TimeoutError(f"O servidor não respondeu em {timeout:.0f} s.")
+
+def measure(config: str, env: dict, base_url: str, workers: int, timeout: float = 300) -> dict:
+  """
+  Inicia o Gunicorn com `config`, mede o tempo até ficar pronto e a memória dos workers.
+
+  Returns:
+      dict: Tempos (s) até a primeira resposta e até o fim das sessões, e
+          listas com RSS, USS e PSS (MiB) de cada worker.
+  """
+  start = time.monotonic()
+  server = subprocess.Popen(
+    [sys.executable, '-m', 'gunicorn', '-c', config],
+    env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+  try:
+    ready = _wait_for(base_url + '/municipio/', timeout) - start
+
+    # O Gunicorn distribui as conexões entre os workers livres, sem garantir que todos as recebam
+    threads = [
+      threading.Thread(target=DashSession(base_url, '/municipio/', '/municipio/', Recorder()).load)
+      for _ in range(workers * 2)
+    ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    loaded = time.monotonic() - start
+
+    memory = [child.memory_full_info() for child in psutil.Process(server.pid).children()]
+    return {
+      'pronto (s)': ready,
+      'dados (s)': loaded,
+      'rss': [info.rss / 2 ** 20 for info in memory],
+      'uss': [info.uss / 2 ** 20 for info in memory],
+      'pss': [info.pss / 2 ** 20 for info in memory],
+    }
+  finally:
+    server.terminate()
+    server.wait()
+
+def report(name: str, result: dict) -> str:
+  """Formata o resultado de uma execução de `measure`."""
+  lines = [f"{name}: pronto em {result['pronto (s)']:.1f} s, sessões carregadas em {result['dados (s)']:.1f} s"]
+  for kind in ('rss', 'uss', 'pss'):
+    values = result[kind]
+    lines.append(
+      f"  {kind.upper():<4} por worker (MiB): {' '.join(f'{value:.0f}' for value in values)}"
+      f" (total {sum(values):.0f})")
+  return "\n".join(lines)
+
+def main():
+  parser = argparse.ArgumentParser(description="Tempo até ficar pronto e memória dos workers, com e sem preload.")
+  parser.add_argument('--workers', type=int, default=4, help="Workers do Gunicorn.")
+  parser.add_argument('--port', type=int, default=8161, help="Porta usada pelo servidor durante o teste.")
+  args = parser.parse_args()
+
+  base_url = f'http://127.0.0.1:{args.port}'
+  env = dict(os.environ, STATVIEW_WORKERS=str(args.workers), STATVIEW_BIND=f'127.0.0.1:{args.port}')
+
+  with tempfile.NamedTemporaryFile('w', suffix='.py') as no_preload:
+    no_preload.write(NO_PRELOAD_CONFIG.format(path=os.path.abspath('gunicorn.conf.py')))
+    no_preload.flush()
+
+    preload = measure('gunicorn.conf.py', env, base_url, args.workers)
+    baseline = measure(no_preload.name, dict(env, STATVIEW_WARMUP='0'), base_url, args.workers)
+
+  print(report('preload', preload))
+  print(report('sem preload', baseline))
+
+if __name__ == "__main__":
+  main()
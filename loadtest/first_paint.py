@@ -0,0 +1,130 @@
+"""
+Tempo até a primeira renderização útil do dashboard geral, sem navegador.
+
+Cada sessão abre o dashboard pelo protocolo HTTP do Dash (ver loadtest/harness.py) e,
+como o navegador, dispara cada callback assim que nenhum outro callback pendente
+produz uma das suas entradas, em paralelo com os demais. O relatório mostra, a partir
+da requisição da página, quando cada etapa do carregamento progressivo termina:
+
+- métricas: os três cartões de métricas (a primeira renderização útil; os gráficos
+  ainda exibem os esqueletos);
+- gráficos: os gráficos e notas que dependem do ano;
+- painéis pesados, culturas e alfabetização;
+- página completa.
+
+Deve ser executado contra o servidor local que imita o SIDRA (loadtest/standin.py):
+
+    python -m loadtest.first_paint --url http://127.0.0.1:8050 --sessions 20
+    python -m loadtest.first_paint --url http://127.0.0.1:8050 --sessions 20 --cold
+"""
+import argparse
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from loadtest.harness import DashSession, Recorder
+
+# Componentes cuja renderização marca o fim de cada etapa
+STAGES = {
+  'métricas': ('total_population_metric', 'total_pib_metric', 'pib_per_capita_metric'),
+  'gráficos': ('location-distribution-graph', 'age-pyramid-graph', 'race-distribution-graph'),
+  'painéis pesados': ('most-populated-cities-graph',),
+  'culturas': ('top_crops_productions_graph',),
+  'alfabetização': ('literacy-table', 'comparison-literacy'),
+}
+
+# Códigos das UFs (fora o Piauí) usados para sortear municípios sem dados em cache
+OTHER_STATES = ('11', '15', '23', '26', '29', '31', '33', '35', '41', '43', '50', '52')
+
+class PaintSession(DashSession):
+  """Sessão que dispara os callbacks como o navegador e registra quando cada componente é renderizado."""
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.painted = {}
+    self._start = None
+
+  def load(self):
+    self._start = time.perf_counter()
+    super().load()
+
+  def _run(self, dependencies: list, changed: set = frozenset()):
+    waiting = list(dependencies)
+    fired = set()
+    running = {}
+    changed = set(changed)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+      while waiting or running:
+        pending = list(running.values()) + waiting
+        for dependency in list(waiting):
+          # Espera enquanto outro callback pendente produz uma das suas entradas
+          produced = {key for other in pending if other is not dependency for key in self._output_keys(other)}
+          if not any(self._key(item) in produced for item in dependency['inputs']):
+            waiting.remove(dependency)
+            fired.add(id(dependency))
+            running[pool.submit(self._fire, dependency, set(changed))] = dependency
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+          del running[future]
+          outputs = future.result()
+          changed |= outputs
+
+          elapsed = time.perf_counter() - self._start
+          for key in outputs:
+            self.painted.setdefault(key.rsplit('.', 1)[0], elapsed)
+
+          for dependency in self._triggered_by(outputs):
+            if id(dependency) not in fired and all(dependency is not other for other in waiting):
+              waiting.append(dependency)
+
+  def stages(self) -> dict:
+    """Tempo (s) até o fim de cada etapa de `STAGES` e até a página completa."""
+    result = {
+      name: max(self.painted.get(component_id, np.nan) for component_id in component_ids)
+      for name, component_ids in STAGES.items()
+    }
+    result['página completa'] = max(self.painted.values())
+    return result
+
+def run(base_url: str, sessions: int, cold: bool, seed: int = 0) -> list:
+  """
+  Abre `sessions` sessões, uma de cada vez, e retorna os tempos das etapas de cada uma.
+
+  Args:
+      cold (bool): Abre um município diferente (sem cache) a cada sessão, em vez de Floriano.
+  """
+  rng = random.Random(seed)
+  results = []
+
+  for _ in range(sessions):
+    pathname = f"/municipio/{rng.choice(OTHER_STATES)}{rng.randrange(100_000):05d}/" if cold else '/municipio/'
+    session = PaintSession(base_url, '/municipio/', pathname, Recorder())
+    session.load()
+    results.append(session.stages())
+
+  return results
+
+def report(results: list) -> str:
+  """Monta a tabela com as latências p50/p95/máxima (ms) de cada etapa."""
+  lines = [f"{'etapa':<20} {'p50':>8} {'p95':>8} {'máx':>8}"]
+  for name in results[0]:
+    values = np.array([result[name] for result in results]) * 1000
+    p50, p95 = np.nanpercentile(values, [50, 95])
+    lines.append(f"{name:<20} {p50:>8.0f} {p95:>8.0f} {np.nanmax(values):>8.0f}")
+  return "\n".join(lines)
+
+def main():
+  parser = argparse.ArgumentParser(description="Tempo até a primeira renderização útil do dashboard geral.")
+  parser.add_argument('--url', default='http://127.0.0.1:8050', help="Endereço do servidor.")
+  parser.add_argument('--sessions', type=int, default=20, help="Sessões abertas, uma de cada vez.")
+  parser.add_argument('--cold', action='store_true', help="Abre municípios sem dados em cache.")
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  print(report(run(args.url, args.sessions, args.cold, args.seed)))
+
+if __name__ == "__main__":
+  main()
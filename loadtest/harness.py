@@ -0,0 +1,353 @@
+"""
+Teste de carga dos dashboards pelo protocolo HTTP do Dash.
+
+Cada usuário virtual repete sessões realistas: abre um dos apps (`_dash-layout`,
+`_dash-dependencies` e os callbacks disparados no carregamento, incluindo o
+carregamento progressivo e os callbacks em segundo plano) e depois interage com os
+controles, como um usuário faria: troca o ano, os estados e capitais das
+comparações, o intervalo de anos e o Top N das culturas e arrasta o intervalo do
+gráfico de composição do PIB. Cada interação dispara os mesmos callbacks (e as
+mesmas cadeias de callbacks) que o navegador dispararia.
+
+Ao final, o relatório mostra a vazão, o tamanho médio das respostas e as latências
+p50/p95/p99 por callback.
+
+Deve ser executado contra o servidor local que imita o SIDRA (loadtest/standin.py),
+nunca contra a API do IBGE:
+
+    python -m loadtest.standin --port 8099 --latency 0.3
+    STATVIEW_SIDRA_URL=http://127.0.0.1:8099 \\
+    STATVIEW_PERIODS_URL=http://127.0.0.1:8099/api/v3/agregados/{table}/periodos \\
+    gunicorn run:app
+    python -m loadtest.harness --url http://127.0.0.1:8050 --users 20 --duration 120
+"""
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+
+import numpy as np
+import requests
+
+with open('app/dash_apps/data/piaui_city_codes.txt', 'r') as file:
+  PIAUI_CODES = file.read().strip().split(',')
+
+# Apps montados e o peso de cada um no sorteio das sessões
+APPS = {'/municipio/': 0.8, '/pib-floriano/': 0.2}
+
+# Controles com que os usuários interagem em cada app (id, propriedade)
+CONTROLS = {
+  '/municipio/': [
+    ('year-filter', 'value'),
+    ('city-code-filter', 'value'),
+    ('state-code-filter', 'value'),
+    ('race-city-code-filter', 'value'),
+    ('race-state-code-filter', 'value'),
+    ('crops-years', None),
+    ('top-n-producoes', 'value'),
+  ],
+  '/pib-floriano/': [
+    ('year-slider', 'value'),
+  ],
+}
+
+# Proporção das sessões do dashboard geral que abrem outro município do Piauí
+OTHER_MUNICIPALITY_SHARE = 0.3
+
+# Tempo máximo (s) de uma requisição e de espera por um callback em segundo plano
+REQUEST_TIMEOUT = 60
+POLL_INTERVAL = 0.05
+
+class Recorder:
+  """Latências e erros por callback, compartilhados pelos usuários virtuais."""
+  def __init__(self):
+    self.latencies = collections.defaultdict(list)
+    self.sizes = collections.defaultdict(int)
+    self.errors = collections.Counter()
+    self.sessions = 0
+    self._lock = threading.Lock()
+
+  def record(self, label: str, latency: float, ok: bool = True, size: int = 0):
+    with self._lock:
+      self.latencies[label].append(latency)
+      self.sizes[label] += size
+      if not ok:
+        self.errors[label] += 1
+
+  def session_done(self):
+    with self._lock:
+      self.sessions += 1
+
+  def report(self, elapsed: float) -> str:
+    """Monta a tabela de vazão, tamanho médio das respostas (KiB) e latências (ms) por callback."""
+    with self._lock:
+      total = sum(len(values) for values in self.latencies.values())
+      lines = [
+        f"Duração: {elapsed:.1f} s | sessões: {self.sessions} | requisições: {total} "
+        f"| vazão: {total / elapsed:.1f} req/s | erros: {sum(self.errors.values())}",
+        "",
+        f"{'callback':<52} {'n':>6} {'req/s':>7} {'erros':>6} {'KiB':>7} {'p50':>8} {'p95':>8} {'p99':>8}",
+      ]
+      for label in sorted(self.latencies):
+        values = np.array(self.latencies[label]) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        lines.append(
+          f"{label[:52]:<52} {len(values):>6} {len(values) / elapsed:>7.2f} {self.errors[label]:>6} "
+          f"{self.sizes[label] / len(values) / 1024:>7.1f} "
+          f"{p50:>8.0f} {p95:>8.0f} {p99:>8.0f}")
+      return "\n".join(lines)
+
+def _walk(node, components: dict):
+  """Indexa as propriedades dos componentes do layout pelo id."""
+  if isinstance(node, dict):
+    if 'props' in node and 'type' in node:
+      props = node['props']
+      if 'id' in props:
+        component_id = props['id']
+        components[json.dumps(component_id, sort_keys=True) if isinstance(component_id, dict) else component_id] = props
+      for value in props.values():
+        _walk(value, components)
+    else:
+      for value in node.values():
+        _walk(value, components)
+  elif isinstance(node, list):
+    for value in node:
+      _walk(value, components)
+
+def _option_values(props: dict) -> list:
+  options = props.get('options') or []
+  if isinstance(options, dict):
+    return list(options)
+  return [option['value'] if isinstance(option, dict) else option for option in options]
+
+class DashSession:
+  """
+  Sessão de um usuário em um app Dash, falando o mesmo protocolo do navegador.
+
+  Args:
+      base_url (str): Endereço do servidor (ex: 'http://127.0.0.1:8050').
+      prefix (str): Prefixo do app (ex: '/municipio/').
+      pathname (str): Caminho aberto pelo usuário (ex: '/municipio/2203909/').
+      recorder (Recorder): Onde registrar as latências.
+  """
+  def __init__(self, base_url: str, prefix: str, pathname: str, recorder: Recorder):
+    self.base_url = base_url.rstrip('/')
+    self.prefix = prefix
+    self.pathname = pathname
+    self.recorder = recorder
+    self.http = requests.Session()
+    self.props = {}
+    self.dependencies = []
+
+  def _get(self, path: str, label: str):
+    start = time.perf_counter()
+    response = self.http.get(self.base_url + path, timeout=REQUEST_TIMEOUT)
+    self.recorder.record(label, time.perf_counter() - start, response.ok, len(response.content))
+    response.raise_for_status()
+    return response
+
+  def load(self):
+    """Abre o app: página, layout, dependências e os callbacks iniciais."""
+    self._get(self.pathname, f"{self.prefix} página")
+    _walk(self._get(self.prefix + '_dash-layout', f"{self.prefix} _dash-layout").json(), self.props)
+    self.dependencies = [
+      dependency
+      for dependency in self._get(self.prefix + '_dash-dependencies', f"{self.prefix} _dash-dependencies").json()
+      if not dependency.get('clientside_function')
+    ]
+    self.props.setdefault('url', {})['pathname'] = self.pathname
+
+    produced = {key for dependency in self.dependencies for key in self._output_keys(dependency)}
+    initial = [
+      dependency for dependency in self.dependencies
+      if not dependency.get('prevent_initial_call')
+      and not any(self._key(item) in produced for item in dependency['inputs'])
+    ]
+    self._run(initial)
+
+  def change(self, values: dict):
+    """Altera propriedades de controles ({(id, propriedade): valor}) e dispara os callbacks."""
+    for (component_id, prop), value in values.items():
+      self.props.setdefault(component_id, {})[prop] = value
+    changed = {f"{component_id}.{prop}" for component_id, prop in values}
+    self._run(self._triggered_by(changed), changed)
+
+  @staticmethod
+  def _key(item: dict) -> str:
+    return f"{item['id']}.{item['property']}"
+
+  @staticmethod
+  def _output_keys(dependency: dict) -> list:
+    output = dependency['output']
+    return output.strip('.').split('...') if output.startswith('..') else [output]
+
+  def _triggered_by(self, changed: set) -> list:
+    return [
+      dependency for dependency in self.dependencies
+      if any(self._key(item) in changed for item in dependency['inputs'])
+    ]
+
+  def _run(self, dependencies: list, changed: set = frozenset()):
+    # Dispara os callbacks e, em seguida, os que dependem das saídas alteradas por eles
+    for _ in range(10):
+      if not dependencies:
+        return
+      outputs = set()
+      for dependency in dependencies:
+        outputs |= self._fire(dependency, changed)
+      changed = outputs
+      dependencies = self._triggered_by(outputs)
+
+  def _expand(self, output: str):
+    component_id, prop = output.rsplit('.', 1)
+    if not component_id.startswith('{'):
+      return {'id': component_id, 'property': prop}
+
+    pattern = json.loads(component_id)
+    fixed = {name: value for name, value in pattern.items() if not isinstance(value, list)}
+    return [
+      {'id': json.loads(key), 'property': prop}
+      for key in self.props
+      if key.startswith('{') and all(json.loads(key).get(name) == value for name, value in fixed.items())
+    ]
+
+  def _value(self, item: dict):
+    return self.props.get(item['id'], {}).get(item['property'])
+
+  def _label(self, dependency: dict) -> str:
+    outputs = [key.rsplit('.', 1)[0] for key in self._output_keys(dependency)]
+    name = outputs[0] if not outputs[0].startswith('{') else json.loads(outputs[0]).get('type', outputs[0])
+    return f"{self.prefix} {name}" + (f" (+{len(outputs) - 1})" if len(outputs) > 1 else "")
+
+  def _fire(self, dependency: dict, changed: set) -> set:
+    output = dependency['output']
+    outputs = [self._expand(key) for key in self._output_keys(dependency)]
+    payload = {
+      'output': output,
+      'outputs': outputs if output.startswith('..') else outputs[0],
+      'inputs': [dict(item, value=self._value(item)) for item in dependency['inputs']],
+      'state': [dict(item, value=self._value(item)) for item in dependency['state']],
+      'changedPropIds': [self._key(item) for item in dependency['inputs'] if self._key(item) in changed]
+        or [self._key(item) for item in dependency['inputs']],
+    }
+
+    url = self.base_url + self.prefix + '_dash-update-component'
+    start = time.perf_counter()
+    size = 0
+    try:
+      response = self.http.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+      size += len(response.content)
+      # Callbacks em segundo plano: o servidor devolve o job, e o navegador consulta o
+      # andamento (respostas de progresso) até receber o resultado
+      job = None
+      while response.status_code in (200, 202):
+        body = response.json()
+        if 'cacheKey' in body:
+          job = f"cacheKey={body['cacheKey']}&job={body['job']}"
+        if 'response' in body or job is None:
+          break
+        time.sleep(POLL_INTERVAL)
+        response = self.http.post(f"{url}?{job}", json=payload, timeout=REQUEST_TIMEOUT)
+        size += len(response.content)
+    except requests.RequestException:
+      self.recorder.record(self._label(dependency), time.perf_counter() - start, ok=False)
+      return set()
+
+    self.recorder.record(self._label(dependency), time.perf_counter() - start, response.status_code in (200, 204), size)
+    if response.status_code != 200:
+      return set()
+
+    changed = set()
+    for component_id, props in response.json().get('response', {}).items():
+      if component_id.startswith('{'):
+        continue
+      self.props.setdefault(component_id, {}).update(props)
+      changed |= {f"{component_id}.{prop}" for prop in props}
+    return changed
+
+def _interaction(session: DashSession, control: tuple, rng: random.Random) -> dict:
+  """Sorteia um novo valor para um controle, como um usuário o alteraria."""
+  component_id, prop = control
+
+  if component_id == 'crops-years':
+    years = _option_values(session.props.get('start-year', {}))
+    start, end = sorted(rng.sample(years, 2))
+    return {('start-year', 'value'): start, ('end-year', 'value'): end}
+
+  props = session.props.get(component_id, {})
+  if 'min' in props and 'max' in props:
+    start, end = sorted(rng.sample(range(int(props['min']), int(props['max']) + 1), 2))
+    return {(component_id, prop): [start, end]}
+
+  return {(component_id, prop): rng.choice(_option_values(props))}
+
+def run_session(base_url: str, recorder: Recorder, rng: random.Random, actions: int, think: float):
+  """Executa uma sessão: abre um app e faz `actions` interações, com pausas de ~`think` s."""
+  prefix = rng.choices(list(APPS), weights=list(APPS.values()))[0]
+  pathname = prefix
+  if prefix == '/municipio/' and rng.random() < OTHER_MUNICIPALITY_SHARE:
+    pathname = f"{prefix}{rng.choice(PIAUI_CODES)}/"
+
+  session = DashSession(base_url, prefix, pathname, recorder)
+  session.load()
+
+  controls = [control for control in CONTROLS[prefix] if control[0] in session.props or control[0] == 'crops-years']
+  for _ in range(actions):
+    time.sleep(rng.expovariate(1 / think) if think > 0 else 0)
+    session.change(_interaction(session, rng.choice(controls), rng))
+
+  recorder.session_done()
+
+def run(base_url: str, users: int, duration: float, actions: int = 5, think: float = 1.0, seed: int = 0) -> Recorder:
+  """
+  Executa o teste de carga.
+
+  Args:
+      base_url (str): Endereço do servidor.
+      users (int): Usuários virtuais simultâneos.
+      duration (float): Duração do teste, em segundos (sessões em andamento terminam).
+      actions (int, optional): Interações por sessão.
+      think (float, optional): Pausa média entre interações, em segundos.
+      seed (int, optional): Semente do sorteio das sessões, para repetir um teste.
+
+  Returns:
+      Recorder: Latências e erros registrados.
+  """
+  recorder = Recorder()
+  end = time.monotonic() + duration
+
+  def user(index):
+    rng = random.Random(seed * 1000 + index)
+    while time.monotonic() < end:
+      try:
+        run_session(base_url, recorder, rng, actions, think)
+      except requests.RequestException as error:
+        recorder.record('sessão interrompida', 0.0, ok=False)
+        print(f"Usuário {index}: {error}")
+
+  threads = [threading.Thread(target=user, args=(index,), daemon=True) for index in range(users)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  return recorder
+
+def main():
+  parser = argparse.ArgumentParser(description="Teste de carga dos dashboards (protocolo HTTP do Dash).")
+  parser.add_argument('--url', default='http://127.0.0.1:8050', help="Endereço do servidor.")
+  parser.add_argument('--users', type=int, default=10, help="Usuários virtuais simultâneos.")
+  parser.add_argument('--duration', type=float, default=60, help="Duração do teste (s).")
+  parser.add_argument('--actions', type=int, default=5, help="Interações por sessão.")
+  parser.add_argument('--think', type=float, default=1.0, help="Pausa média entre interações (s).")
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  start = time.monotonic()
+  recorder = run(args.url, args.users, args.duration, args.actions, args.think, args.seed)
+  print(recorder.report(time.monotonic() - start))
+
+if __name__ == "__main__":
+  main()
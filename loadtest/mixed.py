@@ -0,0 +1,101 @@
+"""
+Vazão dos callbacks rápidos sob carga mista (painéis lentos x requisições rápidas).
+
+Dois grupos de usuários virtuais usam o mesmo servidor ao mesmo tempo:
+
+- usuários "lentos" abrem o dashboard geral de municípios de fora do Piauí, sempre
+  diferentes (caches frios): a alfabetização e as culturas (histórico completo da
+  tabela 5457) são baixadas do SIDRA;
+- usuários "rápidos" trocam o ano do dashboard de Floriano, cujos dados já estão em
+  cache depois da primeira passada.
+
+O relatório mostra a vazão e as latências dos callbacks dos usuários rápidos, que só
+dependem de o servidor ter threads livres para atendê-los, e das sessões lentas.
+Compare o servidor com os painéis lentos em segundo plano (padrão) e na própria
+requisição (STATVIEW_BACKGROUND_CALLBACKS=0), contra o SIDRA local:
+
+    python -m loadtest.standin --port 8099 --latency 0.3
+    STATVIEW_SIDRA_URL=http://127.0.0.1:8099 \\
+    STATVIEW_PERIODS_URL=http://127.0.0.1:8099/api/v3/agregados/{table}/periodos \\
+    STATVIEW_WORKERS=2 STATVIEW_THREADS=4 gunicorn run:app
+    python -m loadtest.mixed --url http://127.0.0.1:8050 --slow-users 8 --fast-users 4 --duration 60
+"""
+import argparse
+import random
+import threading
+import time
+
+import requests
+
+from loadtest.harness import DashSession, Recorder, _option_values
+
+# Códigos das UFs (fora o Piauí) usados para sortear municípios sem dados em cache
+OTHER_STATES = ('11', '15', '23', '26', '29', '31', '33', '35', '41', '43', '50', '52')
+
+def slow_user(base_url: str, recorder: Recorder, rng: random.Random, end: float):
+  """Abre o dashboard de um município diferente a cada sessão, até `end`."""
+  while time.monotonic() < end:
+    code = f"{rng.choice(OTHER_STATES)}{rng.randrange(100_000):05d}"
+    DashSession(base_url, '/municipio/', f'/municipio/{code}/', recorder).load()
+    recorder.session_done()
+
+def fast_user(base_url: str, recorder: Recorder, rng: random.Random, end: float):
+  """Abre o dashboard de Floriano (fora da medição) e troca o ano repetidamente, até `end`."""
+  session = DashSession(base_url, '/municipio/', '/municipio/', Recorder())
+  session.load()
+  years = _option_values(session.props['year-filter'])
+
+  session.recorder = recorder
+  while time.monotonic() < end:
+    session.change({('year-filter', 'value'): rng.choice(years)})
+  recorder.session_done()
+
+def run(base_url: str, slow_users: int, fast_users: int, duration: float, seed: int = 0) -> tuple:
+  """
+  Executa os dois grupos de usuários ao mesmo tempo.
+
+  Returns:
+      tuple: (Recorder dos usuários rápidos, Recorder dos usuários lentos).
+  """
+  fast, slow = Recorder(), Recorder()
+  end = time.monotonic() + duration
+
+  def user(target, recorder, index):
+    try:
+      target(base_url, recorder, random.Random(seed * 1000 + index), end)
+    except requests.RequestException as error:
+      recorder.record('sessão interrompida', 0.0, ok=False)
+      print(f"Usuário {index}: {error}")
+
+  threads = (
+    [threading.Thread(target=user, args=(slow_user, slow, index), daemon=True) for index in range(slow_users)]
+    + [threading.Thread(target=user, args=(fast_user, fast, slow_users + index), daemon=True) for index in range(fast_users)]
+  )
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  return fast, slow
+
+def main():
+  parser = argparse.ArgumentParser(description="Vazão dos callbacks rápidos sob carga mista.")
+  parser.add_argument('--url', default='http://127.0.0.1:8050', help="Endereço do servidor.")
+  parser.add_argument('--slow-users', type=int, default=8, help="Usuários abrindo municípios sem cache.")
+  parser.add_argument('--fast-users', type=int, default=4, help="Usuários trocando o ano de Floriano.")
+  parser.add_argument('--duration', type=float, default=60, help="Duração do teste (s).")
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  start = time.monotonic()
+  fast, slow = run(args.url, args.slow_users, args.fast_users, args.duration, args.seed)
+  elapsed = time.monotonic() - start
+
+  print("Usuários rápidos (troca de ano em Floriano)")
+  print(fast.report(elapsed))
+  print()
+  print("Usuários lentos (municípios sem cache)")
+  print(slow.report(elapsed))
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,247 @@
+"""
+Servidor local que imita a API do SIDRA, para testes de carga.
+
+Responde às mesmas URLs usadas pelo sidrapy (`/values/t/<tabela>/n<nível>/...`) e
+pela API de metadados (`/api/v3/agregados/<tabela>/periodos`), no mesmo formato
+JSON, com valores sintéticos determinísticos (a mesma consulta sempre devolve os
+mesmos valores). A latência de cada resposta é sorteada em torno de um valor
+configurável, para reproduzir o tempo de resposta do IBGE sem depender dele nem
+sobrecarregá-lo.
+
+Uso:
+    python -m loadtest.standin --port 8099 --latency 0.3
+
+E, em outro terminal, o app apontando para o servidor local:
+    STATVIEW_SIDRA_URL=http://127.0.0.1:8099 \\
+    STATVIEW_PERIODS_URL=http://127.0.0.1:8099/api/v3/agregados/{table}/periodos \\
+    gunicorn run:app
+"""
+import argparse
+import random
+import time
+import zlib
+
+from flask import Flask, jsonify
+
+# Não importa o pacote `app`: importá-lo carrega dados do SIDRA (que este servidor imita)
+
+# Períodos publicados de cada tabela (os mesmos de FALLBACK_PERIODS, em data/periods.py)
+PERIODS = {
+  '9605': (2010, 2022),
+  '6579': tuple(range(2010, 2022)) + (2024,),
+  '9606': (2010, 2022),
+  '9923': (2022,),
+  '5938': tuple(range(2010, 2022)),
+  '9543': (2022,),
+  '5457': tuple(range(1974, 2024)),
+}
+
+with open('app/dash_apps/data/piaui_city_codes.txt', 'r') as file:
+  PIAUI_CODES = file.read().strip().split(',')
+
+LEVEL_NAMES = {'1': 'Brasil', '3': 'Unidade da Federação', '6': 'Município'}
+
+# Dimensão de classificação de cada tabela: (nome da dimensão, unidade de medida)
+CLASSIFICATIONS = {
+  '9605': ('Cor ou raça', '%'),
+  '9606': ('Grupo de idade', 'Pessoas'),
+  '9923': ('Situação do domicílio', '%'),
+  '9543': ('Grupo de idade', '%'),
+  '5457': ('Produto das lavouras temporárias e permanentes', 'Toneladas'),
+}
+
+UNITS = {'5938': 'Mil Reais', '6579': 'Pessoas', '9605': 'Pessoas'}
+
+PIB_VARIABLE_NAMES = {
+  '37': 'Produto Interno Bruto a preços correntes',
+  '498': 'Valor adicionado bruto a preços correntes total',
+  '513': 'Valor adicionado bruto a preços correntes da agropecuária',
+  '517': 'Valor adicionado bruto a preços correntes da indústria',
+  '6575': 'Valor adicionado bruto a preços correntes dos serviços, exclusive administração, '
+          'defesa, educação e saúde públicas e seguridade social',
+  '525': 'Valor adicionado bruto a preços correntes da administração, defesa, educação e '
+         'saúde públicas e seguridade social',
+  '543': 'Impostos, líquidos de subsídios, sobre produtos, a preços correntes',
+}
+
+CROP_PRODUCTS = {
+  '2688': 'Milho (em grão)', '2708': 'Mandioca', '2692': 'Arroz (em casca)',
+  '2716': 'Coco-da-baía', '2702': 'Feijão (em grão)', '2698': 'Castanha de caju',
+  '2714': 'Melancia', '2711': 'Manga', '2720': 'Soja (em grão)', '2694': 'Cana-de-açúcar',
+}
+
+HEADER = {
+  'NC': 'Nível Territorial (Código)', 'NN': 'Nível Territorial',
+  'MC': 'Unidade de Medida (Código)', 'MN': 'Unidade de Medida', 'V': 'Valor',
+  'D1C': 'Município (Código)', 'D1N': 'Município',
+  'D2C': 'Ano (Código)', 'D2N': 'Ano',
+  'D3C': 'Variável (Código)', 'D3N': 'Variável',
+}
+
+def _seed(*parts) -> int:
+  return zlib.crc32('|'.join(map(str, parts)).encode())
+
+def _size(code: str) -> int:
+  """População sintética de uma localidade (estável entre consultas)."""
+  if code == '1':
+    return 203_000_000
+  if len(code) == 2:
+    return 1_000_000 + _seed(code) % 40_000_000
+  return 3_000 + _seed(code) % 150_000
+
+def _name(level: str, code: str) -> str:
+  if level == '1':
+    return 'Brasil'
+  if level == '3':
+    return 'Piauí' if code == '22' else f'UF {code}'
+  suffix = ' (PI)' if code.startswith('22') else ''
+  return f'Município {code}{suffix}'
+
+def _parse(query: str) -> dict:
+  """Separa os parâmetros de uma URL do SIDRA (ex: 't/5938/n6/2203909/p/all/v/37')."""
+  parts = query.strip('/').split('/')
+  params = {'levels': [], 'classifications': {}}
+
+  for name, value in zip(parts[::2], parts[1::2]):
+    if name.startswith('n'):
+      params['levels'].append((name[1:], value))
+    elif name.startswith('c'):
+      params['classifications'][name[1:]] = value
+    else:
+      params[name] = value
+
+  return params
+
+def _localities(level: str, codes: str) -> list:
+  if codes == 'all' or codes.startswith('in '):
+    return PIAUI_CODES if level == '6' else ['22']
+  return codes.split(',')
+
+def _periods(table: str, period: str) -> list:
+  available = list(PERIODS.get(table, (2022,)))
+  if period in (None, 'last'):
+    return available[-1:]
+  if period == 'all':
+    return available
+  if period.startswith('last '):
+    return available[-int(period.split()[1]):]
+
+  selected = []
+  for item in period.split(','):
+    if '-' in item:
+      start, end = map(int, item.split('-'))
+      selected += [year for year in available if start <= year <= end]
+    elif int(item) in available:
+      selected.append(int(item))
+  return selected
+
+def _categories(table: str, classifications: dict) -> list:
+  if table == '5457':
+    return list(CROP_PRODUCTS)
+  for categories in classifications.values():
+    if categories.startswith('all'):
+      return ['1', '2']
+    return categories.split(',')
+  return [None]
+
+def _value(table: str, code: str, year: int, variable: str, category) -> str:
+  generator = random.Random(_seed(table, code, year, variable, category))
+  size = _size(code)
+
+  if table in ('6579', '9605') and category in (None, '9521'):
+    return str(int(size * (1 + (year - 2010) * 0.005)))
+  if table in ('9605', '9923', '9543'):
+    return f"{generator.uniform(1, 99):.2f}"
+  if table == '9606':
+    return str(int(size / 20 * generator.uniform(0.5, 1.5)))
+  if table == '5938':
+    return str(int(size * 10 * (1 + (year - 2002) * 0.08) * generator.uniform(0.1, 1)))
+  if table == '5457':
+    if generator.random() < 0.1:
+      return generator.choice(['-', '..', '...', 'X'])
+    return str(int(size / 10 * generator.uniform(0, 3)))
+  return str(int(size * generator.uniform(0.1, 1)))
+
+def build_values(query: str) -> list:
+  """
+  Monta a resposta de uma consulta `/values` do SIDRA.
+
+  Args:
+      query (str): Parte da URL depois de '/values/'.
+
+  Returns:
+      list: Linhas no formato da API (a primeira é o cabeçalho, salvo com `/h/n`).
+  """
+  params = _parse(query)
+  table = params['t']
+  classification_name, unit = CLASSIFICATIONS.get(table, (None, UNITS.get(table, 'Unidades')))
+  categories = _categories(table, params['classifications'])
+  if table == '9605' and not params['classifications']:
+    categories, unit = [None], 'Pessoas'
+
+  header = dict(HEADER)
+  if categories != [None]:
+    header.update({'D4C': f'{classification_name} (Código)', 'D4N': classification_name})
+  rows = [header] if params.get('h', 'y') == 'y' else []
+
+  periods = _periods(table, params.get('p'))
+  variables = params.get('v', 'allxp').split(',')
+
+  for level, codes in params['levels']:
+    for code in _localities(level, codes):
+      name = _name(level, code)
+      for year in periods:
+        for variable in variables:
+          for category in categories:
+            row = {
+              'NC': level, 'NN': LEVEL_NAMES.get(level, level), 'MC': '1', 'MN': unit,
+              'V': _value(table, code, year, variable, category),
+              'D1C': code, 'D1N': name, 'D2C': str(year), 'D2N': str(year),
+              'D3C': variable, 'D3N': PIB_VARIABLE_NAMES.get(variable, f'Variável {variable}'),
+            }
+            if category is not None:
+              row['D4C'] = category
+              row['D4N'] = CROP_PRODUCTS.get(category, f'Categoria {category}')
+            rows.append(row)
+
+  return rows
+
+def create_standin(latency: float = 0.3, jitter: float = 0.5) -> Flask:
+  """
+  Cria o servidor que imita o SIDRA.
+
+  Args:
+      latency (float, optional): Latência média das respostas, em segundos.
+      jitter (float, optional): Variação relativa da latência (0.5 = ±50%).
+  """
+  server = Flask(__name__)
+  # A ordem das colunas das respostas é a mesma da API
+  server.json.sort_keys = False
+
+  def wait():
+    time.sleep(max(0.0, random.uniform(latency * (1 - jitter), latency * (1 + jitter))))
+
+  @server.route('/values/<path:query>')
+  def values(query):
+    wait()
+    return jsonify(build_values(query))
+
+  @server.route('/api/v3/agregados/<table>/periodos')
+  def periods(table):
+    wait()
+    return jsonify([{'id': str(year), 'literals': [str(year)]} for year in PERIODS.get(table, (2022,))])
+
+  return server
+
+def main():
+  parser = argparse.ArgumentParser(description="Servidor local que imita a API do SIDRA.")
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=8099)
+  parser.add_argument('--latency', type=float, default=0.3, help="Latência média das respostas (s).")
+  parser.add_argument('--jitter', type=float, default=0.5, help="Variação relativa da latência.")
+  args = parser.parse_args()
+
+  create_standin(args.latency, args.jitter).run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+  main()
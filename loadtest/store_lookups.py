@@ -0,0 +1,98 @@
+"""
+Consultas das maiores produções por ano: armazenamento local (SQLite) x pandas.
+
+Grava históricos sintéticos de lavouras (30 produtos × 50 anos por localidade) para
+1 localidade, 224 (os municípios do Piauí) e 5.570 (todos os municípios do Brasil) e
+mede, para localidades sorteadas, o tempo de uma consulta das `top` maiores produções
+de cada ano de um intervalo:
+
+- pandas, filtrando um DataFrame com todas as localidades;
+- pandas, a partir do DataFrame da própria localidade (o cache em memória por município);
+- SQLite, com `LocalStore.top_per_year` (índice de cobertura por localidade e ano).
+
+Não consulta o SIDRA nem o servidor:
+
+    python -m loadtest.store_lookups
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.dash_apps.data.store import LocalStore
+
+PRODUCTS = [f'Produto {index}' for index in range(30)]
+YEARS = np.arange(1974, 2024)
+
+def crop_history(code: str) -> pd.DataFrame:
+  """Histórico sintético de uma localidade, no formato de `economy.fetch_crop_production`."""
+  rng = np.random.default_rng(int(code))
+  years = np.repeat(YEARS, len(PRODUCTS))
+  frame = pd.DataFrame({
+    'medida': 'Toneladas',
+    'quantidade': rng.integers(1, 100_000, len(years)),
+    'ano': years,
+    'produto': PRODUCTS * len(YEARS),
+  })
+  return frame.sort_values('quantidade', ascending=False)
+
+def _top_per_year(frame: pd.DataFrame, start_year: int, end_year: int, top: int) -> pd.DataFrame:
+  frame = frame.query("ano >= @start_year and ano <= @end_year")
+  return frame.groupby('ano', group_keys=False).head(top).sort_values('quantidade', ascending=False)
+
+def measure(localities: int, lookups: int, start_year: int, end_year: int, top: int, seed: int = 0) -> dict:
+  """
+  Grava `localities` históricos e mede `lookups` consultas de cada abordagem.
+
+  Returns:
+      dict: Tempo de gravação (s), linhas e tempo médio por consulta (ms) de cada abordagem.
+  """
+  codes = [str(3_000_000 + index) for index in range(localities)]
+  frames = {code: crop_history(code) for code in codes}
+  combined = pd.concat([frame.assign(codigo=code) for code, frame in frames.items()], ignore_index=True)
+  sample = random.Random(seed).choices(codes, k=lookups)
+
+  with tempfile.TemporaryDirectory() as directory:
+    store = LocalStore(os.path.join(directory, 'store.sqlite3'), max_localities=localities)
+
+    start = time.perf_counter()
+    for code in codes:
+      store.ensure('crop_production', code, frames[code], 'v1')
+    load = time.perf_counter() - start
+
+    approaches = {
+      'pandas (todas as localidades)': lambda code: _top_per_year(combined[combined['codigo'] == code], start_year, end_year, top),
+      'pandas (frame da localidade)': lambda code: _top_per_year(frames[code], start_year, end_year, top),
+      'sqlite (top_per_year)': lambda code: store.top_per_year('crop_production', code, start_year, end_year, top),
+    }
+
+    result = {'gravação (s)': load, 'linhas': len(combined)}
+    for name, lookup in approaches.items():
+      start = time.perf_counter()
+      for code in sample:
+        lookup(code)
+      result[name] = (time.perf_counter() - start) / len(sample) * 1000
+
+  return result
+
+def main():
+  parser = argparse.ArgumentParser(description="Consultas das maiores produções por ano: SQLite x pandas.")
+  parser.add_argument('--localities', default='1,224,5570', help="Quantidades de localidades, separadas por vírgula.")
+  parser.add_argument('--lookups', type=int, default=200, help="Consultas medidas em cada abordagem.")
+  parser.add_argument('--start-year', type=int, default=2010)
+  parser.add_argument('--end-year', type=int, default=2020)
+  parser.add_argument('--top', type=int, default=3)
+  args = parser.parse_args()
+
+  for localities in (int(value) for value in args.localities.split(',')):
+    result = measure(localities, args.lookups, args.start_year, args.end_year, args.top)
+    print(f"{localities} localidade(s): {result.pop('linhas')} linhas, gravadas em {result.pop('gravação (s)'):.1f} s")
+    for name, milliseconds in result.items():
+      print(f"  {name:<32} {milliseconds:>8.3f} ms/consulta")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,137 @@
+"""
+Configuração dos testes: diretórios temporários e um SIDRA falso, sem acesso à rede.
+
+Os diretórios do cache em disco, do armazenamento local e das partições materializadas
+são definidos antes de qualquer importação do app, pois são lidos na importação.
+"""
+import collections
+import os
+import tempfile
+import zlib
+
+import pandas as pd
+import pytest
+
+_root = tempfile.mkdtemp(prefix='statview-tests-')
+os.environ.setdefault('STATVIEW_BACKGROUND_CACHE_DIR', os.path.join(_root, 'background'))
+os.environ.setdefault('STATVIEW_STORE_PATH', os.path.join(_root, 'store.sqlite3'))
+os.environ.setdefault('STATVIEW_MATERIALIZED_DIR', os.path.join(_root, 'materialized'))
+
+# Períodos disponíveis de cada tabela no SIDRA falso
+PERIODS = {
+  '9605': (2010, 2022),
+  '6579': tuple(range(2001, 2022)) + (2024,),
+  '9606': (2010, 2022),
+  '9923': (2022,),
+  '5938': tuple(range(2002, 2022)),
+  '5457': tuple(range(1974, 2024)),
+  '9543': (2022,),
+}
+
+# Classificação (nome da coluna e categorias padrão) de cada tabela
+CLASSIFICATIONS = {
+  '9605': ('Cor ou raça', '2776,2777,2778,2779,2780'),
+  '9606': ('Idade', '1,2,3'),
+  '9923': ('Situação', '1,2'),
+  '9543': ('Idade', '1,2,3'),
+  '5457': ('Produto das lavouras temporárias e permanentes', '2688,2708,2692'),
+}
+
+# Unidade de medida dos valores de cada tabela (padrão: 'Pessoas')
+UNITS = {'9605': 'Pessoas', '9923': '%', '9543': '%', '5938': 'Mil Reais', '5457': 'Toneladas'}
+
+HEADER = {
+  'NC': 'Nível Territorial (Código)', 'NN': 'Nível Territorial', 'MC': 'Unidade de Medida (Código)',
+  'MN': 'Unidade de Medida', 'V': 'Valor', 'D1C': 'Município (Código)', 'D1N': 'Município',
+  'D2C': 'Ano (Código)', 'D2N': 'Ano', 'D3C': 'Variável (Código)', 'D3N': 'Variável',
+}
+
+def _seed(*parts) -> int:
+  return zlib.crc32('|'.join(map(str, parts)).encode())
+
+def _periods(table_code: str, period) -> list:
+  available = PERIODS.get(table_code, (2022,))
+  if period in (None, 'last'):
+    return [available[-1]]
+  if period == 'all':
+    return list(available)
+  if period.startswith('last '):
+    return list(available[-int(period.split()[1]):])
+
+  years = []
+  for item in str(period).split(','):
+    start, _, end = item.partition('-')
+    years += [year for year in available if int(start) <= year <= int(end or start)]
+  return years
+
+def _locations(territorial_level: str, ibge_territorial_code: str) -> list:
+  """Pares (nível, código) da consulta, inclusive as de vários níveis (ex: '6' + '2203909/n3/22')."""
+  parts = f'n{territorial_level}/{ibge_territorial_code}'.split('/')
+  locations = []
+  for level, codes in zip(parts[::2], parts[1::2]):
+    if codes == 'all' or codes.startswith('in '):
+      codes = '2203909,2211001,2207702' if level == 'n6' else '22'
+    locations += [(level[1:], code) for code in codes.split(',')]
+  return locations
+
+def fake_get_table(table_code, territorial_level, ibge_territorial_code, variable=None, classification=None,
+                   categories=None, period=None, **kwargs) -> pd.DataFrame:
+  """Imita `sidrapy.get_table`: uma linha por combinação, com o cabeçalho na primeira linha."""
+  table_code = str(table_code)
+  header = dict(HEADER)
+  name, default_categories = CLASSIFICATIONS.get(table_code, (None, None))
+  category_codes = [None]
+  if name is not None:
+    header.update({'D4C': f'{name} (Código)', 'D4N': name})
+    category_codes = str(categories or default_categories).split(',')
+
+  rows = [header]
+  for level, code in _locations(str(territorial_level), str(ibge_territorial_code)):
+    for year in _periods(table_code, period):
+      for variable_code in str(variable or '93').split(','):
+        for category in category_codes:
+          value = 1000 + _seed(table_code, code, year, variable_code, category) % 100_000
+          row = {
+            'NC': level, 'NN': 'Município', 'MC': '1', 'MN': UNITS.get(table_code, 'Pessoas'),
+            'V': str(value), 'D1C': code, 'D1N': f'Localidade {code}', 'D2C': str(year), 'D2N': str(year),
+            'D3C': variable_code, 'D3N': f'Variável {variable_code}',
+          }
+          if category is not None:
+            row.update({'D4C': category, 'D4N': f'Categoria {category}'})
+          rows.append(row)
+  return pd.DataFrame(rows)
+
+@pytest.fixture
+def sidra_calls(monkeypatch, tmp_path):
+  """
+  Substitui o SIDRA pelo falso e zera os caches da camada de dados.
+
+  Yields:
+      collections.Counter: Consultas feitas ao SIDRA, por tabela.
+  """
+  import sidrapy
+
+  from app.dash_apps.data import materialized, periods, sidra
+  from app.dash_apps.data.cache import data_cache
+
+  calls = collections.Counter()
+
+  def get_table(**kwargs):
+    calls[str(kwargs['table_code'])] += 1
+    return fake_get_table(**kwargs)
+
+  monkeypatch.setattr(sidrapy, 'get_table', get_table)
+  monkeypatch.setattr(periods, '_fetch_periods', lambda table_code, breaker: PERIODS[table_code])
+  monkeypatch.setattr(materialized, 'MATERIALIZED_DIR', str(tmp_path / 'materialized'))
+  # Sem limite de taxa: os testes não esperam pelos tokens consumidos pelos anteriores
+  monkeypatch.setattr(sidra, 'scheduler', sidra.SidraScheduler(rate=0))
+
+  data_cache.clear()
+  sidra._last_good.clear()
+  sidra._latencies.clear()
+  sidra._breakers.clear()
+  periods._index.clear()
+
+  yield calls
+
+  data_cache.clear()
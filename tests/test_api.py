@@ -0,0 +1,65 @@
+"""
+API de exportação dos conjuntos de dados (ver app/api.py).
+"""
+import importlib
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from flask import Flask
+
+# `app.api` é o blueprint no pacote `app`; o módulo é obtido pelo nome completo
+api_module = importlib.import_module('app.api')
+
+@pytest.fixture
+def client(sidra_calls):
+  app = Flask(__name__)
+  app.register_blueprint(api_module.api)
+  return app.test_client()
+
+def test_invalid_parameters_are_bad_requests(client):
+  assert client.get('/api/population_total?ano=2022').status_code == 400
+  assert client.get('/api/crop_production?top_crops=três').status_code == 400
+
+def test_data_layer_errors_are_server_errors(client, monkeypatch):
+  def broken(local_code='2203909'):
+    raise KeyError('coluna ausente')
+
+  monkeypatch.setitem(api_module.DATASETS, 'population_total', broken)
+  client.application.testing = False
+
+  assert client.get('/api/population_total').status_code == 500
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet', 'arrow'])
+def test_formats_carry_the_same_rows(client, output_format):
+  response = client.get(f'/api/population_by_race?format={output_format}')
+  assert response.status_code == 200
+
+  if output_format == 'csv':
+    frame = pd.read_csv(io.BytesIO(response.data))
+  elif output_format == 'parquet':
+    frame = pd.read_parquet(io.BytesIO(response.data))
+  else:
+    frame = pa.ipc.open_stream(response.data).read_pandas()
+
+  expected = api_module.to_frame(api_module.DATASETS['population_by_race']())
+  assert list(frame.columns) == list(expected.columns)
+  assert len(frame) == len(expected)
+  assert response.headers['Content-Disposition'].endswith(f'.{api_module.FORMATS[output_format][1]}"')
+
+def test_unknown_format_is_rejected(client):
+  assert client.get('/api/population_by_race?format=xlsx').status_code == 400
+
+def test_unchanged_data_is_not_modified(client):
+  response = client.get('/api/population_by_race?format=parquet')
+  etag = response.headers['ETag']
+
+  cached = client.get('/api/population_by_race?format=parquet', headers={'If-None-Match': etag})
+  assert cached.status_code == 304
+  assert cached.data == b''
+  assert cached.headers['ETag'] == etag
+
+  # A versão dos dados é a mesma, mas o formato faz parte da ETag
+  other_format = client.get('/api/population_by_race?format=csv', headers={'If-None-Match': etag})
+  assert other_format.status_code == 200
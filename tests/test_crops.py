@@ -0,0 +1,32 @@
+"""
+Produção das lavouras: o armazenamento estadual só atende os callbacks depois de
+carregado no aquecimento ou na materialização (ver `statewide.covers_crops`).
+"""
+from app.dash_apps.data import economy, statewide
+from app.dash_apps.data.utils import FLORIANO_CODE
+
+def test_cold_cache_uses_the_municipality_query(sidra_calls):
+  assert not statewide.covers_crops('6', FLORIANO_CODE)
+
+  crops = economy.get_crop_production(local_code=FLORIANO_CODE)
+
+  assert not crops.empty
+  # Uma única consulta, só de Floriano, em vez do histórico do estado em lotes
+  assert sidra_calls == {'5457': 1}
+  assert not statewide.get_state_crops.contains()
+
+def test_loaded_state_store_serves_the_municipality(sidra_calls):
+  statewide.get_state_crops()
+  sidra_calls.clear()
+
+  assert statewide.covers_crops('6', FLORIANO_CODE)
+  crops = economy.get_crop_production(local_code=FLORIANO_CODE)
+
+  assert not crops.empty
+  assert sidra_calls == {}
+
+def test_other_states_are_not_covered(sidra_calls):
+  statewide.get_state_crops()
+
+  assert not statewide.covers_crops('6', '2304400')
+  assert not statewide.covers_crops('3', '22')
@@ -0,0 +1,91 @@
+"""
+Visões materializadas em Parquet (ver app/dash_apps/data/materialized.py).
+"""
+import dataclasses
+import os
+
+import pandas as pd
+
+from app.dash_apps.data import economy, materialized, periods
+from app.dash_apps.data.cache import data_cache
+from app.dash_apps.data.utils import FLORIANO_CODE
+
+def test_partition_path_normalizes_arguments():
+  assert materialized.partition_path('population_by_race', {'level': 6, 'local_code': 2203909}, root='views') == \
+    materialized.partition_path('population_by_race', {'level': '6', 'local_code': '2203909'}, root='views')
+
+def test_series_round_trip(tmp_path):
+  path = str(tmp_path / 'total' / 'data.parquet')
+  series = pd.Series({'total_populacao': 59236, 'ano': 2022, 'footnote': 'Censo Oficial de 2022'})
+
+  materialized.write_partition(path, series)
+
+  assert materialized.read_partition(path).to_dict() == series.to_dict()
+
+def test_partition_is_read_without_sidra(sidra_calls):
+  materialized.refresh_partition(economy.load_crop_production, local_code=FLORIANO_CODE)
+  assert sidra_calls == {'5457': 1}
+
+  data_cache.clear()
+  sidra_calls.clear()
+  crops = economy.load_crop_production(local_code=FLORIANO_CODE)
+
+  assert not crops.empty
+  assert sidra_calls == {}
+
+def test_sync_periods_include_revisions():
+  assert materialized.sync_periods((2019, 2020, 2021, 2022), synced_through=2021) == [2020, 2021, 2022]
+  assert materialized.sync_periods((2019, 2020, 2021), synced_through=2021) == [2020, 2021]
+
+def test_sync_downloads_only_new_and_revised_periods(sidra_calls, monkeypatch):
+  materialized.refresh_partition(economy.load_crop_production, local_code=FLORIANO_CODE)
+  before = economy.load_crop_production(local_code=FLORIANO_CODE)
+
+  # O IBGE publica 2024
+  available = periods.get_periods('5457') + (2024,)
+  monkeypatch.setattr(periods, '_fetch_periods', lambda table_code, breaker: available)
+  periods._index.clear()
+
+  requested = []
+  incremental = economy.load_crop_production.incremental
+
+  def fetch(sync, **kwargs):
+    requested.append(list(sync))
+    return incremental.fetch(sync, **kwargs)
+
+  monkeypatch.setattr(economy.load_crop_production, 'incremental', dataclasses.replace(incremental, fetch=fetch))
+
+  assert materialized.sync_partition(economy.load_crop_production, local_code=FLORIANO_CODE) == [2022, 2023, 2024]
+  assert requested == [[2022, 2023, 2024]]
+
+  path = materialized.partition_path('crop_production', {'level': '6', 'local_code': FLORIANO_CODE})
+  after = materialized.read_partition(path)
+  assert materialized.read_metadata(path)[materialized.SYNCED_METADATA_KEY] == b'2024'
+  # Os anos fora da janela de revisão são mantidos como estavam
+  assert after[after['ano'] < 2022].sort_values(['ano', 'produto']).reset_index(drop=True).equals(
+    before[before['ano'] < 2022].sort_values(['ano', 'produto']).reset_index(drop=True))
+
+def test_store_partition_skips_unchanged_versions(tmp_path):
+  path = str(tmp_path / 'pib' / 'data.parquet')
+  frame = pd.DataFrame({'ano': [2020, 2021], 'valor': [1.0, 2.0]})
+
+  assert materialized.store_partition(path, frame)
+  written = os.stat(path).st_mtime_ns
+  version = materialized.partition_version(path)
+
+  # Os mesmos dados (em outro objeto) não regravam o arquivo
+  assert not materialized.store_partition(path, frame.copy())
+  assert os.stat(path).st_mtime_ns == written
+
+  assert materialized.store_partition(path, frame.assign(valor=[1.0, 3.0]))
+  assert materialized.partition_version(path) != version
+
+def test_cache_reloads_a_rewritten_partition(sidra_calls):
+  materialized.refresh_partition(economy.load_crop_production, local_code=FLORIANO_CODE)
+  cached = economy.load_crop_production(local_code=FLORIANO_CODE)
+
+  path = materialized.partition_path('crop_production', {'level': '6', 'local_code': FLORIANO_CODE})
+  materialized.store_partition(path, cached.head(1))
+
+  assert len(economy.load_crop_production(local_code=FLORIANO_CODE)) == 1
+  assert economy.load_crop_production.version(local_code=FLORIANO_CODE) == materialized.partition_version(path)
@@ -0,0 +1,71 @@
+"""
+Memoização por requisição: dentro de um callback, chamadas idênticas à camada de dados
+são executadas uma única vez, e cada consulta distinta chega ao SIDRA uma única vez
+(ver app/dash_apps/data/memo.py).
+"""
+import importlib
+
+from app.dash_apps.data.memo import request_memo
+
+def test_metrics_share_pib_per_capita(sidra_calls):
+  from app.dash_apps.layout.components.callbacks import update_metrics
+
+  with request_memo() as memo:
+    outputs = update_metrics('Mais Recente', '/municipio/')
+
+  assert outputs[-1] is True
+  # Métrica e nota de rodapé de cada cartão: uma execução e uma repetição
+  assert memo.stats() == {
+    'get_pib_per_capita': {'calls': 1, 'hits': 1},
+    'get_population_total': {'calls': 1, 'hits': 1},
+    'get_total_pib': {'calls': 1, 'hits': 1},
+    'load_pib_series': {'calls': 1, 'hits': 0},
+    'load_population_series': {'calls': 1, 'hits': 0},
+  }
+  # População do Censo e série completa (9605), série de estimativas (6579),
+  # PIB do último ano e série completa (5938)
+  assert sidra_calls == {'9605': 2, '6579': 1, '5938': 2}
+
+def test_year_panels_share_race_comparisons(sidra_calls):
+  from app.dash_apps.layout.components.callbacks import update_year_panels
+  from app.dash_apps.layout.config.options import city_code_options, state_code_options
+
+  with request_memo() as memo:
+    update_year_panels('Mais Recente', '/municipio/', True, next(iter(city_code_options)), next(iter(state_code_options)))
+
+  # Raça do município, da cidade e do estado comparados, cada uma lida pelo gráfico e pela nota
+  assert memo.stats() == {
+    'get_population_age_group': {'calls': 1, 'hits': 1},
+    'get_population_by_local': {'calls': 1, 'hits': 1},
+    'get_population_by_race': {'calls': 3, 'hits': 3},
+  }
+  assert sidra_calls == {'9923': 1, '9606': 1, '9605': 3}
+
+def test_state_comparison_shares_statewide_data(sidra_calls):
+  # A importação carrega a série de Floriano, fora da requisição medida
+  composicao_pib = importlib.import_module('app.dash_apps.layout.composicao_pib')
+  sidra_calls.clear()
+
+  with request_memo() as memo:
+    composicao_pib.update_state_comparison([2010, 2021])
+
+  assert memo.stats() == {
+    'compare_with_state': {'calls': 1, 'hits': 1},
+    'get_state_composition': {'calls': 1, 'hits': 1},
+    'load_state_pib_composition': {'calls': 1, 'hits': 0},
+  }
+  # O histórico do estado é baixado uma única vez, em lotes de períodos
+  assert sidra_calls == {'5938': 4}
+
+def test_memo_is_scoped_to_the_request(sidra_calls):
+  from app.dash_apps.layout.components.callbacks import update_metrics
+
+  update_metrics('Mais Recente', '/municipio/')
+  sidra_calls.clear()
+
+  # Nova requisição: o memo começa vazio, e os resultados vêm do cache da camada de dados
+  with request_memo() as memo:
+    update_metrics('Mais Recente', '/municipio/')
+
+  assert memo.stats()['get_pib_per_capita'] == {'calls': 1, 'hits': 1}
+  assert sidra_calls == {}
@@ -0,0 +1,64 @@
+"""
+Cache em memória com orçamento em bytes (ver app/dash_apps/data/memory.py e data/cache.py).
+"""
+import numpy as np
+
+from app.dash_apps.data.cache import ShardedCache
+from app.dash_apps.data.memory import ByteBudgetCache, sizeof
+
+def _block(kib: int) -> np.ndarray:
+  return np.zeros(kib * 1024, dtype=np.uint8)
+
+def test_lru_evicts_by_bytes():
+  cache = ByteBudgetCache(max_bytes=sizeof(_block(3)), policy='lru')
+  for key in 'abc':
+    cache.set(key, _block(1))
+
+  cache.get('a')
+  cache.set('d', _block(1))
+
+  # 'b' é a usada há mais tempo; 'a' acabou de ser lida
+  assert 'b' not in cache
+  assert all(key in cache for key in 'acd')
+  assert cache.nbytes == sizeof(_block(3))
+  assert cache.stats()['evictions'] == {'bytes': 1}
+
+def test_one_large_value_evicts_several_small_ones():
+  cache = ByteBudgetCache(max_bytes=sizeof(_block(4)))
+  for key in 'abcd':
+    cache.set(key, _block(1))
+
+  cache.set('large', _block(3))
+
+  assert list(key for key in 'abcd' if key in cache) == ['d']
+  assert cache.nbytes <= cache.max_bytes
+
+def test_lfu_keeps_the_most_used_entry():
+  cache = ByteBudgetCache(max_bytes=sizeof(_block(2)), policy='lfu')
+  cache.set('a', _block(1))
+  cache.set('b', _block(1))
+  for _ in range(3):
+    cache.get('a')
+  cache.get('b')
+
+  cache.set('c', _block(1))
+
+  assert 'a' in cache and 'b' not in cache
+
+def test_values_larger_than_the_budget_are_rejected():
+  cache = ByteBudgetCache(max_bytes=1024)
+  cache.set('a', _block(2))
+
+  assert 'a' not in cache
+  assert cache.nbytes == 0
+
+def test_sharded_cache_drops_whole_municipalities():
+  cache = ShardedCache(max_bytes=2 ** 20, max_shards=2)
+  cache.set('2203909', 'pib', _block(1))
+  cache.set('2203909', 'populacao', _block(1))
+  cache.set('2211001', 'pib', _block(1))
+  cache.set('2207702', 'pib', _block(1))
+
+  assert cache.get('2203909', 'pib') is None
+  assert cache.get('2203909', 'populacao') is None
+  assert cache.stats()['shards'] == 2
@@ -0,0 +1,45 @@
+"""
+Resolução dos anos pelos metadados de períodos das tabelas (ver app/dash_apps/data/periods.py).
+"""
+import pytest
+
+from app.dash_apps.data import periods
+from app.dash_apps.data.sidra import SidraUnavailable
+
+POPULATION_TABLES = ('9605', '6579')
+
+@pytest.fixture
+def metadata_down(sidra_calls, monkeypatch):
+  """API de metadados indisponível: valem as listas reserva (`FALLBACK_PERIODS`)."""
+  def unavailable(table_code, breaker):
+    raise SidraUnavailable(f"Metadados da tabela {table_code} indisponíveis.")
+
+  monkeypatch.setattr(periods, '_fetch_periods', unavailable)
+
+@pytest.mark.parametrize('year, expected', [
+  ('last', ('9605', '2022')),
+  ('2022', ('9605', '2022')),
+  ('2015', ('6579', '2015')),
+  # Empate entre 2022 e 2024: vale o mais antigo
+  ('2023', ('9605', '2022')),
+  (2030, ('6579', '2024')),
+  ('1990', ('9605', '2010')),
+])
+def test_resolve_year_with_fallback_periods(metadata_down, year, expected):
+  assert periods.resolve_year(POPULATION_TABLES, year) == expected
+
+def test_fallback_can_be_refused(metadata_down):
+  assert periods.get_periods('9605') == periods.FALLBACK_PERIODS['9605']
+
+  with pytest.raises(SidraUnavailable):
+    periods.get_periods('9605', fallback=False)
+
+def test_failed_refresh_keeps_the_previous_metadata(sidra_calls, monkeypatch):
+  assert periods.get_periods('6579')[-1] == 2024
+
+  # O índice vence e a recarga falha: os períodos dos metadados continuam valendo
+  table_periods, _, from_metadata = periods._index['6579']
+  periods._index['6579'] = (table_periods, 0, from_metadata)
+  monkeypatch.setattr(periods, '_fetch_periods', lambda table_code, breaker: 1 / 0)
+
+  assert periods.get_periods('6579', fallback=False) == table_periods
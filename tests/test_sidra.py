@@ -0,0 +1,133 @@
+"""
+Acesso ao SIDRA: agendador, prazo das consultas e disjuntor por tabela (ver
+app/dash_apps/data/sidra.py).
+"""
+import socket
+import threading
+import time
+import types
+
+import pytest
+import requests
+import sidrapy
+from sidrapy.resources import handler as sidrapy_handler
+
+from app.dash_apps.data import sidra
+
+def test_scheduler_serves_higher_priority_first():
+  scheduler = sidra.SidraScheduler(max_concurrency=1, rate=0)
+  assert scheduler.acquire('bulk')
+
+  order = []
+  def request(priority_name):
+    scheduler.acquire(priority_name)
+    order.append(priority_name)
+    scheduler.release()
+
+  # Chegam em ordem inversa de prioridade, enquanto a única vaga está ocupada
+  threads = []
+  for name in ('bulk', 'refresh', 'interactive'):
+    threads.append(threading.Thread(target=request, args=(name,)))
+    threads[-1].start()
+    while scheduler.stats()[name]['queued'] == 0:
+      time.sleep(0.001)
+
+  scheduler.release()
+  for thread in threads:
+    thread.join(5)
+
+  assert order == ['interactive', 'refresh', 'bulk']
+
+def test_shared_limiter_reserves_tokens_for_higher_priorities():
+  limiter = sidra.SharedRateLimiter(rate=0.001, burst=5, reserve=2)
+
+  # 'bulk' só consome um token se sobrarem 1 + 2 × 2 no bucket
+  assert limiter.acquire(timeout=0, priority_name='bulk')
+  assert not limiter.acquire(timeout=0, priority_name='bulk')
+  assert limiter.acquire(timeout=0, priority_name='refresh')
+  assert limiter.acquire(timeout=0, priority_name='interactive')
+
+def test_abandoned_request_counts_one_failure(sidra_calls, monkeypatch):
+  release = threading.Event()
+  finished = threading.Event()
+
+  def get_table(**kwargs):
+    release.wait(5)
+    raise ConnectionError("SIDRA indisponível")
+
+  def request(*args):
+    try:
+      return original_request(*args)
+    finally:
+      finished.set()
+
+  original_request = sidra._request
+  monkeypatch.setattr(sidrapy, 'get_table', get_table)
+  monkeypatch.setattr(sidra, '_request', request)
+
+  with sidra.deadline(0.05), pytest.raises(sidra.SidraUnavailable):
+    sidra.get_table(table_code='9605', territorial_level='6', ibge_territorial_code='2203909')
+
+  # A requisição abandonada no prazo falha depois, sem registrar uma segunda falha
+  release.set()
+  assert finished.wait(5)
+  assert sidra._breaker('9605')._failures == 1
+
+def test_request_timeout_bounds_stalled_upstream(monkeypatch):
+  server = socket.socket()
+  server.bind(('127.0.0.1', 0))
+  server.listen()
+  host, port = server.getsockname()
+
+  monkeypatch.setattr(sidra, 'REQUEST_TIMEOUT', 0.2)
+  monkeypatch.setattr(sidrapy_handler, 'ENDPOINT_BASE', f'http://{host}:{port}')
+
+  try:
+    # O servidor aceita a conexão e nunca responde
+    with pytest.raises(requests.Timeout):
+      sidrapy_handler.get('9605', '6', '2203909')
+  finally:
+    server.close()
+
+def test_breaker_opens_and_half_opens(monkeypatch):
+  now = [1000.0]
+  monkeypatch.setattr(sidra, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+  breaker = sidra.CircuitBreaker(max_failures=3, cooldown=30)
+
+  for _ in range(2):
+    breaker.record_failure()
+  assert breaker.state == 'closed' and breaker.allow()
+
+  breaker.record_failure()
+  assert breaker.state == 'open' and not breaker.allow()
+
+  # Depois do período de espera, uma única requisição de teste passa
+  now[0] += 30
+  assert breaker.state == 'half-open'
+  assert breaker.allow()
+  assert not breaker.allow()
+
+  # A requisição de teste falha: o disjuntor volta a abrir
+  breaker.record_failure()
+  assert breaker.state == 'open'
+
+  now[0] += 30
+  assert breaker.allow()
+  breaker.record_success()
+  assert breaker.state == 'closed' and breaker.allow()
+
+def test_open_breaker_serves_the_last_good_result(sidra_calls):
+  query = dict(table_code='9605', territorial_level='6', ibge_territorial_code='2203909', period='2022')
+  fresh = sidra.get_table(**query)
+
+  breaker = sidra._breaker('9605')
+  for _ in range(breaker.max_failures):
+    breaker.record_failure()
+  sidra_calls.clear()
+
+  with sidra.track_staleness() as tracker:
+    stale = sidra.get_table(**query)
+
+  assert tracker.stale
+  assert stale.equals(fresh)
+  assert sidra_calls == {}
@@ -0,0 +1,91 @@
+"""
+Armazenamento analítico local em SQLite (ver app/dash_apps/data/store.py).
+"""
+import types
+
+import pandas as pd
+import pytest
+
+from app.dash_apps.data import economy
+from app.dash_apps.data.cache import data_cache
+from app.dash_apps.data import store as store_module
+from app.dash_apps.data.store import LocalStore
+
+def _crops(seed: int) -> pd.DataFrame:
+  return pd.DataFrame({
+    'medida': 'Toneladas',
+    'quantidade': [seed * 100 + index for index in range(6)],
+    'ano': [2020, 2020, 2020, 2021, 2021, 2021],
+    'produto': ['Milho', 'Soja', 'Arroz'] * 2,
+  }).sort_values('quantidade', ascending=False)
+
+@pytest.fixture
+def clock(monkeypatch):
+  """Relógio do armazenamento, avançado pelo teste."""
+  now = [1_000_000.0]
+  monkeypatch.setattr(store_module, 'time', types.SimpleNamespace(time=lambda: now[0]))
+  return now
+
+@pytest.fixture
+def local_store(tmp_path):
+  return LocalStore(str(tmp_path / 'store.sqlite3'), max_localities=2)
+
+def test_fresh_until_the_ttl(local_store, clock, monkeypatch):
+  monkeypatch.setattr(store_module, 'STORE_TTL', 60)
+  assert not local_store.fresh('crop_production', '2211001')
+
+  assert local_store.ensure('crop_production', '2211001', _crops(1), 'v1')
+  assert local_store.fresh('crop_production', '2211001')
+
+  clock[0] += 60
+  assert not local_store.fresh('crop_production', '2211001')
+
+  # Mesma versão: nada é regravado, mas o prazo é renovado
+  assert not local_store.ensure('crop_production', '2211001', _crops(1), 'v1')
+  assert local_store.fresh('crop_production', '2211001')
+
+def test_expired_writes_are_not_fresh(local_store, clock):
+  local_store.ensure('crop_production', '2211001', _crops(1), 'v1', expired=True)
+
+  assert local_store.version('crop_production', '2211001') == 'v1'
+  assert not local_store.fresh('crop_production', '2211001')
+
+def test_new_version_replaces_the_rows(local_store, clock):
+  local_store.ensure('crop_production', '2211001', _crops(1), 'v1')
+  assert local_store.ensure('crop_production', '2211001', _crops(2), 'v2')
+
+  rows = local_store.year_range('crop_production', '2211001', 2020, 2021)
+  assert sorted(rows['quantidade']) == sorted(_crops(2)['quantidade'])
+
+def test_prune_drops_the_oldest_localities(local_store, clock):
+  for code in ('2211001', '2207702', '2203909'):
+    local_store.ensure('crop_production', code, _crops(int(code[-1])), 'v1')
+    clock[0] += 1
+
+  assert local_store.version('crop_production', '2211001') is None
+  assert local_store.year_range('crop_production', '2211001', 2000, 2030).empty
+  assert local_store.version('crop_production', '2207702') == 'v1'
+  assert local_store.version('crop_production', '2203909') == 'v1'
+
+def test_top_per_year_matches_pandas(local_store):
+  crops = _crops(3)
+  local_store.ensure('crop_production', '2211001', crops, 'v1')
+
+  top = local_store.top_per_year('crop_production', '2211001', 2020, 2021, 2)
+  expected = crops.groupby('ano', group_keys=False).head(2).sort_values('quantidade', ascending=False)
+  assert top.reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+def test_crop_history_is_read_from_the_store(sidra_calls, local_store, monkeypatch):
+  monkeypatch.setattr(economy, 'store', local_store)
+  # Fora do Piauí, as lavouras vêm do armazenamento local
+  local_code = '2304400'
+
+  first = economy.get_crop_production(local_code=local_code)
+  assert sidra_calls == {'5457': 1}
+
+  # Sem o cache em memória, o histórico ainda válido é lido do armazenamento
+  sidra_calls.clear()
+  data_cache.clear()
+
+  assert economy.get_crop_production(local_code=local_code).equals(first)
+  assert sidra_calls == {}
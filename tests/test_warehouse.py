@@ -0,0 +1,57 @@
+"""
+Carga em lote de todos os municípios (ver app/dash_apps/data/warehouse.py).
+"""
+import os
+
+import pandas as pd
+import pytest
+import sidrapy
+
+from app.dash_apps.data import periods, warehouse
+from app.dash_apps.data.sidra import SidraUnavailable
+
+def test_plan_batches_fit_the_request_limit(sidra_calls):
+  tasks = warehouse.plan(['crop_production', 'population_by_race'], ['22', '31'])
+
+  assert all(task.values <= warehouse.VALUES_PER_REQUEST or len(task.periods) == 1 for task in tasks)
+  assert [task.values for task in tasks] == sorted((task.values for task in tasks), reverse=True)
+
+  # Cada período de cada conjunto e UF aparece em exatamente um lote
+  for name in ('crop_production', 'population_by_race'):
+    for state_code in ('22', '31'):
+      batches = [task.periods for task in tasks if task.dataset == name and task.state_code == state_code]
+      planned = sorted(period for batch in batches for period in batch)
+      assert tuple(planned) == periods.get_periods(warehouse.DATASETS[name].table_code)
+
+def test_plan_refuses_fallback_periods(sidra_calls, monkeypatch):
+  def unavailable(table_code, breaker):
+    raise SidraUnavailable(f"Metadados da tabela {table_code} indisponíveis.")
+
+  monkeypatch.setattr(periods, '_fetch_periods', unavailable)
+
+  with pytest.raises(SidraUnavailable):
+    warehouse.plan(['population_by_local'], ['22'])
+
+# O pool do job usa fork, como em produção; as threads do processo de teste não são usadas nos filhos
+@pytest.mark.filterwarnings('ignore:This process .* is multi-threaded:DeprecationWarning')
+def test_run_resumes_from_checkpoints(sidra_calls, monkeypatch, tmp_path):
+  root = str(tmp_path / 'warehouse')
+  arguments = dict(workers=1, datasets=['population_by_local'], states=['22'])
+
+  # Partição de um lote que não existe mais no plano
+  stale = os.path.join(root, 'population_by_local', 'uf=22', '2010-2010.parquet')
+  os.makedirs(os.path.dirname(stale))
+  pd.DataFrame(columns=warehouse.COLUMNS).to_parquet(stale)
+
+  assert warehouse.run(root, **arguments) == []
+  task, = warehouse.plan(['population_by_local'], ['22'])
+  assert os.path.exists(task.path(root))
+  assert not os.path.exists(stale)
+  assert not warehouse.read_dataset(root, 'population_by_local', '22').empty
+
+  # Uma nova execução não consulta o SIDRA: a partição gravada é o checkpoint
+  def unavailable(**kwargs):
+    raise ConnectionError("SIDRA indisponível")
+
+  monkeypatch.setattr(sidrapy, 'get_table', unavailable)
+  assert warehouse.run(root, **arguments) == []